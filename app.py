@@ -3,16 +3,120 @@ Dit is een simulator voor
 het leenfietsen project van 
 de stad Antwerpen.
 """
-import pickle
+from __future__ import annotations
+
+import hashlib
 import json
 import sys
 import os
 import re
 import time
+import gzip
+import shutil
+import queue
+import threading
+import heapq
+import itertools
+import csv
+import importlib
+import argparse
+import signal
+import traceback
 import datetime
-from jinja2 import Environment, FileSystemLoader
-import yaml
-import numpy as np
+import contextlib
+import collections
+
+
+class _LazyModule:
+    """
+    Stand-in for a module that is imported on first use, so a
+    command only pays for the imports it needs. On first use the
+    global is replaced by the module itself.
+    """
+
+    def __init__(self, naam: str, alias: str) -> None:
+        self._naam = naam
+        self._alias = alias
+
+    def __getattr__(self, attribuut: str):
+        module = importlib.import_module(self._naam)
+        globals()[self._alias] = module
+        return getattr(module, attribuut)
+
+
+np = _LazyModule("numpy", "np")
+pickle = _LazyModule("pickle", "pickle")
+yaml = _LazyModule("yaml", "yaml")
+jinja2 = _LazyModule("jinja2", "jinja2")
+futures = _LazyModule("concurrent.futures", "futures")
+shared_memory = _LazyModule("multiprocessing.shared_memory", "shared_memory")
+cProfile = _LazyModule("cProfile", "cProfile")
+pstats = _LazyModule("pstats", "pstats")
+asyncio = _LazyModule("asyncio", "asyncio")
+sqlite3 = _LazyModule("sqlite3", "sqlite3")
+multiprocessing = _LazyModule("multiprocessing", "multiprocessing")
+
+
+# One row per ride, the tijd column is in minutes since start_datum,
+# aantal is the number of bikes (a transporter trip carries several).
+# The dtypes are kept as field lists, numpy accepts them wherever
+# a dtype is expected and they don't need numpy at import time
+RIT_GEBRUIKER = 0
+RIT_TRANSPORTEUR = 1
+RIT_DTYPE = [
+    ("tijd", "f8"),
+    ("type", "u1"),
+    ("uitvoerder", "i4"),
+    ("fiets", "i4"),
+    ("start", "i4"),
+    ("eind", "i4"),
+    ("afstand", "f4"),
+    ("geschatte_tijd", "f4"),
+    ("aantal_ritten", "u4"),
+    ("aantal", "u2"),
+]
+
+# One row per ride of the RitArchief, RIT_DTYPE with the cycle it was
+# logged in and without the running count of the user
+ARCHIEF_DTYPE = [("cycle", "u8")] + [
+    veld for veld in RIT_DTYPE if veld[0] != "aantal_ritten"
+]
+
+# Events of the EventQueue, one row per pending event
+EVENT_RIT_START = 0
+EVENT_RIT_EINDE = 1
+EVENT_TRANSPORT_EINDE = 2
+EVENT_DTYPE = [
+    ("tijd", "f8"),
+    ("volgnummer", "u8"),
+    ("soort", "u1"),
+    ("uitvoerder", "i4"),
+    ("fiets", "i4"),
+    ("start", "i4"),
+    ("eind", "i4"),
+]
+
+# One row per cycle of a run, the fases are in seconds wall time
+METRIC_DTYPE = [
+    ("cycle", "u8"),
+    ("start", "f8"),
+    ("totaal", "f8"),
+    ("generatie", "f8"),
+    ("rebalancing", "f8"),
+    ("log", "f8"),
+    ("checkpoint", "f8"),
+    ("slaap", "f8"),
+    ("ritten", "u4"),
+    ("geweigerd_fiets", "u4"),
+    ("geweigerd_dok", "u4"),
+    ("omgeleid", "u4"),
+    ("transporteur_ritten", "u4"),
+    ("lege_stations", "u4"),
+    ("volle_stations", "u4"),
+    ("log_bytes", "u8"),
+    ("log_verwijderd", "u4"),
+]
+METRIC_NAMEN = tuple(naam for naam, _ in METRIC_DTYPE)
 
 
 class MissingJsonFilesError(Exception):
@@ -36,125 +140,333 @@ class LogSizeOverflow(Exception):
     """
 
     def __init__(self, string: str) -> None:
-        print(string)
-        exit(1)
+        super().__init__(string)
 
 
-class Fiets:
+class FleetState:
     """
-    Deze class representeert een fiets
+    Columnar store of the simulation state, the
+    Station, Fiets and Gebruiker classes are read-only views on it
 
-    Class attributen:
-        - aantal_fietsen [int]
-        - max_fietsen [int]
+    Station arrays:
+        - capaciteit [int32]
+        - bezetting [int32]
+        - gereserveerd [int32] (free slots reserved for arriving bikes)
+        - slot_offset [int64] (start of every station in the slot arrays)
+        - slot_volgorde [int32] (per station the occupied slot numbers
+          followed by the free ones, a stack of free slots)
+        - slot_fiets [int32] (bike in every slot, -1 when empty)
 
-    Instance attrbuten:
-        - _laatste_gebruiker [Gebruiker]
-        - _nummer [int]
+    Fiets arrays:
+        - fiets_station [int32] (-1 when not docked)
+        - fiets_slot [int32]
+
+    Gebruiker arrays:
+        - geslacht [uint8] (0 man, 1 vrouw)
+        - voornaam [uint16] (index in the names.json list of the geslacht)
+        - achternaam [uint16] (index in names.json)
+        - aantal_ritten [uint32]
     """
 
-    aantal_fietsen = 0
-    max_fietsen = 0
+    def __init__(self) -> None:
+        self.maak_stations([])
+        self.maak_fietsen(0)
+        self.maak_gebruikers(0)
 
-    def __init__(self):
-        self._nummer = Fiets.aantal_fietsen
-        Fiets.aantal_fietsen += 1
+    def maak_stations(self, capaciteiten: list[int]):
+        """
+        Allocates the station and slot arrays, all slots empty
+        """
+        self.capaciteit = np.asarray(capaciteiten, dtype=np.int32)
+        self.bezetting = np.zeros(len(self.capaciteit), dtype=np.int32)
+        self.gereserveerd = np.zeros(len(self.capaciteit), dtype=np.int32)
+        self.slot_offset = np.zeros(len(self.capaciteit) + 1, dtype=np.int64)
+        np.cumsum(self.capaciteit, out=self.slot_offset[1:])
+        self.slot_volgorde = (
+            np.arange(self.slot_offset[-1])
+            - np.repeat(self.slot_offset[:-1], self.capaciteit)
+        ).astype(np.int32)
+        self.slot_fiets = np.full(self.slot_offset[-1], -1, dtype=np.int32)
 
-    def getter(self) -> dict:
+    def maak_fietsen(self, aantal: int):
         """
-        Returns certain attributes in a dictionary
+        Allocates the bike arrays, no bike docked
         """
-        attributes = {"nummer": self._nummer}
-        return attributes
+        self.fiets_station = np.full(aantal, -1, dtype=np.int32)
+        self.fiets_slot = np.full(aantal, -1, dtype=np.int32)
+
+    def maak_gebruikers(self, aantal: int):
+        """
+        Allocates the user arrays
+        """
+        self.geslacht = np.zeros(aantal, dtype=np.uint8)
+        self.voornaam = np.zeros(aantal, dtype=np.uint16)
+        self.achternaam = np.zeros(aantal, dtype=np.uint16)
+        self.aantal_ritten = np.zeros(aantal, dtype=np.uint32)
+
+    @property
+    def aantal_stations(self) -> int:
+        return len(self.capaciteit)
+
+    @property
+    def aantal_fietsen(self) -> int:
+        return len(self.fiets_station)
+
+    @property
+    def aantal_gebruikers(self) -> int:
+        return len(self.aantal_ritten)
+
+    def neem_fiets(self, station: int) -> int:
+        """
+        Takes the most recently docked bike from a station in O(1),
+        returns -1 when the station is empty
+        """
+        bezetting = int(self.bezetting[station]) - 1
+        if bezetting < 0:
+            return -1
+        offset = int(self.slot_offset[station])
+        slot = int(self.slot_volgorde[offset + bezetting])
+        fiets = int(self.slot_fiets[offset + slot])
+        self.slot_fiets[offset + slot] = -1
+        self.bezetting[station] = bezetting
+        self.fiets_station[fiets] = -1
+        self.fiets_slot[fiets] = -1
+        return fiets
+
+    def zet_fiets(self, station: int, fiets: int) -> bool:
+        """
+        Docks a bike in the first free slot of a station in O(1),
+        returns False when the station is full
+        """
+        bezetting = int(self.bezetting[station])
+        if bezetting >= self.capaciteit[station]:
+            return False
+        offset = int(self.slot_offset[station])
+        slot = int(self.slot_volgorde[offset + bezetting])
+        self.slot_fiets[offset + slot] = fiets
+        self.bezetting[station] = bezetting + 1
+        self.fiets_station[fiets] = station
+        self.fiets_slot[fiets] = slot
+        return True
+
+    def reserveer(self, station: int) -> bool:
+        """
+        Reserves a free slot for an arriving bike,
+        returns False when every free slot is taken
+        """
+        if (
+            self.bezetting[station] + self.gereserveerd[station]
+            >= self.capaciteit[station]
+        ):
+            return False
+        self.gereserveerd[station] += 1
+        return True
+
+    def zet_gereserveerd(self, station: int, fiets: int) -> None:
+        """
+        Docks an arriving bike in its reserved slot
+        """
+        self.gereserveerd[station] -= 1
+        self.zet_fiets(station, fiets)
+
+    def zet_fietsen(self, aantallen: np.ndarray, fietsen: np.ndarray):
+        """
+        Docks bikes in bulk, aantallen[station] of them in the first
+        free slots of every station, in the order of fietsen. The
+        caller makes sure they fit.
+        """
+        aantallen = np.asarray(aantallen, dtype=np.int64)
+        stations = np.repeat(np.arange(self.aantal_stations), aantallen)
+        eerste = np.cumsum(aantallen) - aantallen
+        rang = np.arange(len(stations)) - np.repeat(eerste, aantallen)
+        offsets = self.slot_offset[stations]
+        slots = self.slot_volgorde[offsets + self.bezetting[stations] + rang]
+        self.slot_fiets[offsets + slots] = fietsen
+        self.bezetting += aantallen.astype(np.int32)
+        self.fiets_station[fietsen] = stations
+        self.fiets_slot[fietsen] = slots
+
+    @staticmethod
+    def lopend(stations: np.ndarray, delta: np.ndarray, begin: np.ndarray):
+        """
+        Returns the value of a per-station counter before every
+        operation of a series, it starts at begin[station] and the
+        operations add delta to the counter of their station
+        """
+        volgorde = np.argsort(stations, kind="stable")
+        gesorteerd = stations[volgorde]
+        stappen = delta[volgorde].astype(np.int64)
+        voor = np.cumsum(stappen) - stappen
+        eerste = np.searchsorted(gesorteerd, gesorteerd)
+        waarde = np.empty(len(stations), dtype=np.int64)
+        waarde[volgorde] = begin[gesorteerd] + voor - voor[eerste]
+        return waarde
+
+    @staticmethod
+    def stand(
+        stations: np.ndarray,
+        rangen: np.ndarray,
+        delta: np.ndarray,
+        begin: np.ndarray,
+        vraag_stations: np.ndarray,
+        vraag_rangen: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Returns the value of per-station counters at query points, a
+        counter starts at begin[station] and the operations of its
+        station with a lower rang than the query add their delta
+        """
+        breedte = max(rangen.max(initial=0), vraag_rangen.max(initial=0)) + 1
+        # a query sorts before the operations of its own rang
+        sleutels = np.concatenate(
+            [
+                (stations * breedte + rangen) * 2 + 1,
+                (vraag_stations * breedte + vraag_rangen) * 2,
+            ]
+        )
+        volgorde = np.argsort(sleutels)
+        stappen = np.concatenate([delta, np.zeros(len(vraag_stations), dtype=int)])
+        stappen = stappen[volgorde]
+        voor = np.cumsum(stappen) - stappen
+        gesorteerd = np.concatenate([stations, vraag_stations])[volgorde]
+        vraag = np.flatnonzero(volgorde >= len(stations))
+        # where the station of every query starts
+        eerste = np.searchsorted(gesorteerd, gesorteerd[vraag])
+        waarde = np.empty(len(vraag_stations), dtype=np.int64)
+        waarde[volgorde[vraag] - len(stations)] = (
+            begin[gesorteerd[vraag]] + voor[vraag] - voor[eerste]
+        )
+        return waarde
+
+    def wissel_fietsen(
+        self, stations: np.ndarray, neem: np.ndarray, fietsen: np.ndarray
+    ) -> np.ndarray:
+        """
+        Takes and docks bikes in bulk with the outcome of neem_fiets
+        and zet_fiets called one by one in the order of the arrays:
+        neem[i] takes the most recently docked bike of stations[i],
+        otherwise fietsen[i] is docked. A dock with fietsen[i] < -1
+        docks the bike taken by operation -2 - fietsen[i]. The caller
+        makes sure every take finds a bike and every dock a free slot.
+        Returns the bike of every operation.
+
+        Both stacks keep their slot order, so the operation that puts
+        a bike in a slot is the one before it at the same stack depth.
+        """
+        stations = np.asarray(stations, dtype=np.int64)
+        neem = np.asarray(neem, dtype=bool)
+        if not len(stations):
+            return np.zeros(0, dtype=np.int64)
+        delta = np.where(neem, -1, 1)
+        diepte = FleetState.lopend(stations, delta, self.bezetting) - neem
+        plek = self.slot_offset[stations] + diepte
+
+        # the previous operation on the same slot docked the bike a take gets
+        volgorde = np.argsort(plek, kind="stable")
+        zelfde = plek[volgorde[1:]] == plek[volgorde[:-1]]
+        vorige = np.full(len(stations), -1, dtype=np.int64)
+        vorige[volgorde[1:][zelfde]] = volgorde[:-1][zelfde]
+        slots = self.slot_volgorde[plek]
+        globaal = self.slot_offset[stations] + slots
+
+        fietsen = np.asarray(fietsen, dtype=np.int64)
+        bron = np.where(neem, vorige, -2 - fietsen)
+        uitkomst = np.where(neem, -1, fietsen)
+        eerst = neem & (vorige == -1)
+        uitkomst[eerst] = self.slot_fiets[globaal[eerst]]
+        onbekend = np.flatnonzero(uitkomst < 0)
+        # a chain of rides within the series resolves one link per round
+        while len(onbekend):
+            uitkomst[onbekend] = uitkomst[bron[onbekend]]
+            nog_onbekend = onbekend[uitkomst[onbekend] < 0]
+            if len(nog_onbekend) == len(onbekend):
+                raise ValueError("wissel_fietsen: a take finds no bike")
+            onbekend = nog_onbekend
+
+        laatste = volgorde[np.append(~zelfde, True)]
+        self.slot_fiets[globaal[laatste]] = np.where(
+            neem[laatste], -1, uitkomst[laatste]
+        )
+        volgorde = np.argsort(uitkomst, kind="stable")
+        gesorteerd = uitkomst[volgorde]
+        laatste = volgorde[np.append(gesorteerd[1:] != gesorteerd[:-1], True)]
+        geparkeerd = ~neem[laatste]
+        self.fiets_station[uitkomst[laatste]] = np.where(
+            geparkeerd, stations[laatste], -1
+        )
+        self.fiets_slot[uitkomst[laatste]] = np.where(geparkeerd, slots[laatste], -1)
+        self.bezetting += np.bincount(
+            stations, weights=delta, minlength=self.aantal_stations
+        ).astype(np.int32)
+        return uitkomst
 
 
-class Slot:
+class Fiets:
     """
-    Deze class representeert een slot in een station
+    Deze class representeert een fiets,
+    een view op de FleetState
 
     Instance attrbuten:
-        - _bezet [Bool]
-        - _fiets [Fiets]
+        - _state [FleetState]
+        - _nummer [int]
     """
 
-    def __init__(self):
-        self.leeg = True
-        self._fiets = None
+    __slots__ = ("_state", "_nummer")
 
-    def fiets_deponeren(self, fiets: Fiets):
-        """
-        Je zet een fiets in het slot
-        """
-        if not self.leeg:
-            raise ValueError
-        if self.leeg:
-            self.leeg = False
-        self._fiets = fiets
+    def __init__(self, state: FleetState, nummer: int):
+        self._state = state
+        self._nummer = nummer
 
-    def fiets_pakken(self):
+    def getter(self) -> dict:
         """
-        Je haalt een fiets uit een slot
+        Returns certain attributes in a dictionary
         """
-        fiets = self._fiets
-        self._fiets = None
-        self.leeg = True
-        return fiets
+        attributes = {"nummer": self._nummer}
+        return attributes
 
 
 class Station:
     """
-    Deze class representeert een station
+    Deze class representeert een station,
+    de bezetting staat in de FleetState
 
     Instance attrbuten:
         - stationnummer [int]
-        - aantal_slots [int]
-        - vol [bool]
-        - slots [Slot]
         - adres [dict[str]]
         - coordinaten [dict[float]]
+        - positie [int] (plaats in App._stations en de FleetState)
+        - state [FleetState]
     """
 
     def __init__(
-        self, stationnummer: int, adres: dict, coordinaten: dict, aantal_slots: int
+        self,
+        stationnummer: int,
+        adres: dict,
+        coordinaten: dict,
+        positie: int,
+        state: FleetState,
     ) -> None:
         self._stationnummer = stationnummer
-        self.aantal_slots = aantal_slots
-        self.vol = False
-        self.leeg = True
-        self._slots = []
-        self.aantal_vol = 0
-        while len(self._slots) < self.aantal_slots:
-            slot = Slot()
-            self._slots.append(slot)
         self._adres = adres
         self._coordinaten = coordinaten
+        self._positie = positie
+        self._state = state
 
-    def voeg_fiets_toe(self, fiets: Fiets):
-        """
-        Voeg een fiets toe aan een station
-        """
-        for slot in self._slots:
-            if slot.leeg:
-                self.aantal_vol += 1
-                slot.fiets_deponeren(fiets)
-                self.leeg = False
-                break
+    @property
+    def aantal_slots(self) -> int:
+        return int(self._state.capaciteit[self._positie])
 
-            if self.aantal_vol == self.aantal_slots:
-                self.vol = True
+    @property
+    def aantal_vol(self) -> int:
+        return int(self._state.bezetting[self._positie])
 
-    def neem_fiets(self):
-        """
-        Neem een fiets van het station
-        """
-        for slot in self._slots:
-            if self.aantal_vol == 0:
-                self.leeg = True
-                self.vol = False
+    @property
+    def vol(self) -> bool:
+        return self.aantal_vol >= self.aantal_slots
 
-            if not slot.leeg:
-                self.aantal_vol -= 1
-                return slot.fiets_pakken()
+    @property
+    def leeg(self) -> bool:
+        return self.aantal_vol == 0
 
     def getter(self) -> dict:
         """
@@ -164,581 +476,5381 @@ class Station:
         return attributes
 
 
-class Rit:
+class _StationSet:
+    """
+    A set of station positions with O(1) add, remove,
+    size and uniform sampling (swap-remove on a dense list)
     """
-    Deze class representeert een rit vanself._gebruiker
-    station A -> Station B met Fiets x
 
-    Deze klasse werkt als een log
+    def __init__(self, aantal_stations: int):
+        self._items = []
+        self._plaats = [-1] * aantal_stations
 
-    Instance attrbuten:
-        - startstation [Station]
-        - eindstation [Station]
-        - fiets [Fiets]
-        - afstand [float] (km)
-        - geschatte_tijd [float] (min)
-    """
+    def __len__(self) -> int:
+        return len(self._items)
 
-    def __init__(
-        self, startstation: Station, eindstation: Station, fiets: Fiets, uitvoerder
-    ) -> None:
-        self._uitvoerder = uitvoerder
-        self._uitvoerder._verplaatsings_update()
-        self._fiets = fiets
-        self._startstation = startstation
-        self._eindstation = eindstation
-
-        self._afstand = self.__calculate_distance(
-            startstation._coordinaten["Y"],
-            startstation._coordinaten["X"],
-            eindstation._coordinaten["Y"],
-            eindstation._coordinaten["X"],
-        )
-        self._geschatte_tijd = self.__calculate_estimate_time(self._afstand)
-
-    def __calculate_distance(
-        self, x_a: float, y_a: float, x_b: float, y_b: float
-    ) -> float:
-        lat1, lat2 = np.radians(x_a), np.radians(x_b)
-        lon1, lon2 = np.radians(y_a), np.radians(y_b)
-        coords1 = np.vstack((lat1, lon1)).T
-        coords2 = np.vstack((lat2, lon2)).T
-        d_coords = coords2 - coords1
-        sqr_half = (
-            np.sin(d_coords[:, 0] / 2) ** 2
-            + np.cos(coords1[:, 0])
-            * np.cos(coords2[:, 0])
-            * np.sin(d_coords[:, 1] / 2) ** 2
-        )
-        cent_angle = 2 * np.arctan2(np.sqrt(sqr_half), np.sqrt(1 - sqr_half))
-        distance = 6371 * cent_angle
-        return distance[0]
+    def __contains__(self, positie: int) -> bool:
+        return self._plaats[positie] != -1
 
-    def __calculate_estimate_time(self, distance_km: float):
-        average_speed = 16
-        time_hours = distance_km / average_speed
-        time_minutes = time_hours * 60
-        return time_minutes
+    def items(self) -> list[int]:
+        """
+        Returns a copy of the positions in the set
+        """
+        return list(self._items)
 
-    def getter(self) -> dict:
+    def zet(self, positie: int, aanwezig: bool):
         """
-        Returns certain attributes in a dictionary
+        Adds or removes a position
         """
-        tijd = datetime.datetime.fromtimestamp(time.time()).strftime(
-            "%H:%M:%S"
-        )
-        gebruiker_info = self._uitvoerder.getter()
+        plaats = self._plaats[positie]
+        if aanwezig and plaats == -1:
+            self._plaats[positie] = len(self._items)
+            self._items.append(positie)
+        elif not aanwezig and plaats != -1:
+            laatste = self._items.pop()
+            if laatste != positie:
+                self._items[plaats] = laatste
+                self._plaats[laatste] = plaats
+            self._plaats[positie] = -1
+
+    def sample(self, rng: np.random.Generator, behalve: int = -1) -> int | None:
+        """
+        Draws a uniformly random position, optionally
+        excluding one, returns None if nothing is left
+        """
+        lengte = len(self._items)
+        if lengte == 0 or (lengte == 1 and self._items[0] == behalve):
+            return None
+        while True:
+            positie = self._items[rng.integers(lengte)]
+            if positie != behalve:
+                return positie
 
-        fiets_info = self._fiets.getter()
 
-        start_station_info = self._startstation.getter()
-        eind_station_info = self._eindstation.getter()
+class StationIndex:
+    """
+    Availability index over the stations of a FleetState,
+    updated on every occupancy change
 
-        afstand = self._afstand
-        geschatte_tijd = self._geschatte_tijd
+    Sets:
+        - niet_leeg -> stations with at least one bike
+        - niet_vol -> stations with at least one free, unreserved slot
+        - vol -> stations without free, unreserved slots
+    """
 
-        attributes = {
-            "time": tijd,
-            "gebruiker": gebruiker_info,
-            "fiets": fiets_info,
-            "start_station": start_station_info,
-            "eind_station": eind_station_info,
-            "afstand": round(afstand,2),
-            "geschatte_tijd": round(geschatte_tijd,2),
-        }
-        return attributes
+    def __init__(self, state: FleetState):
+        self._state = state
+        aantal_stations = state.aantal_stations
+        self.niet_leeg = _StationSet(aantal_stations)
+        self.niet_vol = _StationSet(aantal_stations)
+        self.vol = _StationSet(aantal_stations)
+        for positie in range(aantal_stations):
+            self.update(positie)
 
+    def update(self, positie: int):
+        """
+        Puts a station in the sets that match its occupancy
+        """
+        aantal_vol = int(self._state.bezetting[positie])
+        aantal_bezet = aantal_vol + int(self._state.gereserveerd[positie])
+        aantal_slots = int(self._state.capaciteit[positie])
+        self.niet_leeg.zet(positie, aantal_vol > 0)
+        self.niet_vol.zet(positie, aantal_bezet < aantal_slots)
+        self.vol.zet(positie, aantal_bezet >= aantal_slots)
 
-class Gebruiker:
-    """
-    Deze class representeert een gebruiker
 
-    Class attributen:
-        - aantal_gebruikers [int]
-        - max_gebruikers [int]
+class StationCatalogus:
+    """
+    The stations in use from velo.json, in the order of App._stations
 
     Instance attrbuten:
-        - _sex [str] (2 options)
-        - _voornaam [str]
-        - _achternaam [str]
-        - _aantal_ritten [int]
-        - _laatste_rit [Rit]
+        - nummers [list[str]]
+        - adressen [list[dict[str]]]
+        - x [np.ndarray] (lengtegraad)
+        - y [np.ndarray] (breedtegraad)
+        - capaciteit [np.ndarray]
     """
 
-    aantal_gebruikers = 0
-    max_gebruikers = 0
+    def __init__(
+        self,
+        nummers: list,
+        adressen: list,
+        x: np.ndarray,
+        y: np.ndarray,
+        capaciteit: np.ndarray,
+        bron_hash: str | None = None,
+    ) -> None:
+        self.nummers = nummers
+        self.adressen = adressen
+        self.x = x
+        self.y = y
+        self.capaciteit = capaciteit
+        self.bron_hash = bron_hash
+
+    adres_velden = ("Straatnaam", "Huisnummer", "Gemeente", "Postcode")
+
+    def __len__(self) -> int:
+        return len(self.nummers)
+
+    def positie(self, nummer: str) -> int | None:
+        """
+        Returns the position of a station by its number,
+        the leading zeros may be left out
+        """
+        for positie, eigen_nummer in enumerate(self.nummers):
+            if eigen_nummer.lstrip("0") == str(nummer).lstrip("0"):
+                return positie
+        return None
+
+    def beschrijving(self, positie: int) -> str:
+        """
+        Returns the number, street and district of a station
+        """
+        adres = self.adressen[positie]
+        return f"{self.nummers[positie]} {adres['Straatnaam']} ({adres['Gemeente']})"
 
-    def __init__(self, voornaam_man: list, voornaam_vrouw: list, achternaam: list):
-        self._voornaam = (
-            voornaam_man[np.random.randint(0, len(voornaam_man))]
-            if np.random.randint(0, 2) > 0.5
-            else voornaam_vrouw[np.random.randint(0, len(voornaam_vrouw))]
+    @classmethod
+    def uit_geojson(cls, pad: str = "input/velo.json"):
+        """
+        This function removes unused data
+        from the velo.json file
+        """
+        nummers, adressen, x, y, capaciteit = [], [], [], [], []
+        with open(pad, "rb") as file:
+            bron = file.read()
+        data = json.loads(bron)
+        for feature in data["features"]:
+            if feature["properties"]["Gebruik"] != "IN_GEBRUIK":
+                continue
+            nummers.append(feature["properties"]["Objectcode"][3:])
+            adressen.append(
+                {
+                    "Straatnaam": feature["properties"]["Straatnaam"],
+                    "Huisnummer": feature["properties"]["Huisnummer"],
+                    "Gemeente": feature["properties"]["District"],
+                    "Postcode": feature["properties"]["Postcode"],
+                }
+            )
+            x.append(float(feature["geometry"]["coordinates"][0]))
+            y.append(float(feature["geometry"]["coordinates"][1]))
+            capaciteit.append(int(feature["properties"]["Aantal_plaatsen"]))
+        return cls(
+            nummers,
+            adressen,
+            np.array(x),
+            np.array(y),
+            np.array(capaciteit, dtype=np.int32),
+            hashlib.sha256(bron).hexdigest(),
         )
-        self._achternaam = achternaam[np.random.randint(0, len(achternaam))]
-        self._aantal_ritten = 0
-        self._nummer = Gebruiker.aantal_gebruikers
-        Gebruiker.aantal_gebruikers += 1
 
-    def _verplaatsings_update(self):
+    @classmethod
+    def laad(cls, bron: str = "input/velo.json", cache: str = "output/stations.npz"):
         """
-        Deze functie update een aantal instance attributen
+        Loads the catalog from its binary cache, rebuilding the cache
+        when velo.json changed. The modification time and size of
+        velo.json are compared first, the hash only when those differ.
         """
-        self._aantal_ritten += 1
+        status = os.stat(bron)
+        sleutel = np.array([status.st_mtime_ns, status.st_size], dtype=np.int64)
+        if os.path.exists(cache):
+            with np.load(cache) as data:
+                arrays = {naam: data[naam] for naam in data.files}
+            if np.array_equal(arrays["sleutel"], sleutel):
+                return cls.__uit_arrays(arrays)
+            if str(arrays["bron_hash"]) == DistanceMatrix.bron_hash_van(bron):
+                # touched or copied, not changed
+                arrays["sleutel"] = sleutel
+                np.savez(cache, **arrays)
+                return cls.__uit_arrays(arrays)
+        catalogus = cls.uit_geojson(bron)
+        catalogus.opslaan(cache, sleutel)
+        return catalogus
 
-    def getter(self) -> dict:
+    def opslaan(self, cache: str, sleutel: np.ndarray) -> None:
         """
-        Returns certain attributes in a dictionary
+        Writes the catalog to its cache, the address
+        strings are stored once in a string table
         """
-        attributes = {
-            "type": "Gebruiker",
-            "nummer": self._nummer,
-            "voornaam": self._voornaam,
-            "achternaam": self._achternaam,
-            "aantal_ritten": self._aantal_ritten,
-        }
-        return attributes
+        teksten = {}
+        adressen = np.array(
+            [
+                [
+                    -1 if waarde is None else teksten.setdefault(waarde, len(teksten))
+                    for waarde in (adres[veld] for veld in StationCatalogus.adres_velden)
+                ]
+                for adres in self.adressen
+            ],
+            dtype=np.int32,
+        ).reshape(len(self.adressen), len(StationCatalogus.adres_velden))
+        np.savez(
+            cache,
+            sleutel=sleutel,
+            bron_hash=np.str_(self.bron_hash),
+            nummers=np.array(self.nummers, dtype=str),
+            teksten=np.array(list(teksten), dtype=str),
+            adressen=adressen,
+            x=self.x,
+            y=self.y,
+            capaciteit=self.capaciteit,
+        )
 
+    @classmethod
+    def __uit_arrays(cls, arrays: dict):
+        teksten = [sys.intern(tekst) for tekst in arrays["teksten"].tolist()]
+        adressen = [
+            {
+                veld: None if index < 0 else teksten[index]
+                for veld, index in zip(StationCatalogus.adres_velden, rij)
+            }
+            for rij in arrays["adressen"].tolist()
+        ]
+        return cls(
+            arrays["nummers"].tolist(),
+            adressen,
+            arrays["x"],
+            arrays["y"],
+            arrays["capaciteit"],
+            str(arrays["bron_hash"]),
+        )
 
-class Fietstransporteur:
+
+class DistanceMatrix:
     """
-    Deze class representeert een fietstransporteur
+    Pairwise haversine distances (km) and estimated travel times (min)
+    between all stations, computed once and stored as float32.
+
+    The matrix is cached in output/afstanden.npz together with
+    the hash of the station coordinates it was computed from.
     """
 
-    aantal_transporteurs = 0
-    max_transporteurs = 0
+    gemiddelde_snelheid = 16  # km/h
 
-    def __init__(self):
-        self._aantal_ritten = 0
-        self._nummer = Fietstransporteur.aantal_transporteurs
-        Fietstransporteur.aantal_transporteurs += 1
+    def __init__(
+        self,
+        afstanden: np.ndarray,
+        coordinaten_hash: str,
+        reistijden: np.ndarray | None = None,
+    ) -> None:
+        self.afstanden = np.asarray(afstanden, dtype=np.float32)
+        if reistijden is None:
+            # from the stored distances, a cached matrix gives the same times
+            reistijden = self.afstanden / DistanceMatrix.gemiddelde_snelheid * 60
+        self.reistijden = np.asarray(reistijden, dtype=np.float32)
+        self.coordinaten_hash = coordinaten_hash
 
-    def _verplaatsings_update(self):
+    @staticmethod
+    def haversine(
+        lat_a: np.ndarray, lon_a: np.ndarray, lat_b: np.ndarray, lon_b: np.ndarray
+    ) -> np.ndarray:
         """
-        Deze functie update een aantal instance attributen
+        Vectorized great-circle distance in km, the arguments
+        are in degrees and broadcast against each other
         """
-        self._aantal_ritten += 1
+        lat_a, lat_b = np.radians(lat_a), np.radians(lat_b)
+        d_lat = lat_b - lat_a
+        d_lon = np.radians(lon_b) - np.radians(lon_a)
+        sqr_half = (
+            np.sin(d_lat / 2) ** 2
+            + np.cos(lat_a) * np.cos(lat_b) * np.sin(d_lon / 2) ** 2
+        )
+        cent_angle = 2 * np.arctan2(np.sqrt(sqr_half), np.sqrt(1 - sqr_half))
+        return 6371 * cent_angle
 
-    def __str__(self) -> str:
-        return f"{self._nummer}"
+    @staticmethod
+    def bron_hash_van(bron: str) -> str:
+        """
+        Returns the hash of the station source file
+        """
+        with open(bron, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
 
-    def getter(self) -> dict:
+    @staticmethod
+    def coordinaten_hash_van(lat: np.ndarray, lon: np.ndarray) -> str:
         """
-        Returns certain attributes in a dictionary
+        Returns the hash of the station coordinates, in their order
         """
-        attributes = {
-            "type": "Transporteur",
-            "nummer": self._nummer,
-            "aantal_ritten": self._aantal_ritten / 10,
-        }
-        return attributes
+        coordinaten = np.stack([lat, lon]).astype(np.float64)
+        return hashlib.sha256(coordinaten.tobytes()).hexdigest()
 
+    @classmethod
+    def bereken(cls, lat: np.ndarray, lon: np.ndarray):
+        """
+        Computes the full matrix for stations at the given coordinates
+        """
+        afstanden = cls.haversine(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+        return cls(afstanden, cls.coordinaten_hash_van(lat, lon))
 
-class Log:
+    @classmethod
+    def laad_of_bereken(
+        cls,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        cache: str = "output/afstanden.npz",
+    ):
+        """
+        Loads the cached matrix, recomputing and saving it when
+        it was computed from other coordinates or is missing
+        """
+        coordinaten_hash = cls.coordinaten_hash_van(lat, lon)
+        if os.path.exists(cache):
+            with np.load(cache) as data:
+                if (
+                    "coordinaten_hash" in data.files
+                    and str(data["coordinaten_hash"]) == coordinaten_hash
+                ):
+                    return cls(data["afstanden"], coordinaten_hash)
+        matrix = cls.bereken(lat, lon)
+        matrix.opslaan(cache)
+        return matrix
+
+    def opslaan(self, cache: str = "output/afstanden.npz"):
+        """
+        Writes the matrix to the cache file
+        """
+        np.savez(
+            cache,
+            afstanden=self.afstanden,
+            coordinaten_hash=np.str_(self.coordinaten_hash),
+        )
+
+    def afstand(self, start: int, eind: int) -> float:
+        """
+        Distance in km between two station positions
+        """
+        return float(self.afstanden[start, eind])
+
+    def reistijd(self, start: int, eind: int) -> float:
+        """
+        Estimated travel time in min between two station positions
+        """
+        return float(self.reistijden[start, eind])
+
+
+class GridIndex:
     """
-    Writes different events in a log file
+    Uniform grid over the station coordinates for nearest-station
+    and radius queries, a query only visits the cells around it.
+
+    The coordinates are projected on a plane around the mean latitude,
+    over a city that is accurate to well within a percent. The stations
+    are sorted by cell, cel_start[cel]:cel_start[cel + 1] are the
+    positions in a cell (like the slot arrays of the FleetState).
     """
 
-    max_total_log_size = 0
+    km_per_graad = 111.32
 
-    def __init__(self):
-        self.ritlogfile = "output/ritlog.json"
-        if not os.path.exists(self.ritlogfile):
-            with open(self.ritlogfile, "w", encoding="UTF-8") as file:
-                json.dump([], file)
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, celgrootte: float = 0.5):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self._cos = np.cos(np.radians(self.lat.mean())) if len(self.lat) else 1.0
+        self._celgrootte = celgrootte
+        self._x, self._y = self.__projecteer(self.lat, self.lon)
+        self._x0 = self._x.min() if len(self._x) else 0.0
+        self._y0 = self._y.min() if len(self._y) else 0.0
+        kolom, rij = self.__cel(self._x, self._y)
+        self._kolommen = int(kolom.max()) + 1 if len(kolom) else 1
+        self._rijen = int(rij.max()) + 1 if len(rij) else 1
+        cellen = rij * self._kolommen + kolom
+        self._volgorde = np.argsort(cellen, kind="stable")
+        self._cel_start = np.zeros(self._kolommen * self._rijen + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(cellen, minlength=self._kolommen * self._rijen),
+            out=self._cel_start[1:],
+        )
+
+    def __len__(self) -> int:
+        return len(self.lat)
 
-    def __calculate_file_size(self):
+    def __projecteer(self, lat, lon):
+        return (
+            lon * self._cos * GridIndex.km_per_graad,
+            lat * GridIndex.km_per_graad,
+        )
+
+    def __cel(self, x, y):
+        kolom = np.floor((x - self._x0) / self._celgrootte).astype(np.int64)
+        rij = np.floor((y - self._y0) / self._celgrootte).astype(np.int64)
+        return kolom, rij
+
+    def __rij_stuk(self, rij: int, van: int, tot: int) -> np.ndarray:
         """
-        Calculates the total file size of the log files
+        Positions in the cells van..tot (inclusive) of a row, clipped to the grid
         """
-        file_paths = [self.ritlogfile]
-        total_size = 0
+        van, tot = max(van, 0), min(tot, self._kolommen - 1)
+        if rij < 0 or rij >= self._rijen or van > tot:
+            return self._volgorde[:0]
+        eerste = rij * self._kolommen
+        return self._volgorde[
+            self._cel_start[eerste + van] : self._cel_start[eerste + tot + 1]
+        ]
 
-        for file_path in file_paths:
-            if os.path.exists(file_path):
-                total_size += os.path.getsize(file_path)
+    def __ring(self, kolom: int, rij: int, r: int) -> np.ndarray:
+        """
+        Positions in the cells at Chebyshev distance r of a cell
+        """
+        if r == 0:
+            return self.__rij_stuk(rij, kolom, kolom)
+        stukken = [
+            self.__rij_stuk(rij - r, kolom - r, kolom + r),
+            self.__rij_stuk(rij + r, kolom - r, kolom + r),
+        ]
+        for tussen in range(rij - r + 1, rij + r):
+            stukken.append(self.__rij_stuk(tussen, kolom - r, kolom - r))
+            stukken.append(self.__rij_stuk(tussen, kolom + r, kolom + r))
+        return np.concatenate(stukken)
 
-        if total_size >= Log.max_total_log_size:
-            raise LogSizeOverflow("Log files have exceeded config limit.")
+    def afstand(self, lat: float, lon: float, posities: np.ndarray) -> np.ndarray:
+        """
+        Distance in km from a point to the stations at posities
+        """
+        x, y = self.__projecteer(lat, lon)
+        return np.hypot(self._x[posities] - x, self._y[posities] - y)
 
-    def __load_log_data(self) -> list:
+    def straal(self, lat: float, lon: float, km: float) -> np.ndarray:
         """
-        Loads existing log data from a file.
+        Returns the positions of the stations within km
+        of a point, nearest first
         """
-        try:
-            with open(self.ritlogfile, "r", encoding="UTF-8") as file:
-                logs = json.load(file)
-        except FileNotFoundError:
-            logs = []
-        return logs
+        x, y = self.__projecteer(lat, lon)
+        kolom, rij = (int(waarde) for waarde in self.__cel(x, y))
+        n = int(np.ceil(km / self._celgrootte))
+        posities = np.concatenate(
+            [
+                self.__rij_stuk(tussen, kolom - n, kolom + n)
+                for tussen in range(rij - n, rij + n + 1)
+            ]
+        )
+        afstanden = self.afstand(lat, lon, posities)
+        binnen = afstanden <= km
+        volgorde = np.argsort(afstanden[binnen], kind="stable")
+        return posities[binnen][volgorde]
 
-    def log_rit(self, cycle: int, ritten: list):
+    def rondom(self, lat: float, lon: float):
         """
-        Writes a rit into the log.
+        Yields (afstand, positie) of all stations, nearest first. The
+        cells are visited ring by ring, a station is yielded once no
+        unvisited cell can hold a nearer one.
         """
-        logs = self.__load_log_data()
-        ritten_info = []
-        for rit in ritten:
-            ritten_info.append(rit.getter())
-        logs.append({"cycle": cycle, "events": ritten_info})
+        x, y = self.__projecteer(lat, lon)
+        kolom, rij = (int(waarde) for waarde in self.__cel(x, y))
+        laatste_ring = max(
+            abs(kolom),
+            abs(rij),
+            abs(self._kolommen - 1 - kolom),
+            abs(self._rijen - 1 - rij),
+        )
+        heap = []
+        for r in range(laatste_ring + 1):
+            posities = self.__ring(kolom, rij, r)
+            afstanden = self.afstand(lat, lon, posities)
+            for afstand, positie in zip(afstanden.tolist(), posities.tolist()):
+                heapq.heappush(heap, (afstand, positie))
+            # the cells of ring r + 1 are at least r cells away
+            grens = r * self._celgrootte
+            while heap and heap[0][0] <= grens:
+                yield heapq.heappop(heap)
+        while heap:
+            yield heapq.heappop(heap)
+
+    def dichtste(self, lat: float, lon: float, k: int = 1) -> np.ndarray:
+        """
+        Returns the positions of the k nearest stations to a point
+        """
+        return np.array(
+            [positie for _, positie in itertools.islice(self.rondom(lat, lon), k)],
+            dtype=np.int64,
+        )
 
-        with open(self.ritlogfile, "w", encoding="UTF-8") as file:
-            json.dump(logs, file,indent=6)
 
-        self.__calculate_file_size()
-        time.sleep(5)
+def _alias_tabellen(gewichten: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Builds Walker alias tables for every row of gewichten, vectorized
+    over the rows. Drawing column k of a row with probability
+    kans[k] and else alias[k], for a uniform k, draws the columns
+    in proportion to the weights. A row without weight draws uniformly.
+    """
+    gewichten = np.atleast_2d(np.asarray(gewichten, dtype=np.float64))
+    rijen, n = gewichten.shape
+    totaal = gewichten.sum(axis=1, keepdims=True)
+    q = np.where(totaal > 0, gewichten * n / np.where(totaal > 0, totaal, 1), 1.0)
+    volgorde = np.argsort(q, axis=1)
+    q = np.take_along_axis(q, volgorde, axis=1).ravel()
+    rij = np.arange(rijen)
+    # on the sorted weights the smallest column i is paired with the
+    # largest j, until j drops below 1 and is paired with j - 1 itself.
+    # Every step finishes one column of every row, the last one keeps 1.
+    # The tables are flat, i and j index every row at once.
+    kans = np.ones(rijen * n)
+    alias = np.arange(rijen * n)
+    i = rij * n
+    j = i + n - 1
+    for _ in range(n - 1):
+        j_klein = q[j] < 1
+        klein = np.where(j_klein, j, i)
+        groot = j - j_klein
+        kans[klein] = q[klein]
+        alias[klein] = groot
+        q[groot] -= 1 - kans[klein]
+        i += ~j_klein
+        j = groot
+    kans = np.minimum(kans, 1).reshape(rijen, n)
+    alias = alias.reshape(rijen, n) - rij[:, None] * n
+    kolommen = np.empty_like(kans)
+    kolommen[rij[:, None], volgorde] = kans
+    aliassen = np.empty((rijen, n), dtype=np.int32)
+    aliassen[rij[:, None], volgorde] = np.take_along_axis(volgorde, alias, axis=1)
+    return kolommen, aliassen
 
 
-class WebsiteMaker:
+def _trek_alias(
+    rng: np.random.Generator, kans: np.ndarray, alias: np.ndarray, rijen: np.ndarray
+) -> np.ndarray:
     """
-    Creates a static html page
+    Draws a column from the alias table of every row in rijen
     """
+    kolom = rng.integers(0, kans.shape[1], len(rijen))
+    return np.where(rng.random(len(rijen)) < kans[rijen, kolom], kolom, alias[rijen, kolom])
 
-    def __init__(self):
-        self._json_file_path = "output/ritlog.json"
-        self._template_file_path = "input/viewer.html"
-        self._output_file_path = "site/index.html"
 
-    def generate_html(self):
+class VraagModel:
+    """
+    Time-of-day demand: for every hour of the day the departures per
+    minute of every station (vertrek, 24 x stations) and the weights
+    of the destinations from every station (bestemming, 24 x stations
+    x stations).
+
+    The model is derived from the stations with afgeleid or loaded
+    from a .npz file with those two arrays. The alias tables of an
+    hour are built when the hour is first needed and kept, so every
+    trip is drawn in O(1) and the tables change at hour boundaries.
+    """
+
+    # (hour, width in hours, +1 towards the centre or -1 out of it)
+    spitsen = ((8.0, 1.5, 1), (17.5, 2.0, -1))
+    spits_hoogte = 2.0
+    nacht = (22, 6)
+    nacht_vraag = 0.15
+    centrum = ("Antwerpen",)
+    pendel_sterkte = 0.5
+    min_buren = 5
+    # the radius queries of the GridIndex look a bit further than
+    # max_afstand, the distances of the matrix decide
+    straal_marge = 1.02
+
+    def __init__(
+        self, vertrek: np.ndarray, bestemming: np.ndarray, start_minuut: float = 0
+    ):
+        vertrek = np.asarray(vertrek, dtype=np.float64)
+        bestemming = np.asarray(bestemming)
+        stations = vertrek.shape[-1]
+        if vertrek.shape != (24, stations) or bestemming.shape != (
+            24,
+            stations,
+            stations,
+        ):
+            raise ValueError(
+                f"vraag model verwacht vertrek (24, {stations}) en bestemming "
+                f"(24, {stations}, {stations}), niet {vertrek.shape} en {bestemming.shape}"
+            )
+        self.vertrek = vertrek
+        self.bestemming = bestemming
+        self.start_minuut = start_minuut
+        self._tabellen = {}
+
+    @classmethod
+    def afgeleid(
+        cls,
+        capaciteit: np.ndarray,
+        districten: list,
+        afstanden: np.ndarray,
+        ruimte: GridIndex,
+        ritten_per_minuut: float,
+        schaal: float,
+        max_afstand: float,
+        start_minuut: float = 0,
+    ):
         """
-        Generates a static html page
+        Derives the demand from the stations: departures and destinations
+        in proportion to the capacity, in the morning mostly from the outer
+        districts to the centre and in the evening back. A destination
+        within max_afstand km (at least the min_buren nearest) has weight
+        exp(-afstand / schaal), schaal 0 weighs them all the same. The
+        neighbourhood of a station comes from the GridIndex ruimte.
         """
-        with open(self._json_file_path, "r", encoding="UTF-8") as json_file:
-            log_data = json.load(json_file)
+        capaciteit = np.asarray(capaciteit, dtype=np.float64)
+        afstanden = np.asarray(afstanden, dtype=np.float64)
+        stations = len(capaciteit)
+        uren = np.arange(24) + 0.5
+        profiel = np.where((uren > cls.nacht[1]) & (uren < cls.nacht[0]), 1.0, cls.nacht_vraag)
+        richting = np.zeros(24)
+        for uur, breedte, kant in cls.spitsen:
+            piek = np.exp(-(((uren - uur) / breedte) ** 2))
+            profiel += cls.spits_hoogte * piek
+            richting += kant * piek
+        profiel /= profiel.mean()
+        richting = richting[:, None] * cls.pendel_sterkte
+        # +1 for the outer districts, -1 for the centre
+        woon = np.array(
+            [-1.0 if district in cls.centrum else 1.0 for district in districten]
+        )
+        herkomst = capaciteit * (1 + richting * woon)
+        vertrek = (
+            herkomst / herkomst.sum(axis=1, keepdims=True)
+            * (ritten_per_minuut * profiel)[:, None]
+        )
+
+        buur = min(cls.min_buren, stations - 1)
+        verval = np.zeros_like(afstanden)
+        for positie in range(stations):
+            lat, lon = ruimte.lat[positie], ruimte.lon[positie]
+            buren = np.union1d(
+                ruimte.straal(lat, lon, max_afstand * cls.straal_marge),
+                ruimte.dichtste(lat, lon, buur + 1),
+            )
+            rij = afstanden[positie, buren]
+            grens = max(np.partition(rij, buur)[buur], max_afstand)
+            buren = buren[(rij <= grens) & (buren != positie)]
+            afstand = afstanden[positie, buren]
+            verval[positie, buren] = np.exp(-afstand / schaal) if schaal > 0 else 1
+        attractie = capaciteit * (1 - richting * woon)
+        bestemming = (verval[None, :, :] * attractie[:, None, :]).astype(np.float32)
+        return cls(vertrek, bestemming, start_minuut)
 
-        env = Environment(loader=FileSystemLoader("."))
-        template = env.get_template(self._template_file_path)
+    @classmethod
+    def uniform(cls, stations: int, ritten_per_minuut: float, start_minuut: float = 0):
+        """
+        The same departures from every station at every hour, to every
+        other station. With vraag_model uniform only the times of the
+        rides are drawn from it, the stations when a ride starts.
+        """
+        vertrek = np.full((24, stations), ritten_per_minuut / stations)
+        bestemming = np.ones((24, stations, stations), dtype=np.float32)
+        bestemming[:, np.arange(stations), np.arange(stations)] = 0
+        return cls(vertrek, bestemming, start_minuut)
 
-        rendered_html = template.render(data=log_data)
+    @classmethod
+    def laad(cls, pad: str, start_minuut: float = 0):
+        """
+        Loads a model from a .npz file with the arrays vertrek
+        and bestemming, in the station order of velo.json
+        """
+        with np.load(pad) as data:
+            return cls(data["vertrek"], data["bestemming"], start_minuut)
 
-        with open(self._output_file_path, "w", encoding="UTF-8") as output_file:
-            output_file.write(rendered_html)
+    def uur(self, tijd: float) -> int:
+        """
+        Returns the hour of the day at tijd minutes since start_datum
+        """
+        return int((self.start_minuut + tijd) // 60) % 24
 
+    def __tabellen(self, uur: int) -> tuple:
+        tabellen = self._tabellen.get(uur)
+        if tabellen is None:
+            # only a station with departures draws a destination,
+            # a shard has departures at its own stations only
+            bron = self.vertrek[uur] > 0
+            stations = len(bron)
+            rit_kans = np.ones((stations, stations))
+            rit_alias = np.tile(np.arange(stations, dtype=np.int32), (stations, 1))
+            if bron.any():
+                rit_kans[bron], rit_alias[bron] = _alias_tabellen(
+                    self.bestemming[uur][bron]
+                )
+            tabellen = (_alias_tabellen(self.vertrek[uur]), (rit_kans, rit_alias))
+            self._tabellen[uur] = tabellen
+        return tabellen
 
-class App:
+    def trek(
+        self, rng: np.random.Generator, begin: float, eind: float
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Draws the trips requested between begin and eind (minutes since
+        start_datum) as arrays of departure times, origins and destinations
+        """
+        tijden, starts, eindes = [], [], []
+        while begin < eind:
+            # the end of the hour begin falls in
+            grens = min(
+                eind, ((begin + self.start_minuut) // 60 + 1) * 60 - self.start_minuut
+            )
+            uur = self.uur(begin)
+            (kans, alias), (rit_kans, rit_alias) = self.__tabellen(uur)
+            aantal = rng.poisson(self.vertrek[uur].sum() * (grens - begin))
+            tijden.append(np.sort(begin + (grens - begin) * rng.random(aantal)))
+            herkomst = _trek_alias(rng, kans, alias, np.zeros(aantal, dtype=np.int64))
+            starts.append(herkomst)
+            eindes.append(_trek_alias(rng, rit_kans, rit_alias, herkomst))
+            begin = grens
+        return np.concatenate(tijden), np.concatenate(starts), np.concatenate(eindes)
+
+
+class Rebalancer:
     """
-    Deze class representeert onze simulator app
-    Deze wordt gebruikt om alle onderliggende code
-    te besturen.
+    Plans the transporter trips of a cycle
+
+    Every station has a target of doel_bezetting * capaciteit bikes.
+    A station above its target by more than marge * capaciteit has a
+    surplus down to the target, one below it by more than that a
+    deficit up to the target, bikes riding to a station count as
+    already there. Surplus and deficit stations are paired
+    greedily by distance, nearest pairs first, and a pair gets trips of
+    at most lading bikes until its surplus or deficit is gone. Every
+    transporter makes at most one trip per cycle.
     """
 
-    def __init__(self):
-        self._cycle = 0
-        self._ritten = []
-        self._stations = []
-        self._gebruikers = []
-        self._fietsen = []
-        self._transporteurs = []
-        self._willekeurigheid = 0
-        self._tijd_verhouding = 0
+    def __init__(self, doel_bezetting: float, marge: float, lading: int):
+        self.doel_bezetting = doel_bezetting
+        self.marge = marge
+        self.lading = lading
 
-    def setup(self) -> None:
+    def plan(
+        self,
+        state: FleetState,
+        afstanden: np.ndarray,
+        aantal_trips: int,
+        bezetting: np.ndarray | None = None,
+        stations: np.ndarray | None = None,
+        vastgehouden: np.ndarray | None = None,
+    ) -> list[tuple[int, int, int]]:
         """
-        Runs the program setup process:
+        Returns the trips as (start, eind, aantal fietsen), planned on
+        bezetting, the snapshot of the cycle, or else state.bezetting,
+        between the stations of the mask stations when it is given.
+        The vastgehouden slots of a shard are reserved for other shards,
+        not for bikes on their way.
+        """
+        capaciteit = state.capaciteit
+        if bezetting is None:
+            bezetting = state.bezetting
+        # bikes on their way count for the station they ride to
+        verwacht = bezetting + state.gereserveerd
+        if vastgehouden is not None:
+            verwacht = verwacht - vastgehouden
+        doel = np.rint(self.doel_bezetting * capaciteit).astype(np.int64)
+        marge = self.marge * capaciteit
+        overschot = np.where(
+            verwacht > doel + marge, np.minimum(verwacht - doel, bezetting), 0
+        )
+        tekort = np.where(verwacht < doel - marge, doel - verwacht, 0)
+        if stations is not None:
+            overschot = np.where(stations, overschot, 0)
+            tekort = np.where(stations, tekort, 0)
+        bronnen = np.flatnonzero(overschot)
+        putten = np.flatnonzero(tekort)
+        if aantal_trips <= 0 or len(bronnen) == 0 or len(putten) == 0:
+            return []
+
+        volgorde = np.argsort(afstanden[np.ix_(bronnen, putten)], axis=None)
+        rest_overschot = overschot[bronnen].tolist()
+        rest_tekort = tekort[putten].tolist()
+        bronnen_over, putten_over = len(bronnen), len(putten)
+        trips = []
+        for paar in volgorde.tolist():
+            bron, put = divmod(paar, len(putten))
+            if rest_overschot[bron] == 0 or rest_tekort[put] == 0:
+                continue
+            while rest_overschot[bron] > 0 and rest_tekort[put] > 0:
+                aantal = min(rest_overschot[bron], rest_tekort[put], self.lading)
+                trips.append((int(bronnen[bron]), int(putten[put]), int(aantal)))
+                rest_overschot[bron] -= aantal
+                rest_tekort[put] -= aantal
+                if len(trips) == aantal_trips:
+                    return trips
+            bronnen_over -= rest_overschot[bron] == 0
+            putten_over -= rest_tekort[put] == 0
+            if bronnen_over == 0 or putten_over == 0:
+                break
+        return trips
+
+
+class EventQueue:
+    """
+    Priority queue of timestamped events on a heapq heap
+
+    An event is a tuple (tijd, volgnummer, soort, uitvoerder, fiets,
+    start, eind), tijd in minutes since start_datum. Events at the
+    same time are handled in the order they were planned.
+    """
+
+    def __init__(self) -> None:
+        self._heap = []
+        self._volgnummer = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def plan(
+        self,
+        tijd: float,
+        soort: int,
+        uitvoerder: int = -1,
+        fiets: int = -1,
+        start: int = -1,
+        eind: int = -1,
+    ) -> None:
+        heapq.heappush(
+            self._heap, (tijd, self._volgnummer, soort, uitvoerder, fiets, start, eind)
+        )
+        self._volgnummer += 1
+
+    def tot(self, tijd: float):
+        """
+        Pops the events before tijd in order, events planned
+        meanwhile are included when they fall before tijd
+        """
+        heap = self._heap
+        while heap and heap[0][0] < tijd:
+            yield heapq.heappop(heap)
+
+    def tussen(self, events: list[tuple]):
+        """
+        Yields the events of a sorted list, the events planned
+        meanwhile that fall before one are popped before it
+        """
+        heap = self._heap
+        for event in events:
+            while heap and heap[0] < event:
+                yield heapq.heappop(heap)
+            yield event
+
+    def volgnummers(self, aantal: int) -> int:
+        """
+        Reserves aantal volgnummers for events
+        planned in bulk, returns the first
+        """
+        eerste = self._volgnummer
+        self._volgnummer += aantal
+        return eerste
+
+    def neem_tot(self, tijd: float) -> np.ndarray:
+        """
+        Pops the events before tijd as an EVENT_DTYPE array in order
+        """
+        return np.array(list(self.tot(tijd)), dtype=EVENT_DTYPE)
+
+    def zet_terug(self, events: np.ndarray) -> None:
+        """
+        Puts EVENT_DTYPE rows on the queue with their volgnummers
+        """
+        for event in events.tolist():
+            heapq.heappush(self._heap, event)
+
+    def naar_array(self) -> np.ndarray:
+        """
+        Returns the pending events as an EVENT_DTYPE array
+        """
+        return np.array(sorted(self._heap), dtype=EVENT_DTYPE)
+
+    @classmethod
+    def uit_array(cls, events: np.ndarray):
+        queue = cls()
+        # a sorted list is a valid heap
+        queue._heap = sorted(tuple(event) for event in events.tolist())
+        if queue._heap:
+            queue._volgnummer = max(event[1] for event in queue._heap) + 1
+        return queue
+
+
+class ShardVerdeling:
+    """
+    Partition of the stations over the shards of a sharded run
+
+    The stations start in one group per district, or in one group when
+    the partition is ruimtelijk. While there are fewer groups than shards
+    or a group carries more than the load of one shard, the heaviest
+    group is split in two at the weighted median of its longest axis.
+    The groups are then packed on the shards, heaviest first on the
+    lightest shard. The load of a station is its daily departures.
+
+    The users and the transporters are split in equal ranges, a shard
+    only draws its own users, so their ride counts stay exact, and
+    its own transporters rebalance its stations.
+
+    Instance attrbuten:
+        - shard_van [np.ndarray] (shard of every station)
+        - gebruikers [list[tuple[int, int]]] (range of users of every shard)
+        - transporteurs [list[tuple[int, int]]] (range of transporters
+          of every shard)
+    """
+
+    def __init__(
+        self,
+        shard_van: np.ndarray,
+        aantal_gebruikers: int,
+        aantal_transporteurs: int = 0,
+    ):
+        self.shard_van = np.asarray(shard_van, dtype=np.int32)
+        self.gebruikers = self.__bereiken(aantal_gebruikers)
+        self.transporteurs = self.__bereiken(aantal_transporteurs)
+
+    def __bereiken(self, aantal: int) -> list[tuple[int, int]]:
+        grenzen = np.linspace(0, aantal, self.aantal + 1).astype(np.int64)
+        return list(zip(grenzen[:-1].tolist(), grenzen[1:].tolist()))
+
+    @property
+    def aantal(self) -> int:
+        return int(self.shard_van.max()) + 1
+
+    def stroom(self, vertrek: np.ndarray, bestemming: np.ndarray) -> np.ndarray:
+        """
+        Returns the bikes per minute the stations of every shard send
+        to every station, for every hour (24 x shards x stations)
+        """
+        totaal = bestemming.sum(axis=2, keepdims=True)
+        kansen = bestemming / np.where(totaal > 0, totaal, 1)
+        per_station = vertrek[:, :, None] * kansen
+        stroom = np.zeros((24, self.aantal, len(self.shard_van)))
+        for nummer in range(self.aantal):
+            stroom[:, nummer] = per_station[:, self.shard_van == nummer].sum(axis=1)
+        return stroom
+
+    @classmethod
+    def verdeel(
+        cls,
+        aantal: int,
+        districten: list,
+        x: np.ndarray,
+        y: np.ndarray,
+        gewicht: np.ndarray,
+        aantal_gebruikers: int,
+        per_district: bool = True,
+        aantal_transporteurs: int = 0,
+    ):
+        """
+        Partitions the stations on aantal shards
+        """
+        gewicht = np.asarray(gewicht, dtype=np.float64)
+        aantal = max(1, min(aantal, len(gewicht)))
+        if per_district:
+            codes = {}
+            groep_van = np.array(
+                [codes.setdefault(district, len(codes)) for district in districten]
+            )
+            groepen = [np.flatnonzero(groep_van == code) for code in range(len(codes))]
+        else:
+            groepen = [np.arange(len(gewicht))]
+        # longitude in the units of latitude
+        x = np.asarray(x) * np.cos(np.radians(np.mean(y)))
+        y = np.asarray(y)
+        doel = gewicht.sum() / aantal
+        while True:
+            lasten = [gewicht[groep].sum() for groep in groepen]
+            zwaarste = int(np.argmax(lasten))
+            groep = groepen[zwaarste]
+            if len(groep) < 2 or (len(groepen) >= aantal and lasten[zwaarste] <= doel):
+                break
+            coordinaat = x if np.ptp(x[groep]) >= np.ptp(y[groep]) else y
+            groep = groep[np.argsort(coordinaat[groep], kind="stable")]
+            cumulatief = np.cumsum(gewicht[groep])
+            midden = int(np.searchsorted(cumulatief, cumulatief[-1] / 2))
+            midden = min(max(midden, 1), len(groep) - 1)
+            groepen[zwaarste : zwaarste + 1] = [groep[:midden], groep[midden:]]
+
+        shard_van = np.zeros(len(gewicht), dtype=np.int32)
+        lasten = np.zeros(aantal)
+        for groep in sorted(groepen, key=lambda groep: -gewicht[groep].sum()):
+            shard = int(np.argmin(lasten))
+            shard_van[groep] = shard
+            lasten[shard] += gewicht[groep].sum()
+        return cls(shard_van, aantal_gebruikers, aantal_transporteurs)
+
+
+class Shard:
+    """
+    The part of the simulation a shard process runs: its stations
+    and users, the bikes that leave for the stations of other
+    shards and what it knows of their free slots
+
+    Instance attrbuten:
+        - nummer [int]
+        - shard_van [np.ndarray] (shard of every station)
+        - gebruikers [tuple[int, int]] (range of its users)
+        - vrij [np.ndarray] (its share of the free slots of the stations
+          of other shards, counted down for the rides to them)
+        - vastgehouden [np.ndarray] (slots of its stations held free for
+          the shares of other shards, counted as reserved)
+        - uitgaand [list[tuple]] (arrivals at other shards, as events
+          without volgnummer)
+    """
+
+    # the metrics a shard counts for the coordinating App
+    tellers = (
+        "ritten",
+        "geweigerd_fiets",
+        "geweigerd_dok",
+        "omgeleid",
+        "transporteur_ritten",
+    )
+
+    def __init__(self, nummer: int, shard_van: np.ndarray, gebruikers: tuple):
+        self.nummer = nummer
+        self.shard_van = shard_van
+        self.eigen = shard_van == nummer
+        self.gebruikers = gebruikers
+        self.vrij = np.zeros(len(shard_van), dtype=np.int32)
+        self.vastgehouden = np.zeros(len(shard_van), dtype=np.int32)
+        self.uitgaand = []
+
+    def is_eigen(self, station: int) -> bool:
+        return self.shard_van[station] == self.nummer
+
+    def reserveer(self, station: int) -> bool:
+        """
+        Reserves a slot of a station of another shard,
+        as far as its share of the free slots lasts
+        """
+        if self.vrij[station] <= 0:
+            return False
+        self.vrij[station] -= 1
+        return True
+
+
+class Rit:
+    """
+    Deze class representeert een rit van
+    station A -> Station B met Fiets x
+
+    Een rit is een view op één record van een
+    ritten-array (RIT_DTYPE), deze klasse werkt als een log
+
+    Instance attrbuten:
+        - record [np.void] (RIT_DTYPE)
+        - app [App]
+    """
+
+    def __init__(self, record: np.void, app) -> None:
+        self._record = record
+        self._app = app
+
+    def getter(self) -> dict:
+        """
+        Returns certain attributes in a dictionary
+        """
+        record = self._record
+        app = self._app
+        tijd = app._sim_tijd(float(record["tijd"]) / app._tijd_verhouding).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+        if record["type"] == RIT_GEBRUIKER:
+            gebruiker_info = app._gebruiker(record["uitvoerder"]).getter()
+        else:
+            gebruiker_info = app._transporteurs[record["uitvoerder"]].getter()
+        gebruiker_info["aantal_ritten"] = int(record["aantal_ritten"])
+
+        fiets_info = app._fiets(record["fiets"]).getter()
+
+        start_station_info = app._stations[record["start"]].getter()
+        eind_station_info = app._stations[record["eind"]].getter()
+
+        attributes = {
+            "time": tijd,
+            "gebruiker": gebruiker_info,
+            "fiets": fiets_info,
+            "start_station": start_station_info,
+            "eind_station": eind_station_info,
+            "afstand": round(float(record["afstand"]), 2),
+            "geschatte_tijd": round(float(record["geschatte_tijd"]), 2),
+        }
+        if record["type"] == RIT_TRANSPORTEUR:
+            attributes["aantal_fietsen"] = int(record["aantal"])
+        return attributes
+
+
+class Gebruiker:
+    """
+    Deze class representeert een gebruiker,
+    een view op de FleetState
+
+    Instance attrbuten:
+        - _state [FleetState]
+        - _namen [dict[list[str]]] (de lijsten uit names.json)
+        - _nummer [int]
+    """
+
+    __slots__ = ("_state", "_namen", "_nummer")
+
+    def __init__(self, state: FleetState, namen: dict, nummer: int):
+        self._state = state
+        self._namen = namen
+        self._nummer = nummer
+
+    @property
+    def _voornaam(self) -> str:
+        lijst = (
+            "Mannen_Voornaam"
+            if self._state.geslacht[self._nummer] == 0
+            else "Vrouwen_Voornaam"
+        )
+        return self._namen[lijst][self._state.voornaam[self._nummer]]
+
+    @property
+    def _achternaam(self) -> str:
+        return self._namen["Achternaam"][self._state.achternaam[self._nummer]]
+
+    @property
+    def _aantal_ritten(self) -> int:
+        return int(self._state.aantal_ritten[self._nummer])
+
+    def getter(self) -> dict:
+        """
+        Returns certain attributes in a dictionary
+        """
+        attributes = {
+            "type": "Gebruiker",
+            "nummer": self._nummer,
+            "voornaam": self._voornaam,
+            "achternaam": self._achternaam,
+            "aantal_ritten": self._aantal_ritten,
+        }
+        return attributes
+
+
+class Fietstransporteur:
+    """
+    Deze class representeert een fietstransporteur
+    """
+
+    def __init__(self, nummer: int):
+        self._aantal_ritten = 0
+        self._nummer = nummer
+        self._vrij_vanaf = 0.0
+
+    def _verplaatsings_update(self):
+        """
+        Deze functie update een aantal instance attributen
+        """
+        self._aantal_ritten += 1
+
+    def __str__(self) -> str:
+        return f"{self._nummer}"
+
+    def getter(self) -> dict:
+        """
+        Returns certain attributes in a dictionary
+        """
+        attributes = {
+            "type": "Transporteur",
+            "nummer": self._nummer,
+            "aantal_ritten": self._aantal_ritten,
+        }
+        return attributes
+
+
+class Log:
+    """
+    Writes different events in a log file
+
+    The ride log is append-only JSON Lines: every cycle is one
+    record on its own line, so logging a cycle never rereads
+    or rewrites what is already on disk.
+
+    The log is split in segments of max_segment_size bytes or
+    max_segment_cycles cycles, named after their sequence number and
+    first cycle. Closed segments are gzipped by a background thread,
+    which also deletes the oldest segments when the log no longer
+    fits in max_total_log_size.
+
+    Serializing and writing happen on a writer thread: log_rit queues
+    a cycle in a queue of wachtrij_grootte cycles and only waits when
+    it is full. luisteraars are called with every line written.
+
+    In the compact formaat a ride is a list of ids and numbers instead
+    of the full records of its user, bike and stations. Those are
+    written to a dimensies file, named after the first cycle it applies
+    to, that is only replaced when its content changes.
+    """
+
+    max_total_log_size = 0
+    max_segment_size = 1024 * 1024
+    max_segment_cycles = 0
+    fsync_interval = 10
+    wachtrij_grootte = 64
+    batch_grootte = 16
+    flush_interval = 1.0
+    formaat = "volledig"
+    log_dir = "output/ritlog"
+    legacy_ritlogfiles = ("output/ritlog.json", "output/ritlog.jsonl")
+    segment_pattern = re.compile(r"^ritlog-(\d{6})-(\d{9})\.jsonl(\.gz)?$")
+    cycle_prefix = re.compile(r'^\{"cycle": (\d+)')
+    dimensie_pattern = re.compile(r"^dimensies-(\d{9})\.json$")
+    # the fields of a ride in the compact formaat
+    compacte_velden = (
+        "seconden",
+        "type",
+        "uitvoerder",
+        "fiets",
+        "start",
+        "eind",
+        "afstand",
+        "geschatte_tijd",
+        "aantal_ritten",
+        "aantal",
+    )
+
+    def __init__(self):
+        if Log.max_segment_size > Log.max_total_log_size:
+            raise LogSizeOverflow(
+                "A log segment does not fit in max_log_bestandsgrote."
+            )
+        os.makedirs(Log.log_dir, exist_ok=True)
+        self._file = None
+        self._segment_path = None
+        self._segment_size = 0
+        self._segment_cycles = 0
+        self._unsynced_cycles = 0
+        self._fout = None
+        self.geschreven_bytes = 0
+        # counted on the compression thread, read by -run for its metrics
+        self.verwijderde_segmenten = 0
+        self.luisteraars = []
+        segmenten = Log.segmenten()
+        self._volgend_segment = segmenten[-1][0] + 1 if segmenten else 1
+
+        self._compressie = queue.Queue()
+        self._compressor = threading.Thread(
+            target=self.__compress_worker, name="log-compressie", daemon=True
+        )
+        self._compressor.start()
+        for _, _, path in segmenten:
+            if path.endswith(".jsonl"):
+                # left uncompressed by an interrupted run
+                self._compressie.put(path)
+        self._compressie.put("")
+
+        self._wachtrij = queue.Queue(maxsize=Log.wachtrij_grootte)
+        self._schrijver = threading.Thread(
+            target=self.__schrijf_worker, name="log-schrijver", daemon=True
+        )
+        self._schrijver.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __sync(self):
+        """
+        Pushes the written records to disk
+        """
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced_cycles = 0
+
+    def __open_segment(self, cycle: int):
+        """
+        Starts a new segment with cycle as its first cycle
+        """
+        self._segment_path = os.path.join(
+            Log.log_dir, f"ritlog-{self._volgend_segment:06d}-{cycle:09d}.jsonl"
+        )
+        self._volgend_segment += 1
+        self._file = open(self._segment_path, "a", encoding="UTF-8")
+        self._segment_size = 0
+        self._segment_cycles = 0
+
+    def __close_segment(self):
+        """
+        Closes the active segment and hands it to the compressor
+        """
+        if self._file is None:
+            return
+        self.__sync()
+        self._file.close()
+        self._file = None
+        self._compressie.put(self._segment_path)
+
+    @staticmethod
+    def regel(cycle: int, ritten: list) -> str:
+        """
+        Returns the log line of the rides of one cycle
+        """
+        ritten_info = [rit.getter() for rit in ritten]
+        return json.dumps({"cycle": cycle, "events": ritten_info}) + "\n"
+
+    @staticmethod
+    def compacte_regel(cycle: int, ritten: np.ndarray) -> str:
+        """
+        Returns the compact log line of the rides (RIT_DTYPE) of one
+        cycle, the time in whole seconds since start_datum
+        """
+        kolommen = [
+            (ritten["tijd"] * 60).astype(np.int64).tolist(),
+            ritten["type"].tolist(),
+            ritten["uitvoerder"].tolist(),
+            ritten["fiets"].tolist(),
+            ritten["start"].tolist(),
+            ritten["eind"].tolist(),
+            np.round(ritten["afstand"].astype(np.float64), 2).tolist(),
+            np.round(ritten["geschatte_tijd"].astype(np.float64), 2).tolist(),
+            ritten["aantal_ritten"].tolist(),
+            ritten["aantal"].tolist(),
+        ]
+        return json.dumps({"cycle": cycle, "ritten": list(zip(*kolommen))}) + "\n"
+
+    @staticmethod
+    def schrijf_dimensies(cycle: int, dimensies: dict) -> None:
+        """
+        Writes the dimension tables for the cycles from cycle on,
+        unless they equal the tables already in use. Tables of
+        cycles after it belong to a run that was resumed earlier.
+        """
+        os.makedirs(Log.log_dir, exist_ok=True)
+        tekst = json.dumps(dimensies)
+        bestanden = Log.dimensies_bestanden()
+        while bestanden and bestanden[-1][0] >= cycle:
+            os.remove(bestanden.pop()[1])
+        if bestanden:
+            with open(bestanden[-1][1], "r", encoding="UTF-8") as file:
+                if file.read() == tekst:
+                    return
+        pad = os.path.join(Log.log_dir, f"dimensies-{cycle:09d}.json")
+        tijdelijk_pad = pad + ".tmp"
+        with open(tijdelijk_pad, "w", encoding="UTF-8") as file:
+            file.write(tekst)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tijdelijk_pad, pad)
+
+    @staticmethod
+    def dimensies_bestanden(log_dir: str | None = None) -> list[tuple[int, str]]:
+        """
+        Lists the dimension tables as (first cycle, path), oldest first
+        """
+        log_dir = Log.log_dir if log_dir is None else log_dir
+        if not os.path.isdir(log_dir):
+            return []
+        bestanden = []
+        for naam in os.listdir(log_dir):
+            match = Log.dimensie_pattern.match(naam)
+            if match is not None:
+                bestanden.append((int(match.group(1)), os.path.join(log_dir, naam)))
+        return sorted(bestanden)
+
+    def log_rit(self, cycle: int, ritten: list | np.ndarray) -> None:
+        """
+        Queues the rides of one cycle for the writer thread, waits
+        while the queue is full so the log can't fall behind unbounded.
+        The rides are Rit objects, or the rides array in the compact formaat
+        """
+        while True:
+            self.__controleer()
+            try:
+                self._wachtrij.put((cycle, ritten), timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def sync(self):
+        """
+        Waits until the queued cycles are written and
+        forces them to disk, done before every checkpoint
+        """
+        gesynct = threading.Event()
+        self._wachtrij.put(gesynct)
+        while not gesynct.wait(1):
+            self.__controleer()
+
+    def close(self):
+        """
+        Lets the writer drain the queue and close the active
+        segment, then waits until the compressor has finished
+        """
+        if self._schrijver.is_alive():
+            self._wachtrij.put(None)
+            self._schrijver.join()
+        if self._compressor.is_alive():
+            self._compressie.put(None)
+            self._compressor.join()
+        self.__controleer()
+
+    def __controleer(self):
+        """
+        Raises the error the writer thread stopped on, every time,
+        the cycles after it are lost
+        """
+        if self._fout is not None:
+            raise self._fout
+        if not self._schrijver.is_alive() and self._compressor.is_alive():
+            raise RuntimeError("de log schrijver is gestopt")
+
+    def __schrijf_worker(self):
+        """
+        Serializes and writes the queued cycles in batches of batch_grootte
+        cycles, a batch that isn't full is written after flush_interval
+        seconds. A threading.Event in the queue asks for a sync, None
+        closes the log.
+        """
+        batch = []
+        deadline = 0.0
+        try:
+            while True:
+                try:
+                    item = self._wachtrij.get(
+                        timeout=max(deadline - time.monotonic(), 0) if batch else None
+                    )
+                except queue.Empty:
+                    self.__schrijf_batch(batch)
+                    batch = []
+                    continue
+                if item is None or isinstance(item, threading.Event):
+                    self.__schrijf_batch(batch)
+                    batch = []
+                    if item is None:
+                        break
+                    self.__sync()
+                    item.set()
+                    continue
+                if not batch:
+                    deadline = time.monotonic() + Log.flush_interval
+                batch.append(item)
+                if len(batch) >= Log.batch_grootte:
+                    self.__schrijf_batch(batch)
+                    batch = []
+        except Exception as fout:
+            self._fout = fout
+        finally:
+            self.__close_segment()
+
+    def __schrijf_batch(self, batch: list):
+        for cycle, ritten in batch:
+            if Log.formaat == "compact":
+                line = Log.compacte_regel(cycle, ritten)
+            else:
+                line = Log.regel(cycle, ritten)
+            self.__schrijf_regel(cycle, line)
+            for luisteraar in self.luisteraars:
+                luisteraar(cycle, line)
+        if self._file is not None:
+            self._file.flush()
+
+    def __schrijf_regel(self, cycle: int, line: str):
+        """
+        Appends the log line of one cycle to the active segment
+        """
+        if self._file is None:
+            self.__open_segment(cycle)
+        self._file.write(line)
+        self._segment_size += len(line)
+        self._segment_cycles += 1
+        self.geschreven_bytes += len(line)
+
+        self._unsynced_cycles += 1
+        if self._unsynced_cycles >= Log.fsync_interval:
+            self.__sync()
+
+        if self._segment_size >= Log.max_segment_size or (
+            Log.max_segment_cycles and self._segment_cycles >= Log.max_segment_cycles
+        ):
+            self.__close_segment()
+
+    def __compress_worker(self):
+        """
+        Gzips closed segments and applies the retention policy,
+        an empty path only applies the retention policy
+        """
+        while True:
+            path = self._compressie.get()
+            if path is None:
+                return
+            if path:
+                Log.__compress(path)
+            self.__apply_retention()
+
+    @staticmethod
+    def __compress(path: str):
+        tijdelijk_pad = path + ".gz.tmp"
+        with open(path, "rb") as bron, gzip.open(tijdelijk_pad, "wb") as doel:
+            shutil.copyfileobj(bron, doel)
+        with open(tijdelijk_pad, "rb") as doel:
+            os.fsync(doel.fileno())
+        os.replace(tijdelijk_pad, path + ".gz")
+        os.remove(path)
+
+    def __apply_retention(self):
+        """
+        Deletes the oldest closed segments until the
+        whole log fits in max_total_log_size again
+        """
+        bestanden = [
+            path for path in Log.legacy_ritlogfiles if os.path.exists(path)
+        ] + [path for _, _, path in Log.segmenten()]
+        groottes = {path: os.path.getsize(path) for path in bestanden}
+        totaal = sum(groottes.values())
+        for path in bestanden:
+            if totaal <= Log.max_total_log_size:
+                break
+            segment = os.path.dirname(path) == Log.log_dir
+            if segment and path.endswith(".jsonl"):
+                # the active segment or one still waiting for compression
+                continue
+            os.remove(path)
+            totaal -= groottes[path]
+            self.verwijderde_segmenten += 1
+
+    @staticmethod
+    def segmenten(log_dir: str | None = None) -> list[tuple[int, int, str]]:
+        """
+        Lists the segments as (number, first cycle, path), oldest first,
+        a compressed segment is listed instead of its uncompressed original
+        """
+        log_dir = Log.log_dir if log_dir is None else log_dir
+        if not os.path.isdir(log_dir):
+            return []
+        segmenten = {}
+        for naam in os.listdir(log_dir):
+            match = Log.segment_pattern.match(naam)
+            if match is None:
+                continue
+            nummer = int(match.group(1))
+            if nummer in segmenten and not match.group(3):
+                continue
+            segmenten[nummer] = (nummer, int(match.group(2)), os.path.join(log_dir, naam))
+        return [segmenten[nummer] for nummer in sorted(segmenten)]
+
+    @staticmethod
+    def __open_bron(path: str):
+        if path.endswith(".gz"):
+            return gzip.open(path, "rt", encoding="UTF-8")
+        try:
+            return open(path, "r", encoding="UTF-8")
+        except FileNotFoundError:
+            # compressed while we were listing
+            return gzip.open(path + ".gz", "rt", encoding="UTF-8")
+
+    @staticmethod
+    def iter_cycles(vanaf_cycle: int = 0, log_dir: str | None = None):
+        """
+        Yields the logged cycles in order: the records of an old
+        ritlog.json and ritlog.jsonl first, followed by the segments.
+
+        Segments that end before vanaf_cycle are not opened, earlier
+        records in the others are skipped on their prefix without
+        decoding them
+        """
+        legacy_json, legacy_jsonl = Log.legacy_ritlogfiles
+        if os.path.exists(legacy_json):
+            with open(legacy_json, "r", encoding="UTF-8") as file:
+                for entry in json.load(file):
+                    if entry["cycle"] >= vanaf_cycle:
+                        yield entry
+        bronnen = [path for path in (legacy_jsonl,) if os.path.exists(path)]
+        segmenten = Log.segmenten(log_dir)
+        for positie, (_, _, path) in enumerate(segmenten):
+            volgende = segmenten[positie + 1] if positie + 1 < len(segmenten) else None
+            if volgende is not None and volgende[1] <= vanaf_cycle:
+                continue
+            bronnen.append(path)
+
+        for path in bronnen:
+            with Log.__open_bron(path) as file:
+                for line in file:
+                    if not line.endswith("\n"):
+                        # half-written record of an interrupted run
+                        break
+                    prefix = Log.cycle_prefix.match(line)
+                    if prefix is not None and int(prefix.group(1)) < vanaf_cycle:
+                        continue
+                    yield json.loads(line)
+
+
+class RitArchief:
+    """
+    Columnar copy of the ride log, for analysis
+
+    The rides are stored as NumPy structured arrays (ARCHIEF_DTYPE)
+    in .npy chunks of about chunk_rijen rides, named after their first
+    cycle, which can be memory-mapped instead of decoding the JSON log.
+
+    The last chunk stays open: sync rewrites it with the rides added
+    since, a full chunk is closed and the next one started. Opened at a
+    cycle, the rides from that cycle on are dropped, a run resumed from
+    a checkpoint adds them again.
+    """
+
+    archief_dir = "output/ritten"
+    chunk_rijen = 65536
+    chunk_pattern = re.compile(r"^ritten-(\d{9})\.npy$")
+    meta_naam = "meta.json"
+
+    def __init__(
+        self, vanaf_cycle: int, start_datum: datetime.datetime, aantal_stations: int
+    ):
+        os.makedirs(RitArchief.archief_dir, exist_ok=True)
+        with open(
+            os.path.join(RitArchief.archief_dir, RitArchief.meta_naam),
+            "w",
+            encoding="UTF-8",
+        ) as file:
+            json.dump(
+                {
+                    "start_datum": start_datum.isoformat(),
+                    "aantal_stations": aantal_stations,
+                },
+                file,
+            )
+        self._eerste_cycle = None
+        self._buffer = []
+        self._rijen = 0
+        self._gewijzigd = False
+        chunks = RitArchief.chunks()
+        while chunks and chunks[-1][0] >= vanaf_cycle:
+            os.remove(chunks.pop()[1])
+        if chunks:
+            eerste_cycle, pad = chunks[-1]
+            ritten = np.load(pad)
+            bewaard = ritten[ritten["cycle"] < vanaf_cycle]
+            if len(bewaard) < RitArchief.chunk_rijen:
+                # continue the last chunk
+                self._eerste_cycle = eerste_cycle
+                self._buffer.append(bewaard)
+                self._rijen = len(bewaard)
+                self._gewijzigd = len(bewaard) < len(ritten)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def voeg_toe(self, cycle: int, ritten: np.ndarray) -> None:
+        """
+        Adds the rides (RIT_DTYPE) of one cycle
+        """
+        if not len(ritten):
+            return
+        rijen = np.empty(len(ritten), dtype=ARCHIEF_DTYPE)
+        rijen["cycle"] = cycle
+        for naam, _ in ARCHIEF_DTYPE[1:]:
+            rijen[naam] = ritten[naam]
+        if self._eerste_cycle is None:
+            self._eerste_cycle = cycle
+        self._buffer.append(rijen)
+        self._rijen += len(rijen)
+        self._gewijzigd = True
+        if self._rijen >= RitArchief.chunk_rijen:
+            self.sync()
+            self._eerste_cycle = None
+            self._buffer = []
+            self._rijen = 0
+
+    def sync(self) -> None:
+        """
+        Writes the open chunk and forces it to disk,
+        done before every checkpoint
+        """
+        if not self._gewijzigd:
+            return
+        ritten = np.concatenate(self._buffer)
+        self._buffer = [ritten]
+        pad = os.path.join(
+            RitArchief.archief_dir, f"ritten-{self._eerste_cycle:09d}.npy"
+        )
+        tijdelijk_pad = pad + ".tmp"
+        with open(tijdelijk_pad, "wb") as file:
+            np.save(file, ritten)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tijdelijk_pad, pad)
+        self._gewijzigd = False
+
+    def close(self) -> None:
+        self.sync()
+
+    @staticmethod
+    def chunks(archief_dir: str | None = None) -> list[tuple[int, str]]:
+        """
+        Lists the chunks as (first cycle, path), oldest first
+        """
+        archief_dir = RitArchief.archief_dir if archief_dir is None else archief_dir
+        if not os.path.isdir(archief_dir):
+            return []
+        chunks = []
+        for naam in os.listdir(archief_dir):
+            match = RitArchief.chunk_pattern.match(naam)
+            if match is not None:
+                chunks.append((int(match.group(1)), os.path.join(archief_dir, naam)))
+        return sorted(chunks)
+
+    @staticmethod
+    def statistieken(archief_dir: str | None = None) -> dict[str, np.ndarray]:
+        """
+        Aggregates the archive chunk by chunk, every chunk is memory-mapped
+        and reduced with np.bincount. The station counts, the OD matrix
+        (start x eind) and the hours count the rides of users, the
+        transporter trips are counted apart. Hours are counted by hour of
+        the day and by hour since the start_datum of the run.
+        """
+        archief_dir = RitArchief.archief_dir if archief_dir is None else archief_dir
+        with open(
+            os.path.join(archief_dir, RitArchief.meta_naam), "r", encoding="UTF-8"
+        ) as file:
+            meta = json.load(file)
+        start_datum = datetime.datetime.fromisoformat(meta["start_datum"])
+        aantal = meta["aantal_stations"]
+        # minutes from midnight to start_datum
+        dag_offset = start_datum.hour * 60 + start_datum.minute
+        resultaat = {
+            "cycles": np.zeros(2, dtype=np.int64),
+            "vertrek": np.zeros(aantal, dtype=np.int64),
+            "aankomst": np.zeros(aantal, dtype=np.int64),
+            "od": np.zeros(aantal * aantal, dtype=np.int64),
+            "uur_van_de_dag": np.zeros(24, dtype=np.int64),
+            "uur": np.zeros(0, dtype=np.int64),
+            "gebruiker_ritten": np.zeros(0, dtype=np.int64),
+            "gebruiker_km": np.zeros(0),
+            "fiets_ritten": np.zeros(0, dtype=np.int64),
+            "fiets_km": np.zeros(0),
+            "transporteur_ritten": np.zeros(0, dtype=np.int64),
+            "transporteur_fietsen": np.zeros(0, dtype=np.int64),
+        }
+        eerste_cycle, laatste_cycle = None, None
+        for _, pad in RitArchief.chunks(archief_dir):
+            chunk = np.load(pad, mmap_mode="r")
+            if not len(chunk):
+                continue
+            if eerste_cycle is None:
+                eerste_cycle = int(chunk["cycle"][0])
+            laatste_cycle = int(chunk["cycle"][-1])
+            gebruiker = chunk["type"] == RIT_GEBRUIKER
+            ritten = chunk[gebruiker]
+            transport = chunk[~gebruiker]
+            start = ritten["start"].astype(np.int64)
+            eind = ritten["eind"].astype(np.int64)
+            afstand = ritten["afstand"].astype(np.float64)
+            minuten = ritten["tijd"].astype(np.int64)
+            resultaat["vertrek"] += np.bincount(start, minlength=aantal)
+            resultaat["aankomst"] += np.bincount(eind, minlength=aantal)
+            resultaat["od"] += np.bincount(start * aantal + eind, minlength=aantal**2)
+            resultaat["uur_van_de_dag"] += np.bincount(
+                (minuten + dag_offset) // 60 % 24, minlength=24
+            )
+            for naam, indices, gewichten in (
+                ("uur", minuten // 60, None),
+                ("gebruiker_ritten", ritten["uitvoerder"], None),
+                ("gebruiker_km", ritten["uitvoerder"], afstand),
+                ("fiets_ritten", ritten["fiets"], None),
+                ("fiets_km", ritten["fiets"], afstand),
+                ("transporteur_ritten", transport["uitvoerder"], None),
+                ("transporteur_fietsen", transport["uitvoerder"], transport["aantal"]),
+            ):
+                resultaat[naam] = _tel_op(resultaat[naam], indices, gewichten)
+        if eerste_cycle is not None:
+            resultaat["cycles"][:] = (eerste_cycle, laatste_cycle)
+        resultaat["od"] = resultaat["od"].reshape(aantal, aantal)
+        resultaat["transporteur_fietsen"] = resultaat["transporteur_fietsen"].astype(
+            np.int64
+        )
+        resultaat["start_datum"] = np.str_(meta["start_datum"])
+        return resultaat
+
+
+def _tel_op(
+    totaal: np.ndarray, indices: np.ndarray, gewichten: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    Adds np.bincount(indices, gewichten) to totaal,
+    which grows to the largest index
+    """
+    telling = np.bincount(indices, weights=gewichten, minlength=len(totaal))
+    telling[: len(totaal)] += totaal
+    return telling
+
+
+class RitDatabase:
+    """
+    The ride log in a SQLite database, for history lookups
+
+    The rides of a cycle are inserted with one executemany by a writer
+    thread, one transaction per cycle, the cycles that queued up while
+    a transaction ran go in the next one together. The table is indexed
+    on the bike, the user or transporter, the start and end station and
+    the cycle, so the rides of one of them are found without reading
+    the log. The database is in WAL mode, it can be queried while -run
+    writes it. Opened at a cycle, the rides from that cycle on are
+    deleted, a run resumed from a checkpoint adds them again.
+    """
+
+    database_pad = "output/ritten.sqlite"
+    dtype = [("cycle", "u8")] + RIT_DTYPE
+    wachtrij_grootte = 64
+    # in cycle order, a lookup reads the first rides
+    # of the index without sorting all of them
+    indexen = {
+        "ritten_fiets": ("fiets", "cycle"),
+        "ritten_uitvoerder": ("type", "uitvoerder", "cycle"),
+        "ritten_start": ("start", "cycle"),
+        "ritten_eind": ("eind", "cycle"),
+        "ritten_cycle": ("cycle",),
+    }
+
+    def __init__(self, vanaf_cycle: int, start_datum: datetime.datetime):
+        self._db = RitDatabase.verbind()
+        with self._db:
+            self._db.execute("DELETE FROM ritten WHERE cycle >= ?", (vanaf_cycle,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('start_datum', ?)",
+                (start_datum.isoformat(),),
+            )
+        self._insert = (
+            f"INSERT INTO ritten VALUES ({', '.join('?' * len(RitDatabase.dtype))})"
+        )
+        self._fout = None
+        self._wachtrij = queue.Queue(maxsize=RitDatabase.wachtrij_grootte)
+        self._schrijver = threading.Thread(
+            target=self.__schrijf_worker, name="database-schrijver", daemon=True
+        )
+        self._schrijver.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def verbind(pad: str | None = None) -> sqlite3.Connection:
+        """
+        Opens the database, with its tables and indexes
+        """
+        # opened by -run, used by the writer thread
+        db = sqlite3.connect(
+            RitDatabase.database_pad if pad is None else pad, check_same_thread=False
+        )
+        db.execute("PRAGMA journal_mode=WAL")
+        # a commit is safe against a crash of -run, sync
+        # makes it safe against a crash of the machine
+        db.execute("PRAGMA synchronous=NORMAL")
+        # the index pages of the random bikes and users stay in memory,
+        # and the WAL is copied to the database less often
+        db.execute("PRAGMA cache_size=-65536")
+        db.execute("PRAGMA wal_autocheckpoint=10000")
+        kolommen = ", ".join(
+            f"{naam} {'REAL' if np.dtype(soort).kind == 'f' else 'INTEGER'} NOT NULL"
+            for naam, soort in RitDatabase.dtype
+        )
+        with db:
+            db.execute(f"CREATE TABLE IF NOT EXISTS ritten ({kolommen})")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS meta (sleutel TEXT PRIMARY KEY, waarde TEXT)"
+            )
+            for naam, index in RitDatabase.indexen.items():
+                db.execute(
+                    f"CREATE INDEX IF NOT EXISTS {naam} ON ritten ({', '.join(index)})"
+                )
+        return db
+
+    def voeg_toe(self, cycle: int, ritten: np.ndarray) -> None:
+        """
+        Queues the rides (RIT_DTYPE) of one cycle for the writer
+        thread, waits while the queue is full
+        """
+        if not len(ritten):
+            return
+        while True:
+            self.__controleer()
+            try:
+                self._wachtrij.put((cycle, ritten), timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def sync(self) -> None:
+        """
+        Waits until the queued cycles are committed and forces
+        them to disk, done before every checkpoint
+        """
+        gesynct = threading.Event()
+        self._wachtrij.put(gesynct)
+        while not gesynct.wait(1):
+            self.__controleer()
+
+    def close(self) -> None:
+        """
+        Lets the writer commit the queue and close the database
+        """
+        if self._schrijver.is_alive():
+            self._wachtrij.put(None)
+            self._schrijver.join()
+        self.__controleer()
+
+    def __controleer(self) -> None:
+        """
+        Raises the error the writer thread stopped on, every time,
+        the cycles after it are lost
+        """
+        if self._fout is not None:
+            raise self._fout
+
+    def __schrijf_worker(self) -> None:
+        """
+        Inserts the queued cycles, those in the queue together in one
+        transaction. A threading.Event in the queue asks for a sync,
+        None closes the database.
+        """
+        try:
+            while True:
+                items = [self._wachtrij.get()]
+                with contextlib.suppress(queue.Empty):
+                    while True:
+                        items.append(self._wachtrij.get_nowait())
+                with self._db:
+                    for item in items:
+                        if isinstance(item, tuple):
+                            cycle, ritten = item
+                            self._db.executemany(
+                                self._insert,
+                                ((cycle, *rit) for rit in ritten.tolist()),
+                            )
+                for item in items:
+                    if isinstance(item, threading.Event):
+                        self._db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                        item.set()
+                if any(item is None for item in items):
+                    self._db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                    return
+        except Exception as fout:
+            self._fout = fout
+        finally:
+            self._db.close()
+
+    @staticmethod
+    def zoek(
+        fiets: int | None = None,
+        gebruiker: int | None = None,
+        transporteur: int | None = None,
+        station: int | None = None,
+        van_cycle: int | None = None,
+        tot_cycle: int | None = None,
+        limiet: int | None = 100,
+        pad: str | None = None,
+    ) -> np.ndarray:
+        """
+        Returns the rides of a bike, user, transporter and/or station
+        (start or end), from van_cycle until tot_cycle, in time order.
+        Returns at most limiet rides, None returns all of them.
+        """
+        voorwaarden, parameters = [], []
+        if fiets is not None:
+            voorwaarden.append("fiets = ?")
+            parameters.append(fiets)
+        for soort, uitvoerder in (
+            (RIT_GEBRUIKER, gebruiker),
+            (RIT_TRANSPORTEUR, transporteur),
+        ):
+            if uitvoerder is not None:
+                voorwaarden.append("type = ? AND uitvoerder = ?")
+                parameters.extend((soort, uitvoerder))
+        if van_cycle is not None:
+            voorwaarden.append("cycle >= ?")
+            parameters.append(van_cycle)
+        if tot_cycle is not None:
+            voorwaarden.append("cycle < ?")
+            parameters.append(tot_cycle)
+        if station is None:
+            takken = [(voorwaarden, parameters)]
+        else:
+            # the departures and the arrivals each from their own index
+            takken = [
+                (voorwaarden + ["start = ?"], parameters + [station]),
+                (
+                    voorwaarden + ["eind = ?", "start != ?"],
+                    parameters + [station, station],
+                ),
+            ]
+        limiet = -1 if limiet is None else limiet
+        kolommen = ", ".join(naam for naam, _ in RitDatabase.dtype)
+        selecties, waarden = [], []
+        for voorwaarden, parameters in takken:
+            selecties.append(
+                f"SELECT * FROM (SELECT {kolommen} FROM ritten "
+                f"WHERE {' AND '.join(voorwaarden) or '1'} "
+                "ORDER BY cycle, tijd LIMIT ?)"
+            )
+            waarden.extend(parameters + [limiet])
+        with contextlib.closing(RitDatabase.verbind(pad)) as db:
+            rijen = db.execute(
+                f"{' UNION ALL '.join(selecties)} ORDER BY cycle, tijd LIMIT ?",
+                waarden + [limiet],
+            ).fetchall()
+        return np.array(rijen, dtype=RitDatabase.dtype)
+
+    @staticmethod
+    def start_datum(pad: str | None = None) -> datetime.datetime | None:
+        """
+        Returns the start_datum of the run that wrote the database
+        """
+        with contextlib.closing(RitDatabase.verbind(pad)) as db:
+            rij = db.execute(
+                "SELECT waarde FROM meta WHERE sleutel = 'start_datum'"
+            ).fetchone()
+        return None if rij is None else datetime.datetime.fromisoformat(rij[0])
+
+
+class BezettingsReeks:
+    """
+    The occupancy of every station after the rides of every cycle
+
+    A (cycles x stations) uint16 matrix, memory-mapped from
+    reeks_dir/bezetting.u16, row i holds the cycle eerste_cycle + i.
+    The file grows chunk_cycles rows at a time, so a snapshot is the
+    copy of one row. meta.json holds the first cycle, the cycles synced,
+    the capacities, the start_datum and the tijd_verhouding, the rows
+    after them are not synced yet. Opened at a cycle, the rows from that
+    cycle on are overwritten, a matrix of other stations or that doesn't
+    reach the cycle is started over.
+    """
+
+    reeks_dir = "output/bezetting"
+    matrix_naam = "bezetting.u16"
+    meta_naam = "meta.json"
+    chunk_cycles = 1440
+    # rows per block of the queries, a block is read in one go
+    blok_rijen = 65536
+
+    def __init__(
+        self,
+        vanaf_cycle: int,
+        capaciteit: np.ndarray,
+        start_datum: datetime.datetime,
+        tijd_verhouding: float,
+        reeks_dir: str | None = None,
+    ):
+        reeks_dir = BezettingsReeks.reeks_dir if reeks_dir is None else reeks_dir
+        self.capaciteit = capaciteit
+        self._reeks_dir = reeks_dir
+        self._meta = {
+            "eerste_cycle": vanaf_cycle,
+            "cycles": 0,
+            "capaciteit": capaciteit.tolist(),
+            "start_datum": start_datum.isoformat(),
+            "tijd_verhouding": tijd_verhouding,
+        }
+        self._matrix = None
+        os.makedirs(reeks_dir, exist_ok=True)
+        meta = BezettingsReeks.lees_meta(reeks_dir)
+        if (
+            meta is not None
+            and all(
+                meta[sleutel] == self._meta[sleutel]
+                for sleutel in ("capaciteit", "start_datum", "tijd_verhouding")
+            )
+            and meta["eerste_cycle"]
+            <= vanaf_cycle
+            <= meta["eerste_cycle"] + meta["cycles"]
+        ):
+            self._meta["eerste_cycle"] = meta["eerste_cycle"]
+            self._meta["cycles"] = vanaf_cycle - meta["eerste_cycle"]
+        else:
+            # another run, its matrix is started over
+            open(os.path.join(reeks_dir, BezettingsReeks.matrix_naam), "wb").close()
+        self.__groei(self._meta["cycles"] + 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __groei(self, rijen: int) -> None:
+        """
+        Makes room for at least rijen rows, in whole chunks, the file
+        is extended and mapped again, the rows are not copied
+        """
+        aantal = len(self.capaciteit)
+        chunk = BezettingsReeks.chunk_cycles
+        ruimte = -(-rijen // chunk) * chunk
+        pad = os.path.join(self._reeks_dir, BezettingsReeks.matrix_naam)
+        if self._matrix is not None:
+            self._matrix.flush()
+        # the old mapping is released before the file is extended
+        self._matrix = None
+        with open(pad, "r+b") as file:
+            file.seek(0, os.SEEK_END)
+            if file.tell() < ruimte * aantal * 2:
+                file.truncate(ruimte * aantal * 2)
+            else:
+                ruimte = file.tell() // (aantal * 2)
+        self._matrix = np.memmap(
+            pad, dtype=np.uint16, mode="r+", shape=(ruimte, aantal)
+        )
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """
+        The rows recorded so far
+        """
+        return self._matrix[: self._meta["cycles"]]
+
+    def neem(self, cycle: int, bezetting: np.ndarray) -> np.ndarray:
+        """
+        Records the occupancy of the stations at cycle, the cycle after
+        the last one recorded, and returns its row
+        """
+        rij = cycle - self._meta["eerste_cycle"]
+        if rij >= len(self._matrix):
+            self.__groei(rij + 1)
+        self._matrix[rij] = bezetting
+        self._meta["cycles"] = rij + 1
+        return self._matrix[rij]
+
+    def sync(self) -> None:
+        """
+        Forces the recorded rows to disk and then the meta data,
+        done before every checkpoint
+        """
+        self._matrix.flush()
+        pad = os.path.join(self._reeks_dir, BezettingsReeks.meta_naam)
+        tijdelijk_pad = pad + ".tmp"
+        with open(tijdelijk_pad, "w", encoding="UTF-8") as file:
+            json.dump(self._meta, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tijdelijk_pad, pad)
+
+    def close(self) -> None:
+        self.sync()
+
+    @staticmethod
+    def lees_meta(reeks_dir: str | None = None) -> dict | None:
+        """
+        Returns the meta data of the matrix, None when there is none
+        """
+        reeks_dir = BezettingsReeks.reeks_dir if reeks_dir is None else reeks_dir
+        pad = os.path.join(reeks_dir, BezettingsReeks.meta_naam)
+        if not os.path.exists(pad):
+            return None
+        with open(pad, "r", encoding="UTF-8") as file:
+            return json.load(file)
+
+    @staticmethod
+    def laad(reeks_dir: str | None = None) -> tuple[np.ndarray, dict] | None:
+        """
+        Memory-maps the synced rows read-only, with the meta data,
+        None when no cycle was recorded
+        """
+        reeks_dir = BezettingsReeks.reeks_dir if reeks_dir is None else reeks_dir
+        meta = BezettingsReeks.lees_meta(reeks_dir)
+        if meta is None or not meta["cycles"]:
+            return None
+        matrix = np.memmap(
+            os.path.join(reeks_dir, BezettingsReeks.matrix_naam),
+            dtype=np.uint16,
+            mode="r",
+            shape=(meta["cycles"], len(meta["capaciteit"])),
+        )
+        return matrix, meta
+
+    @staticmethod
+    def station_minuten(
+        matrix: np.ndarray, capaciteit: np.ndarray, tijd_verhouding: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the minutes every station was empty and was full
+        """
+        leeg = np.zeros(matrix.shape[1], dtype=np.int64)
+        vol = np.zeros(matrix.shape[1], dtype=np.int64)
+        for begin in range(0, len(matrix), BezettingsReeks.blok_rijen):
+            blok = matrix[begin : begin + BezettingsReeks.blok_rijen]
+            leeg += np.count_nonzero(blok == 0, axis=0)
+            vol += np.count_nonzero(blok >= capaciteit, axis=0)
+        return leeg * tijd_verhouding, vol * tijd_verhouding
+
+    @staticmethod
+    def heatmap(
+        matrix: np.ndarray, capaciteit: np.ndarray, groepen: np.ndarray, aantal: int
+    ) -> np.ndarray:
+        """
+        Returns the mean fraction of the slots taken (aantal groups x
+        stations), groepen holds the group of every row. A group
+        without rows is NaN.
+        """
+        stations = matrix.shape[1]
+        som = np.zeros(aantal * stations)
+        rijen = np.zeros(aantal)
+        for begin in range(0, len(matrix), BezettingsReeks.blok_rijen):
+            blok = matrix[begin : begin + BezettingsReeks.blok_rijen]
+            groep = groepen[begin : begin + len(blok)].astype(np.int64)
+            cellen = groep[:, np.newaxis] * stations + np.arange(stations)
+            som += np.bincount(
+                cellen.ravel(), weights=blok.ravel(), minlength=aantal * stations
+            )
+            rijen += np.bincount(groep, minlength=aantal)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            gemiddeld = som.reshape(aantal, stations) / rijen[:, np.newaxis]
+        return gemiddeld / np.maximum(capaciteit, 1)
+
+    @staticmethod
+    def uur_van_de_dag(meta: dict, rijen: int) -> np.ndarray:
+        """
+        Returns the hour of the day of the first rijen rows,
+        a row is recorded at the end of its cycle
+        """
+        start_datum = datetime.datetime.fromisoformat(meta["start_datum"])
+        cycles = meta["eerste_cycle"] + 1 + np.arange(rijen)
+        minuten = cycles * meta["tijd_verhouding"] + (
+            start_datum.hour * 60 + start_datum.minute
+        )
+        return (minuten // 60 % 24).astype(np.int64)
+
+
+class Metrics:
+    """
+    Per-cycle metrics of a run
+
+    Every cycle becomes one METRIC_DTYPE record in a fixed-size ring
+    buffer, so the last cycles can always be inspected without the
+    memory growing with the run. The records are exported as:
+        - a Prometheus text file (output/metrics.prom), rewritten
+          every export_interval cycles, with counters over the whole
+          run, also the sum and count of the cycle time summary, and
+          the quantiles of the cycle time over the buffer
+        - a JSON Lines stream (output/metrics.jsonl), one line per cycle
+    """
+
+    prometheus_pad = "output/metrics.prom"
+    jsonl_pad = "output/metrics.jsonl"
+    fases = ("generatie", "rebalancing", "log", "checkpoint", "slaap")
+    tellers = (
+        "ritten",
+        "geweigerd_fiets",
+        "geweigerd_dok",
+        "omgeleid",
+        "transporteur_ritten",
+        "log_bytes",
+        "log_verwijderd",
+    )
+
+    def __init__(
+        self,
+        capaciteit: int = 1024,
+        prometheus: bool = False,
+        jsonl: bool = False,
+        export_interval: int = 10,
+    ):
+        self._buffer = np.zeros(capaciteit, METRIC_DTYPE)
+        self._aantal = 0
+        self._prometheus = prometheus
+        self._export_interval = max(export_interval, 1)
+        self._jsonl = open(Metrics.jsonl_pad, "a", encoding="UTF-8") if jsonl else None
+        self._totalen = dict.fromkeys(Metrics.tellers, 0)
+        self._fase_totalen = dict.fromkeys(Metrics.fases, 0.0)
+        # the sum of the cycle times, the count is _aantal
+        self._cycle_seconden = 0.0
+        self.huidig = dict.fromkeys(METRIC_NAMEN, 0)
+
+    def begin(self, cycle: int) -> None:
+        """
+        Starts the record of a new cycle
+        """
+        self.huidig = dict.fromkeys(METRIC_NAMEN, 0)
+        self.huidig["cycle"] = cycle
+        self.huidig["start"] = time.time()
+
+    @contextlib.contextmanager
+    def fase(self, naam: str):
+        """
+        Adds the wall time of the block to a fase of the current cycle
+        """
+        tic = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.huidig[naam] += time.perf_counter() - tic
+
+    def sluit_cycle(self, lege_stations: int, volle_stations: int) -> None:
+        """
+        Stores the current cycle in the ring buffer and exports it
+        """
+        huidig = self.huidig
+        huidig["lege_stations"] = lege_stations
+        huidig["volle_stations"] = volle_stations
+        huidig["totaal"] = sum(huidig[fase] for fase in Metrics.fases)
+        for teller in Metrics.tellers:
+            self._totalen[teller] += huidig[teller]
+        for fase in Metrics.fases:
+            self._fase_totalen[fase] += huidig[fase]
+        self._cycle_seconden += huidig["totaal"]
+        self._buffer[self._aantal % len(self._buffer)] = tuple(
+            huidig[naam] for naam in METRIC_NAMEN
+        )
+        self._aantal += 1
+        if self._jsonl is not None:
+            self._jsonl.write(json.dumps(huidig) + "\n")
+        if self._prometheus and self._aantal % self._export_interval == 0:
+            self.schrijf_prometheus()
+
+    def laatste(self, aantal: int | None = None) -> np.ndarray:
+        """
+        Returns the last cycles in the buffer, oldest first
+        """
+        bewaard = min(self._aantal, len(self._buffer))
+        aantal = bewaard if aantal is None else min(aantal, bewaard)
+        posities = np.arange(self._aantal - aantal, self._aantal) % len(self._buffer)
+        return self._buffer[posities]
+
+    def prometheus(self) -> str:
+        """
+        Returns the metrics in the Prometheus text format
+        """
+        regels = [
+            "# HELP velosim_cycle Last finished cycle.",
+            "# TYPE velosim_cycle gauge",
+            f"velosim_cycle {self.huidig['cycle']}",
+            "# HELP velosim_lege_stations Stations without bikes.",
+            "# TYPE velosim_lege_stations gauge",
+            f"velosim_lege_stations {self.huidig['lege_stations']}",
+            "# HELP velosim_volle_stations Stations without free docks.",
+            "# TYPE velosim_volle_stations gauge",
+            f"velosim_volle_stations {self.huidig['volle_stations']}",
+            "# HELP velosim_ritten_total Rides served.",
+            "# TYPE velosim_ritten_total counter",
+            f"velosim_ritten_total {self._totalen['ritten']}",
+            "# HELP velosim_geweigerd_total Rides rejected, by missing resource.",
+            "# TYPE velosim_geweigerd_total counter",
+            f'velosim_geweigerd_total{{reden="fiets"}} {self._totalen["geweigerd_fiets"]}',
+            f'velosim_geweigerd_total{{reden="dok"}} {self._totalen["geweigerd_dok"]}',
+            "# HELP velosim_omgeleid_total Bikes sent to another dock on arrival.",
+            "# TYPE velosim_omgeleid_total counter",
+            f"velosim_omgeleid_total {self._totalen['omgeleid']}",
+            "# HELP velosim_transporteur_ritten_total Transporter trips.",
+            "# TYPE velosim_transporteur_ritten_total counter",
+            f"velosim_transporteur_ritten_total {self._totalen['transporteur_ritten']}",
+            "# HELP velosim_log_bytes_total Bytes written to the ride log.",
+            "# TYPE velosim_log_bytes_total counter",
+            f"velosim_log_bytes_total {self._totalen['log_bytes']}",
+            "# HELP velosim_log_verwijderd_total Log segments removed by the size limit.",
+            "# TYPE velosim_log_verwijderd_total counter",
+            f"velosim_log_verwijderd_total {self._totalen['log_verwijderd']}",
+            "# HELP velosim_fase_seconden_total Wall time spent per fase.",
+            "# TYPE velosim_fase_seconden_total counter",
+        ]
+        regels += [
+            f'velosim_fase_seconden_total{{fase="{fase}"}} {seconden:.6f}'
+            for fase, seconden in self._fase_totalen.items()
+        ]
+        laatste = self.laatste()
+        if len(laatste):
+            regels += [
+                "# HELP velosim_cycle_seconden Wall time per cycle, "
+                "quantiles over the last cycles.",
+                "# TYPE velosim_cycle_seconden summary",
+            ]
+            kwantielen = (0.5, 0.9, 0.99, 1.0)
+            waarden = np.quantile(laatste["totaal"], kwantielen)
+            regels += [
+                f'velosim_cycle_seconden{{quantile="{kwantiel}"}} {waarde:.6f}'
+                for kwantiel, waarde in zip(kwantielen, waarden)
+            ]
+            regels += [
+                f"velosim_cycle_seconden_sum {self._cycle_seconden:.6f}",
+                f"velosim_cycle_seconden_count {self._aantal}",
+            ]
+        return "\n".join(regels) + "\n"
+
+    def schrijf_prometheus(self) -> None:
+        tijdelijk_pad = Metrics.prometheus_pad + ".tmp"
+        with open(tijdelijk_pad, "w", encoding="UTF-8") as file:
+            file.write(self.prometheus())
+        os.replace(tijdelijk_pad, Metrics.prometheus_pad)
+
+    def close(self) -> None:
+        if self._prometheus and self._aantal:
+            self.schrijf_prometheus()
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+class WebsiteMaker:
+    """
+    Creates a static html site from the ride log
+
+    Every cycles_per_pagina cycles get their own page, index.html
+    lists the pages. The log is streamed page by page, and the last
+    rendered cycle is remembered in site/viewer_state.json so a next
+    run only renders the last page again and the new ones.
+
+    Cycles of a compact log are joined with their
+    dimension tables to the full records.
+    """
+
+    cycles_per_pagina = 50
+
+    def __init__(self):
+        self._template_dir = "input"
+        self._output_dir = "site"
+        self._state_file_path = "site/viewer_state.json"
+        self._dimensies_bestanden = None
+        self._dimensies_pad = None
+        self._dimensies = None
+
+    def generate_html(self):
+        """
+        Renders the pages with new cycles and the index page
+        """
+        state = self.__load_state()
+        per_pagina = state["cycles_per_pagina"]
+        paginas = {pagina["nummer"]: pagina for pagina in state["paginas"]}
+        env = jinja2.Environment(loader=jinja2.FileSystemLoader(self._template_dir))
+        pagina_template = env.get_template("viewer_pagina.html")
+
+        eerste_pagina = max(state["laatste_cycle"], 0) // per_pagina
+        huidige_pagina = None
+        cycles = []
+        for entry in Log.iter_cycles(vanaf_cycle=eerste_pagina * per_pagina):
+            if "ritten" in entry:
+                entry = self.__voeg_samen(entry)
+            nummer = entry["cycle"] // per_pagina
+            if nummer != huidige_pagina:
+                if cycles:
+                    paginas[huidige_pagina] = self.__render_pagina(
+                        pagina_template, huidige_pagina, cycles, volgende=nummer
+                    )
+                huidige_pagina = nummer
+                cycles = []
+            cycles.append(entry)
+            state["laatste_cycle"] = max(state["laatste_cycle"], entry["cycle"])
+        if cycles:
+            paginas[huidige_pagina] = self.__render_pagina(
+                pagina_template, huidige_pagina, cycles, volgende=None
+            )
+
+        state["paginas"] = [paginas[nummer] for nummer in sorted(paginas)]
+        index_template = env.get_template("viewer_index.html")
+        self.__write(
+            os.path.join(self._output_dir, "index.html"),
+            index_template.generate(
+                paginas=state["paginas"], bezetting=self.__bezetting()
+            ),
+        )
+        self.__write(self._state_file_path, [json.dumps(state)])
+
+    def __load_state(self) -> dict:
+        """
+        Loads what was rendered by the previous run, starts over
+        when there is none or the page size changed
+        """
+        leeg = {
+            "cycles_per_pagina": WebsiteMaker.cycles_per_pagina,
+            "laatste_cycle": -1,
+            "paginas": [],
+        }
+        if not os.path.exists(self._state_file_path):
+            return leeg
+        with open(self._state_file_path, "r", encoding="UTF-8") as file:
+            state = json.load(file)
+        if state["cycles_per_pagina"] != WebsiteMaker.cycles_per_pagina:
+            return leeg
+        return state
+
+    def __render_pagina(
+        self, template, nummer: int, cycles: list, volgende: int | None
+    ) -> dict:
+        """
+        Renders one page and returns its entry for the index
+        """
+        pagina = {
+            "nummer": nummer,
+            "bestand": self.__bestandsnaam(nummer),
+            "eerste_cycle": cycles[0]["cycle"],
+            "laatste_cycle": cycles[-1]["cycle"],
+            "van": next(
+                (entry["events"][0]["time"] for entry in cycles if entry["events"]), ""
+            ),
+            "tot": next(
+                (
+                    entry["events"][-1]["time"]
+                    for entry in reversed(cycles)
+                    if entry["events"]
+                ),
+                "",
+            ),
+            "ritten": sum(len(entry["events"]) for entry in cycles),
+        }
+        self.__write(
+            os.path.join(self._output_dir, pagina["bestand"]),
+            template.generate(
+                data=cycles,
+                pagina=pagina,
+                vorige=self.__bestandsnaam(nummer - 1) if nummer > 0 else None,
+                volgende=None if volgende is None else self.__bestandsnaam(volgende),
+            ),
+        )
+        return pagina
+
+    def __bezetting(self) -> list[dict] | None:
+        """
+        The occupancy heatmap of the index page, per station the mean
+        percentage of its slots taken in every hour of the day (None
+        for an hour without cycles), None without a BezettingsReeks
+        """
+        # numpy is only imported when there is a matrix
+        if BezettingsReeks.lees_meta() is None:
+            return None
+        reeks = BezettingsReeks.laad()
+        if reeks is None:
+            return None
+        matrix, meta = reeks
+        heatmap = BezettingsReeks.heatmap(
+            matrix,
+            np.array(meta["capaciteit"]),
+            BezettingsReeks.uur_van_de_dag(meta, len(matrix)),
+            24,
+        )
+        catalogus = StationCatalogus.laad()
+        return [
+            {
+                "naam": catalogus.beschrijving(positie),
+                "procenten": [
+                    None if fractie != fractie else round(fractie * 100)
+                    for fractie in uren
+                ],
+            }
+            for positie, uren in enumerate(heatmap.T.tolist())
+        ]
+
+    def __bestandsnaam(self, nummer: int) -> str:
+        return f"pagina-{nummer:05d}.html"
+
+    def __voeg_samen(self, entry: dict) -> dict:
+        """
+        Returns a cycle of the compact log with the full records,
+        as Log.regel writes them
+        """
+        cycle = entry["cycle"]
+        if self._dimensies_bestanden is None:
+            self._dimensies_bestanden = Log.dimensies_bestanden()
+        bestanden = self._dimensies_bestanden
+        # the last tables that apply to the cycle
+        pad = next(
+            (pad for eerste, pad in reversed(bestanden) if eerste <= cycle),
+            bestanden[0][1],
+        )
+        if pad != self._dimensies_pad:
+            with open(pad, "r", encoding="UTF-8") as file:
+                self._dimensies = json.load(file)
+            self._dimensies["start_datum"] = datetime.datetime.fromisoformat(
+                self._dimensies["start_datum"]
+            )
+            self._dimensies_pad = pad
+        dimensies = self._dimensies
+        namen = dimensies["namen"]
+        gebruikers = dimensies["gebruikers"]
+        stations = dimensies["stations"]
+
+        events = []
+        for rit in entry["ritten"]:
+            rit = dict(zip(Log.compacte_velden, rit))
+            nummer = rit["uitvoerder"]
+            if rit["type"] == RIT_GEBRUIKER:
+                voornamen = (
+                    "Mannen_Voornaam"
+                    if gebruikers["geslacht"][nummer] == 0
+                    else "Vrouwen_Voornaam"
+                )
+                gebruiker = {
+                    "type": "Gebruiker",
+                    "nummer": nummer,
+                    "voornaam": namen[voornamen][gebruikers["voornaam"][nummer]],
+                    "achternaam": namen["Achternaam"][gebruikers["achternaam"][nummer]],
+                    "aantal_ritten": rit["aantal_ritten"],
+                }
+            else:
+                gebruiker = {
+                    "type": "Transporteur",
+                    "nummer": nummer,
+                    "aantal_ritten": rit["aantal_ritten"],
+                }
+            tijd = dimensies["start_datum"] + datetime.timedelta(seconds=rit["seconden"])
+            event = {
+                "time": tijd.strftime("%Y-%m-%d %H:%M:%S"),
+                "gebruiker": gebruiker,
+                "fiets": {"nummer": rit["fiets"]},
+                "start_station": stations[rit["start"]],
+                "eind_station": stations[rit["eind"]],
+                "afstand": rit["afstand"],
+                "geschatte_tijd": rit["geschatte_tijd"],
+            }
+            if rit["type"] == RIT_TRANSPORTEUR:
+                event["aantal_fietsen"] = rit["aantal"]
+            events.append(event)
+        return {"cycle": cycle, "events": events}
+
+    def __write(self, path: str, chunks):
+        """
+        Streams the chunks into path through a temporary file
+        """
+        tijdelijk_pad = path + ".tmp"
+        with open(tijdelijk_pad, "w", encoding="UTF-8") as output_file:
+            output_file.writelines(chunks)
+        os.replace(tijdelijk_pad, path)
+
+
+class LiveServer:
+    """
+    Local HTTP server that streams the cycles of a running
+    simulation to the browser with Server-Sent Events
+
+    GET / serves viewer_live.html from the input directory, GET /events
+    the stream: every cycle is one event with the cycle as id and its
+    log line as data. The last backlog cycles are kept in memory for
+    clients that connect later or reconnect (Last-Event-ID), a client
+    that falls further behind is disconnected and catches up from the
+    backlog when its browser reconnects.
+
+    The server runs an asyncio event loop in a background thread,
+    publiceer hands a cycle over from the simulation thread. A cycle
+    without a log line is handed over as its rides (RIT_DTYPE) with
+    publiceer_ritten, a serializer thread turns them into a line with
+    formatteer. Like the log it waits when wachtrij_grootte cycles are
+    queued.
+    """
+
+    wachtrij_grootte = 64
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        poort: int = 8765,
+        backlog: int = 500,
+        formatteer=None,
+    ):
+        self.host = host
+        self.poort = poort
+        self._formatteer = formatteer
+        self._backlog = collections.deque(maxlen=backlog)
+        self._clients = set()
+        self._loop = None
+        self._server = None
+        self._pagina = b""
+        self._klaar = threading.Event()
+        self._fout = None
+        self._thread = threading.Thread(target=self.__draai, daemon=True)
+        self._wachtrij = queue.Queue(maxsize=LiveServer.wachtrij_grootte)
+        self._serializer = threading.Thread(
+            target=self.__serialiseer_worker, name="live-serializer", daemon=True
+        )
+
+    def start(self) -> None:
+        """
+        Starts the server thread, raises when the port can't be bound
+        """
+        env = jinja2.Environment(loader=jinja2.FileSystemLoader("input"))
+        self._pagina = env.get_template("viewer_live.html").render().encode("UTF-8")
+        self._thread.start()
+        self._klaar.wait()
+        if self._fout is not None:
+            raise self._fout
+        self._serializer.start()
+
+    def publiceer(self, cycle: int, regel: str) -> None:
+        """
+        Sends the log line of a cycle to every client
+        """
+        event = f"id: {cycle}\ndata: {regel.rstrip()}\n\n".encode("UTF-8")
+        self._loop.call_soon_threadsafe(self.__verdeel, cycle, event)
+
+    def publiceer_ritten(self, cycle: int, ritten: np.ndarray) -> None:
+        """
+        Queues the rides of a cycle for the serializer thread
+        """
+        while True:
+            if self._fout is not None:
+                raise self._fout
+            try:
+                self._wachtrij.put((cycle, ritten), timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def close(self) -> None:
+        """
+        Publishes the queued cycles, disconnects the clients
+        and stops the server thread
+        """
+        if self._serializer.is_alive():
+            self._wachtrij.put(None)
+            self._serializer.join()
+        if self._loop is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def __draai(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self.__verbinding, self.host, self.poort)
+            )
+        except OSError as fout:
+            self._fout = fout
+            self._loop.close()
+            self._klaar.set()
+            return
+        self._klaar.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            for wachtrij in list(self._clients):
+                self.__ontkoppel(wachtrij)
+            taken = asyncio.all_tasks(self._loop)
+            if taken:
+                self._loop.run_until_complete(asyncio.wait(taken, timeout=1))
+            self._loop.close()
+
+    def __serialiseer_worker(self) -> None:
+        try:
+            while (item := self._wachtrij.get()) is not None:
+                cycle, ritten = item
+                self.publiceer(cycle, self._formatteer(cycle, ritten))
+        except Exception as fout:
+            self._fout = fout
+
+    def __verdeel(self, cycle: int, event: bytes) -> None:
+        self._backlog.append((cycle, event))
+        for wachtrij in list(self._clients):
+            try:
+                wachtrij.put_nowait(event)
+            except asyncio.QueueFull:
+                # too slow, the browser reconnects and reads the backlog
+                self.__ontkoppel(wachtrij)
+
+    def __ontkoppel(self, wachtrij) -> None:
+        """
+        Ends the stream of a client after what it already has queued
+        """
+        self._clients.discard(wachtrij)
+        if wachtrij.full():
+            wachtrij.get_nowait()
+        wachtrij.put_nowait(None)
+
+    async def __verbinding(self, reader, writer) -> None:
+        try:
+            verzoek = await reader.readline()
+            headers = {}
+            while (regel := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                naam, _, waarde = regel.decode("latin-1").partition(":")
+                headers[naam.strip().lower()] = waarde.strip()
+            delen = verzoek.decode("latin-1").split()
+            pad = delen[1].split("?")[0] if len(delen) > 1 else ""
+            if pad == "/events":
+                await self.__stream(writer, headers.get("last-event-id", ""))
+            elif pad in ("/", "/index.html"):
+                self.__antwoord(writer, "200 OK", "text/html; charset=utf-8", self._pagina)
+            else:
+                self.__antwoord(writer, "404 Not Found", "text/plain", b"niet gevonden")
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def __antwoord(self, writer, status: str, soort: str, inhoud: bytes) -> None:
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {soort}\r\n"
+            f"Content-Length: {len(inhoud)}\r\nConnection: close\r\n\r\n".encode()
+            + inhoud
+        )
+
+    async def __stream(self, writer, laatste_id: str) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n"
+            b"retry: 2000\n\n"
+        )
+        laatste = int(laatste_id) if laatste_id.isdigit() else -1
+        for cycle, event in self._backlog:
+            if cycle > laatste:
+                writer.write(event)
+        wachtrij = asyncio.Queue(maxsize=self._backlog.maxlen)
+        self._clients.add(wachtrij)
+        try:
+            await writer.drain()
+            while (event := await wachtrij.get()) is not None:
+                writer.write(event)
+                await writer.drain()
+        finally:
+            self._clients.discard(wachtrij)
+
+
+class Checkpoint:
+    """
+    Versioned binary checkpoint of the simulation state
+
+    Layout of the file:
+        - 8 bytes magic, 4 bytes schema version, 4 bytes header length
+        - a JSON header with the scalar state and, for every array,
+          its dtype, shape and offset in the file
+        - the raw array data, every array aligned on 64 bytes
+
+    The arrays are memory-mapped on load (copy-on-write), so resuming
+    does not depend on the size of the state. A checkpoint is written
+    to a temporary file and moved into place, a crash leaves either
+    the old or the new checkpoint, never half of one.
+    """
+
+    magic = b"VELOCKPT"
+    versie = 3
+    uitlijning = 64
+    standaard_pad = "output/app.ckpt"
+
+    @classmethod
+    def schrijf(cls, pad: str, meta: dict, arrays: dict[str, np.ndarray]):
+        """
+        Atomically writes the meta data and arrays to pad
+        """
+        arrays = {naam: np.ascontiguousarray(array) for naam, array in arrays.items()}
+        beschrijving = {}
+        offset = 0
+        for naam, array in arrays.items():
+            beschrijving[naam] = {
+                # structured arrays keep their fields
+                "dtype": array.dtype.descr if array.dtype.names else array.dtype.str,
+                "shape": list(array.shape),
+                "offset": offset,
+            }
+            offset += cls.__opvulling(array.nbytes) + array.nbytes
+        header = json.dumps({"meta": meta, "arrays": beschrijving}).encode("UTF-8")
+        data_start = cls.__opvulling(16 + len(header)) + 16 + len(header)
+
+        tijdelijk_pad = pad + ".tmp"
+        with open(tijdelijk_pad, "wb") as file:
+            file.write(cls.magic)
+            file.write(cls.versie.to_bytes(4, "little"))
+            file.write(len(header).to_bytes(4, "little"))
+            file.write(header)
+            file.write(b"\0" * (data_start - 16 - len(header)))
+            for array in arrays.values():
+                file.write(memoryview(array).cast("B"))
+                file.write(b"\0" * cls.__opvulling(array.nbytes))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tijdelijk_pad, pad)
+
+    @classmethod
+    def lees(cls, pad: str) -> tuple[dict, dict[str, np.ndarray]]:
+        """
+        Reads the meta data and memory-maps the arrays of a checkpoint,
+        the arrays are plain ndarray views on one copy-on-write mapping
+        """
+        with open(pad, "rb") as file:
+            if file.read(8) != cls.magic:
+                raise ValueError(f"{pad} is geen velosim checkpoint")
+            versie = int.from_bytes(file.read(4), "little")
+            if versie > cls.versie:
+                raise ValueError(
+                    f"{pad} heeft schema versie {versie}, "
+                    f"deze versie van velosim leest tot versie {cls.versie}"
+                )
+            header_lengte = int.from_bytes(file.read(4), "little")
+            header = json.loads(file.read(header_lengte))
+        data_start = cls.__opvulling(16 + header_lengte) + 16 + header_lengte
+
+        arrays = {}
+        mapping = None
+        for naam, beschrijving in header["arrays"].items():
+            shape = tuple(beschrijving["shape"])
+            dtype = beschrijving["dtype"]
+            if isinstance(dtype, list):
+                dtype = [tuple(veld) for veld in dtype]
+            if int(np.prod(shape)) == 0:
+                arrays[naam] = np.empty(shape, dtype=dtype)
+                continue
+            if mapping is None:
+                mapping = np.memmap(pad, dtype=np.uint8, mode="c")
+            # indexing a np.memmap goes through its python __getitem__
+            arrays[naam] = np.ndarray(
+                shape,
+                dtype=dtype,
+                buffer=mapping,
+                offset=data_start + beschrijving["offset"],
+            )
+        return header["meta"], arrays
+
+    @classmethod
+    def __opvulling(cls, lengte: int) -> int:
+        return -lengte % cls.uitlijning
+
+
+class _LegacyObject:
+    """
+    Stand-in for the per-object classes of pickles written before the
+    FleetState existed, it only keeps the pickled attributes
+    """
+
+
+def _laad_legacy_pickle(file):
+    """
+    Loads an old app.pickle file, the classes that became views on
+    the FleetState are loaded as _LegacyObject so App can migrate them
+    """
+
+    class _LegacyUnpickler(pickle.Unpickler):
+        legacy_classes = {"Gebruiker", "Fiets", "Slot"}
+
+        def find_class(self, module, name):
+            if name in self.legacy_classes:
+                return _LegacyObject
+            if module == "__main__":
+                return getattr(sys.modules[__name__], name)
+            return super().find_class(module, name)
+
+    return _LegacyUnpickler(file).load()
+
+
+class App:
+    """
+    Deze class representeert onze simulator app
+    Deze wordt gebruikt om alle onderliggende code
+    te besturen.
+    """
+
+    # stations a user tries when a station is empty or full
+    uitwijk = 3
+    # events of a cycle handled one by one at first, the events decided
+    # on the arrays at first and the rounds a block gets to decide them
+    los_stap = 128
+    bulk_blok = 512
+    beslis_rondes = 8
+
+    standaard_config = {
+        "max_log_bestandsgrote": 10,
+        "aantal_gebruikers": 100,
+        "aantal_fietsen": 50,
+        "aantal_transporteurs": 25,
+        "willekeurigheid": 50,
+        "tijd_verhouding": 30,
+        "log_fsync_interval": 10,
+        "log_segment_grootte": 1,
+        "log_segment_cycles": 0,
+        "log_wachtrij": 64,
+        "log_batch": 16,
+        "log_flush_interval": 1.0,
+        "log_formaat": "volledig",
+        "ritten_archief": True,
+        "ritten_chunk": 65536,
+        "log_sinks": ["json"],
+        "bezetting_reeks": True,
+        "bezetting_chunk": 1440,
+        "cyclus_interval": 5,
+        "start_datum": "2023-06-01 00:00",
+        "checkpoint_interval_cycles": 100,
+        "checkpoint_interval_seconden": 60,
+        "cycles_per_pagina": 50,
+        "rit_afstand_schaal": 1.5,
+        "rit_max_afstand": 5,
+        "vraag_model": "",
+        "doel_bezetting": 0.5,
+        "rebalancing_marge": 0.25,
+        "transporteur_capaciteit": 20,
+        "metrics_buffer": 1024,
+        "metrics_prometheus": True,
+        "metrics_jsonl": False,
+        "metrics_interval": 10,
+        "live_server": False,
+        "live_host": "127.0.0.1",
+        "live_poort": 8765,
+        "live_backlog": 500,
+        "shards": 0,
+        "shard_indeling": "district",
+        "shard_cycles": 10,
+    }
+
+    def __init__(
+        self, seed: int | None = None, config_pad: str | None = "config/config.yaml"
+    ):
+        self._config_pad = config_pad
+        self._rng = np.random.default_rng(seed)
+        self._cycle = 0
+        self._ritten = []
+        self._events = EventQueue()
+        self._state = FleetState()
+        self._namen = {}
+        self._stations = []
+        self._transporteurs = []
+        self._aantal_gebruikers = 0
+        self._aantal_fietsen = 0
+        self._aantal_transporteurs = 0
+        self._willekeurigheid = 0
+        self._tijd_verhouding = 0
+        self._kpi = {
+            "ritten": 0,
+            "leeg_station_minuten": 0,
+            "vol_station_minuten": 0,
+            "transporteur_ritten": 0,
+            "transporteur_km": 0.0,
+        }
+        self._station_index = None
+        self._afstanden = None
+        self._ruimte = None
+        self._uitwijk = []
+        self._uitwijk_tabel = np.full((0, App.uitwijk), -1)
+        self._vraag = None
+        self._vraag_model_pad = ""
+        self._rit_afstand_schaal = 1.5
+        self._rit_max_afstand = 5
+        self._rebalancer = Rebalancer(0.5, 0.25, 20)
+        self._start_datum = datetime.datetime(2023, 6, 1)
+        self._cyclus_interval = 5
+        self._checkpoint_cycles = 100
+        self._checkpoint_seconden = 60
+        self._laatste_checkpoint = (0, time.monotonic())
+        self._log = None
+        self._log_bytes = 0
+        self._log_verwijderd = 0
+        # the RitArchief and RitDatabase of a run, next to the Log
+        self._sinks = []
+        self._archief_aan = True
+        self._log_sinks = ["json"]
+        # the occupancy per cycle of a run, saved when bezetting_aan
+        self._bezetting = None
+        self._bezetting_aan = True
+        self._live = None
+        # a shard process runs its Shard, a sharded run keeps its
+        # processes, the partition, the arrivals between shards and
+        # the cycles the shards ran ahead, per cycle the answer of
+        # every shard
+        self._shard = None
+        self._shards = None
+        self._verdeling = None
+        self._shard_geheugen = None
+        self._onderweg = []
+        self._onderweg_aantal = None
+        self._shard_buffer = collections.deque()
+        self._stroom = None
+        self._shards_synchroon = True
+        self._aantal_shards = 0
+        self._shard_indeling = "district"
+        self._shard_cycles = 1
+        self._onderbroken = False
+        self._live_config = {
+            "aan": False,
+            "host": "127.0.0.1",
+            "poort": 8765,
+            "backlog": 500,
+        }
+        self._metrics = Metrics()
+        self._metrics_config = {
+            "capaciteit": 1024,
+            "prometheus": True,
+            "jsonl": False,
+            "export_interval": 10,
+        }
+
+    def opslaan(self, pad: str = Checkpoint.standaard_pad) -> None:
+        """
+        Writes the simulation state to a checkpoint
+        """
+        state = self._state
+        meta = {
+            "cycle": self._cycle,
+            "willekeurigheid": self._willekeurigheid,
+            "tijd_verhouding": self._tijd_verhouding,
+            "start_datum": self._start_datum.isoformat(),
+            "stations": [
+                {"nummer": station._stationnummer, "adres": station._adres}
+                for station in self._stations
+            ],
+            "namen": self._namen,
+            "rng": self._rng.bit_generator.state,
+            "kpi": self._kpi,
+        }
+        arrays = {
+            naam: getattr(state, naam)
+            for naam in (
+                "capaciteit",
+                "bezetting",
+                "gereserveerd",
+                "slot_offset",
+                "slot_volgorde",
+                "slot_fiets",
+                "fiets_station",
+                "fiets_slot",
+                "geslacht",
+                "voornaam",
+                "achternaam",
+                "aantal_ritten",
+            )
+        }
+        arrays["station_x"] = np.array(
+            [station._coordinaten["X"] for station in self._stations]
+        )
+        arrays["station_y"] = np.array(
+            [station._coordinaten["Y"] for station in self._stations]
+        )
+        arrays["transporteur_ritten"] = np.array(
+            [transporteur._aantal_ritten for transporteur in self._transporteurs],
+            dtype=np.int64,
+        )
+        arrays["transporteur_vrij"] = np.array(
+            [transporteur._vrij_vanaf for transporteur in self._transporteurs],
+            dtype=np.float64,
+        )
+        arrays["events"] = self._events.naar_array()
+        Checkpoint.schrijf(pad, meta, arrays)
+        self._laatste_checkpoint = (self._cycle, time.monotonic())
+
+    @classmethod
+    def laden(
+        cls,
+        pad: str = Checkpoint.standaard_pad,
+        legacy_pad: str = "output/app.pickle",
+    ):
+        """
+        Resumes an app from its checkpoint,
+        falls back on an app.pickle of an older version
+        """
+        if not os.path.exists(pad) and os.path.exists(legacy_pad):
+            with open(legacy_pad, "rb") as file:
+                oud = _laad_legacy_pickle(file)
+            return cls._migreer(oud)
+
+        meta, arrays = Checkpoint.lees(pad)
+        app = cls()
+        state = app._state
+        for naam in (
+            "capaciteit",
+            "bezetting",
+            "slot_offset",
+            "slot_volgorde",
+            "slot_fiets",
+            "fiets_station",
+            "fiets_slot",
+            "geslacht",
+            "voornaam",
+            "achternaam",
+            "aantal_ritten",
+        ):
+            setattr(state, naam, arrays[naam])
+        # schema version 2 and older had no bikes in transit
+        state.gereserveerd = arrays.get(
+            "gereserveerd", np.zeros(state.aantal_stations, dtype=np.int32)
+        )
+        if "events" in arrays:
+            app._events = EventQueue.uit_array(arrays["events"])
+        app._cycle = meta["cycle"]
+        app._willekeurigheid = meta["willekeurigheid"]
+        app._tijd_verhouding = meta["tijd_verhouding"]
+        app._start_datum = datetime.datetime.fromisoformat(meta["start_datum"])
+        app._namen = meta["namen"]
+        for positie, station in enumerate(meta["stations"]):
+            coordinaten = {
+                "X": float(arrays["station_x"][positie]),
+                "Y": float(arrays["station_y"][positie]),
+            }
+            app._stations.append(
+                Station(station["nummer"], station["adres"], coordinaten, positie, state)
+            )
+        vrij = arrays.get("transporteur_vrij", [])
+        for nummer, aantal_ritten in enumerate(arrays["transporteur_ritten"]):
+            transporteur = Fietstransporteur(nummer)
+            transporteur._aantal_ritten = int(aantal_ritten)
+            if nummer < len(vrij):
+                transporteur._vrij_vanaf = float(vrij[nummer])
+            app._transporteurs.append(transporteur)
+        if isinstance(meta["rng"], dict):
+            app._rng = np.random.Generator(
+                getattr(np.random, meta["rng"]["bit_generator"])()
+            )
+            app._rng.bit_generator.state = meta["rng"]
+        else:
+            # schema version 1 stored the legacy global MT19937 state
+            _, rng_pos, _, _ = meta["rng"]
+            app._rng = np.random.Generator(np.random.MT19937())
+            app._rng.bit_generator.state = {
+                "bit_generator": "MT19937",
+                "state": {"key": np.array(arrays["rng_keys"]), "pos": rng_pos},
+            }
+        app._kpi.update(meta.get("kpi", {}))
+        app._build_station_index()
+        return app
+
+    @classmethod
+    def _migreer(cls, oud):
+        """
+        Converts an App unpickled from an older version
+        """
+        if "_state" in oud.__dict__:
+            # already stored in a FleetState, only the runtime parts are missing
+            app = cls()
+            app.__dict__.update(oud.__dict__)
+            state = app._state
+            if not hasattr(state, "gereserveerd"):
+                state.gereserveerd = np.zeros(state.aantal_stations, dtype=np.int32)
+            for nummer, transporteur in enumerate(app._transporteurs):
+                transporteur._nummer = nummer
+                transporteur._vrij_vanaf = 0.0
+            app._build_station_index()
+            return app
+
+        app = cls()
+        app._cycle = oud._cycle
+        app._willekeurigheid = oud._willekeurigheid
+        app._tijd_verhouding = oud._tijd_verhouding
+        with open(r"input/names.json", "r", encoding="UTF-8") as file:
+            app._namen = json.load(file)
+        namen_index = {
+            lijst: {naam: index for index, naam in enumerate(app._namen[lijst])}
+            for lijst in app._namen
+        }
+
+        state = app._state
+        oude_stations = [station.__dict__ for station in oud._stations]
+        state.maak_stations([station["aantal_slots"] for station in oude_stations])
+        state.maak_fietsen(len(oud._fietsen))
+        state.maak_gebruikers(len(oud._gebruikers))
+        for positie, station in enumerate(oude_stations):
+            app._stations.append(
+                Station(
+                    station["_stationnummer"],
+                    station["_adres"],
+                    station["_coordinaten"],
+                    positie,
+                    state,
+                )
+            )
+            for slot in station["_slots"]:
+                if not slot.leeg:
+                    state.zet_fiets(positie, slot._fiets._nummer)
+        for gebruiker in oud._gebruikers:
+            nummer = gebruiker._nummer
+            mannen = namen_index["Mannen_Voornaam"]
+            if gebruiker._voornaam in mannen:
+                state.voornaam[nummer] = mannen[gebruiker._voornaam]
+            else:
+                state.geslacht[nummer] = 1
+                state.voornaam[nummer] = namen_index["Vrouwen_Voornaam"].get(
+                    gebruiker._voornaam, 0
+                )
+            state.achternaam[nummer] = namen_index["Achternaam"].get(
+                gebruiker._achternaam, 0
+            )
+            state.aantal_ritten[nummer] = gebruiker._aantal_ritten
+        for oude_transporteur in oud._transporteurs:
+            transporteur = Fietstransporteur(oude_transporteur._nummer)
+            transporteur._aantal_ritten = oude_transporteur._aantal_ritten
+            app._transporteurs.append(transporteur)
+        app._build_station_index()
+        return app
+
+    def setup(self) -> None:
+        """
+        Runs the program setup process:
+
+        Step 1
+            -> check if all directories are available
+                - input,config,output
+            -> create missing directories if needed
+        step 2
+            -> check if all files are in each directory
+                - config: config.yaml
+                - input: names.json, velo.json if missing send error
+            -> load and assign config parameters
+            -> create the stations, bikes and users
+        """
+
+        # region stap1
+        dirs_needed = ["input", "config", "output", "site"]
+        dirs_present = self._check_dir("input", "config", "output", "site")
+        dirs_to_create = self._mask_list(dirs_needed, dirs_present)
+        self._make_dir(*dirs_to_create)
+
+        if "input" in dirs_to_create and "output" in dirs_to_create:
+            missing_files = [
+                "names.json",
+                "velo.json",
+                "viewer_base.html",
+                "viewer_index.html",
+                "viewer_pagina.html",
+                "viewer_live.html",
+            ]
+            raise MissingJsonFilesError(missing_files)
+        # endregion
+
+        # region stap2
+        config_file_present = self._check_files("config", "config.yaml")
+        if config_file_present[0] is False:
+            self._create_config()
+        self._load_config()
+        self._load_names()
+        self._create_users()
+        self._create_bikemovers()
+        self._create_bikes()
+        catalogus = StationCatalogus.laad()
+        self._create_stations(catalogus)
+        self._build_station_index()
+        self._build_spatial_index()
+        self._afstanden = DistanceMatrix.laad_of_bereken(catalogus.y, catalogus.x)
+        self._populate_stations()
+        # endregion
+
+    def run(
+        self,
+        max_cycles: int | None = None,
+        eind_tijd: datetime.datetime | None = None,
+        realtime: bool = True,
+        checkpoint_pad: str | None = Checkpoint.standaard_pad,
+        logboek: bool = True,
+        verbose: bool = True,
+        metrics: bool = True,
+        profiel: str | None = None,
+        live: bool | None = None,
+        shards: int | None = None,
+    ) -> None:
+        """
+        runs the simulation
+
+        Attributes:
+            max_cycles [int] -> stop after this many cycles
+            eind_tijd [datetime] -> stop once the simulated clock reaches it
+            realtime [bool] -> pace the cycles at cyclus_interval seconds,
+                               otherwise run as fast as possible
+            checkpoint_pad [str] -> where the periodic and final checkpoints
+                                    are written, None disables them
+            logboek [bool] -> write the rides to the log
+            verbose [bool] -> print the progress
+            metrics [bool] -> export the per-cycle metrics as configured,
+                              otherwise they are only kept in memory
+            profiel [str] -> run under cProfile and write the stats here
+            live [bool] -> stream the cycles to the browser with a LiveServer,
+                           None uses live_server of the config
+            shards [int] -> run the stations in this many processes,
+                            None uses shards of the config
+        """
+        if verbose:
+            print("To quit press ctrl + c")
+        self._load_config()
+        self._laatste_checkpoint = (self._cycle, time.monotonic())
+        if self._afstanden is None:
+            self._afstanden = DistanceMatrix.laad_of_bereken(
+                *self._station_coordinaten()
+            )
+        if self._ruimte is None:
+            self._build_spatial_index()
+        if self._vraag is None:
+            self._build_vraag_model()
+        if shards is None:
+            shards = self._aantal_shards
+        if shards > 1:
+            self.__start_shards(shards)
+            if verbose:
+                print(f"{self._verdeling.aantal} shards gestart")
+        onderbreking = None
+        self._onderbroken = False
+        if threading.current_thread() is threading.main_thread():
+            onderbreking = signal.signal(signal.SIGINT, self.__onderbreek)
+        if live is None:
+            live = self._live_config["aan"]
+        if live:
+            self._live = LiveServer(
+                self._live_config["host"],
+                self._live_config["poort"],
+                self._live_config["backlog"],
+                self.__live_regel,
+            )
+            self._live.start()
+            if verbose:
+                print(f"Live view op http://{self._live.host}:{self._live.poort}/")
+        self._log = Log() if logboek and "json" in self._log_sinks else None
+        self._log_bytes = 0
+        self._log_verwijderd = 0
+        compact = Log.formaat == "compact"
+        if self._log is not None and compact:
+            Log.schrijf_dimensies(self._cycle, self._dimensies())
+        if logboek and self._archief_aan:
+            self._sinks.append(
+                RitArchief(self._cycle, self._start_datum, self._state.aantal_stations)
+            )
+        if logboek and "sqlite" in self._log_sinks:
+            self._sinks.append(RitDatabase(self._cycle, self._start_datum))
+        if logboek and self._bezetting_aan:
+            self._bezetting = BezettingsReeks(
+                self._cycle,
+                self._state.capaciteit,
+                self._start_datum,
+                self._tijd_verhouding,
+            )
+        if self._log is not None and self._live is not None and not compact:
+            self._log.luisteraars.append(self._live.publiceer)
+        self._metrics = (
+            Metrics(**self._metrics_config)
+            if metrics
+            else Metrics(self._metrics_config["capaciteit"])
+        )
+        profiler = cProfile.Profile() if profiel is not None else None
+        laatste_cycle = None if max_cycles is None else self._cycle + max_cycles
+        deadline = time.monotonic()
+        index = self._station_index
+        if profiler is not None:
+            profiler.enable()
+        try:
+            while not self.__horizon_bereikt(laatste_cycle, eind_tijd):
+                # the cycles the shards already ran are finished first
+                if self._onderbroken and not self._shard_buffer:
+                    break
+                if verbose and (realtime or self._cycle % 1000 == 0):
+                    print(f"running cycle-{self._cycle} ({self._sim_tijd()})")
+                # two ways to break this loop
+                # (1) ctrl+c, at the end of the cycle
+                # (2) the requested horizon is reached
+                try:
+                    self._metrics.begin(self._cycle)
+                    with self._metrics.fase("generatie"):
+                        if self._shards is not None:
+                            self.__shard_ritten(laatste_cycle, eind_tijd)
+                        else:
+                            self.__verwerk_events(
+                                (self._cycle + 1) * self._tijd_verhouding,
+                                self.__plan_ritten(),
+                            )
+                    with self._metrics.fase("rebalancing"):
+                        if self._shards is None:
+                            self.__transporter_cycle()
+                        elif self._bezetting is not None:
+                            # the shards rebalanced their own stations
+                            self._bezetting.neem(self._cycle, self._state.bezetting)
+                    with self._metrics.fase("log"):
+                        self.__log()
+                    with self._metrics.fase("checkpoint"):
+                        if (
+                            checkpoint_pad is not None
+                            and not self._shard_buffer
+                            and self.__checkpoint_nodig()
+                        ):
+                            if self._log is not None:
+                                self._log.sync()
+                            for sink in self._sinks:
+                                sink.sync()
+                            if self._bezetting is not None:
+                                self._bezetting.sync()
+                            if self._shards is not None:
+                                self.__shard_staat()
+                            self.opslaan(checkpoint_pad)
+                    with self._metrics.fase("slaap"):
+                        if realtime:
+                            deadline = self.__wacht_tot(
+                                deadline + self._cyclus_interval
+                            )
+                    self._metrics.sluit_cycle(
+                        self._state.aantal_stations - len(index.niet_leeg),
+                        len(index.vol),
+                    )
+                except KeyboardInterrupt:
+                    # stopped in the middle of a cycle, the checkpoint
+                    # stays at the last cycle that was synced
+                    checkpoint_pad = None
+                    break
+        finally:
+            if onderbreking is not None:
+                signal.signal(signal.SIGINT, onderbreking)
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profiel)
+                if verbose:
+                    pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+            self._metrics.close()
+            try:
+                # a log that lost cycles raises here, the checkpoint
+                # then stays at the last cycle that was synced
+                if self._log is not None:
+                    self._log.close()
+            finally:
+                self._log = None
+                try:
+                    for sink in self._sinks:
+                        sink.close()
+                    if self._bezetting is not None:
+                        self._bezetting.close()
+                finally:
+                    self._sinks = []
+                    self._bezetting = None
+                    if self._live is not None:
+                        self._live.close()
+                        self._live = None
+                    if self._shards is not None:
+                        try:
+                            # shards stopped in the middle of a cycle, or
+                            # ahead of this App, leave no consistent state
+                            if (
+                                checkpoint_pad is not None
+                                and self._shards_synchroon
+                                and not self._shard_buffer
+                            ):
+                                self.__shard_staat()
+                            else:
+                                checkpoint_pad = None
+                        finally:
+                            self.__stop_shards()
+            if checkpoint_pad is not None:
+                self.opslaan(checkpoint_pad)
+
+    @staticmethod
+    def view(config_pad: str = "config/config.yaml"):
+        """
+        Built-in log file viewer, it only needs
+        the config, not the simulation state
+        """
+        with open(config_pad, "r", encoding="UTF-8") as config_file:
+            App._configureer_klassen(yaml.safe_load(config_file))
+        velosim_website = WebsiteMaker()
+        velosim_website.generate_html()
+
+    @staticmethod
+    def stats(uitvoer: str = "output/stats.npz", top: int = 10) -> None:
+        """
+        Aggregates the RitArchief and the BezettingsReeks, writes every
+        statistic to uitvoer and prints a summary of the busiest ones
+        """
+        if not RitArchief.chunks():
+            print(f"Geen ritten in {RitArchief.archief_dir}, start eerst -run.")
+            return
+        stats = RitArchief.statistieken()
+        reeks = BezettingsReeks.laad()
+        if reeks is not None:
+            matrix, meta = reeks
+            capaciteit = np.array(meta["capaciteit"])
+            stats["leeg_minuten"], stats["vol_minuten"] = (
+                BezettingsReeks.station_minuten(
+                    matrix, capaciteit, meta["tijd_verhouding"]
+                )
+            )
+            stats["bezetting_uur_van_de_dag"] = BezettingsReeks.heatmap(
+                matrix,
+                capaciteit,
+                BezettingsReeks.uur_van_de_dag(meta, len(matrix)),
+                24,
+            )
+        np.savez(uitvoer, **stats)
+        catalogus = StationCatalogus.laad()
+        start_datum = datetime.datetime.fromisoformat(str(stats["start_datum"]))
+        eerste_cycle, laatste_cycle = stats["cycles"].tolist()
+
+        def drukste(aantallen: np.ndarray) -> np.ndarray:
+            return np.argsort(aantallen, kind="stable")[::-1][:top]
+
+        print(
+            f"{int(stats['vertrek'].sum())} ritten in cycle {eerste_cycle}-{laatste_cycle}, "
+            f"{int(stats['transporteur_ritten'].sum())} transporteur ritten met "
+            f"{int(stats['transporteur_fietsen'].sum())} fietsen"
+        )
+        for naam in ("vertrek", "aankomst"):
+            print(f"Drukste stations ({naam}):")
+            for positie in drukste(stats[naam]).tolist():
+                print(f"  {stats[naam][positie]:>8} {catalogus.beschrijving(positie)}")
+        print("Drukste trajecten:")
+        od = stats["od"]
+        for positie in drukste(od.ravel()).tolist():
+            start, eind = divmod(positie, len(od))
+            print(
+                f"  {od[start, eind]:>8} "
+                f"{catalogus.beschrijving(start)} -> {catalogus.beschrijving(eind)}"
+            )
+        print("Ritten per uur van de dag:")
+        for uur, aantal in enumerate(stats["uur_van_de_dag"].tolist()):
+            print(f"  {uur:02d}:00 {aantal:>8}")
+        print("Drukste uren:")
+        for uur in drukste(stats["uur"]).tolist():
+            tijd = start_datum + datetime.timedelta(hours=uur)
+            print(f"  {tijd:%Y-%m-%d %H}:00 {stats['uur'][uur]:>8}")
+        for naam, meervoud in (("gebruiker", "gebruikers"), ("fiets", "fietsen")):
+            ritten, km = stats[f"{naam}_ritten"], stats[f"{naam}_km"]
+            actief = np.count_nonzero(ritten)
+            if actief:
+                print(
+                    f"{actief} {meervoud} reden gemiddeld {ritten.sum() / actief:.1f} "
+                    f"ritten en {km.sum() / actief:.1f} km, het meest "
+                    f"{naam} {int(np.argmax(ritten))} met {int(ritten.max())} ritten"
+                )
+        if reeks is not None:
+            for naam, toestand in (("leeg_minuten", "leeg"), ("vol_minuten", "vol")):
+                print(f"Stations het langst {toestand} (minuten):")
+                for positie in drukste(stats[naam]).tolist():
+                    print(
+                        f"  {stats[naam][positie]:>8.0f} "
+                        f"{catalogus.beschrijving(positie)}"
+                    )
+        print(f"Statistieken geschreven naar {uitvoer}")
+
+    @staticmethod
+    def zoek(
+        fiets: int | None = None,
+        gebruiker: int | None = None,
+        transporteur: int | None = None,
+        station: str | None = None,
+        van_cycle: int | None = None,
+        tot_cycle: int | None = None,
+        limiet: int | None = 100,
+    ) -> None:
+        """
+        Prints the rides of a bike, user, transporter and/or station
+        (by its number in velo.json) from the RitDatabase
+        """
+        if not os.path.exists(RitDatabase.database_pad):
+            print(
+                f"Geen {RitDatabase.database_pad}, zet sqlite in log_sinks en start -run."
+            )
+            return
+        catalogus = StationCatalogus.laad()
+        positie = None
+        if station is not None:
+            positie = catalogus.positie(station)
+            if positie is None:
+                print(f"Station {station} bestaat niet.")
+                return
+        ritten = RitDatabase.zoek(
+            fiets, gebruiker, transporteur, positie, van_cycle, tot_cycle, limiet
+        )
+        start_datum = RitDatabase.start_datum()
+        for rit in ritten.tolist():
+            cycle, tijd, soort, uitvoerder, fiets_nummer, start, eind = rit[:7]
+            afstand, geschatte_tijd, _, aantal = rit[7:]
+            tijdstip = start_datum + datetime.timedelta(minutes=tijd)
+            if soort == RIT_GEBRUIKER:
+                wie = f"gebruiker {uitvoerder}"
+            else:
+                wie = f"transporteur {uitvoerder} ({aantal} fietsen)"
+            print(
+                f"{tijdstip:%Y-%m-%d %H:%M:%S} cycle {cycle} {wie} fiets {fiets_nummer}: "
+                f"{catalogus.beschrijving(start)} -> {catalogus.beschrijving(eind)}, "
+                f"{afstand:.2f} km, {geschatte_tijd:.1f} min"
+            )
+        print(f"{len(ritten)} ritten")
+
+    # region __functions-setup__
+    def _check_dir(self, *dir_names: str) -> list[bool]:
+        """
+        Checks if a given directory exists
+
+        Attributes:
+            dir_names [str] -> name of dir / path (allows multi input)
+
+        Output:
+            exists? `True` / `False` (1 dirname given)/n
+            exists? [`True` / `False`, `...`] (1+ dirname given)
+        """
+        res = []
+        for dir_name in dir_names:
+            if os.path.exists(dir_name) and os.path.isdir(dir_name):
+                res.append(True)
+            else:
+                res.append(False)
+        return res
+
+    def _make_dir(self, *dir_names: str) -> None:
+        """
+        Creates a given dir
+
+        Attributes:
+            dir_name [str] -> names of dir / path (allows multi input)
+
+        Output:
+            /
+        """
+        for dir_name in dir_names:
+            os.makedirs(dir_name)
+
+    def _mask_list(self, original_list: list[str], mask: list[bool]) -> list[str]:
+        masked_list = []
+        for item, mask in zip(original_list, mask):
+            if not mask:
+                masked_list.append(item)
+        return masked_list
+
+    def _check_files(self, directory: str, *files: list) -> list[bool]:
+        """
+        Checks the input directory to see if specified files exist,
+        returns a list of true and false values
+        """
+        existing_files = []
+        for file in files:
+            try:
+                with open(
+                    f"{directory}/{file}",
+                    "r",
+                    encoding="UTF-8",
+                ):
+                    existing_files.append(True)
+            except FileNotFoundError:
+                existing_files.append(False)
+        return existing_files
+
+    def _create_stations(self, catalogus: StationCatalogus) -> None:
+        """
+        This function puts the stations of the
+        catalogus in self._stations and the FleetState
+        """
+        self._state.maak_stations(catalogus.capaciteit)
+        for positie in range(len(catalogus)):
+            coordinaten = {
+                "X": float(catalogus.x[positie]),
+                "Y": float(catalogus.y[positie]),
+            }
+            station = Station(
+                catalogus.nummers[positie],
+                catalogus.adressen[positie],
+                coordinaten,
+                positie,
+                self._state,
+            )
+            self._stations.append(station)
+
+    def _station_coordinaten(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the latitudes and longitudes of the stations
+        """
+        lat = np.array([station._coordinaten["Y"] for station in self._stations])
+        lon = np.array([station._coordinaten["X"] for station in self._stations])
+        return lat, lon
+
+    def _build_station_index(self) -> None:
+        """
+        Indexes the stations on availability, every
+        occupancy change updates it afterwards
+        """
+        self._station_index = StationIndex(self._state)
+
+    def _build_spatial_index(self) -> None:
+        """
+        Indexes the stations on their coordinates, with the
+        stations a user tries when a station is empty or full
+        """
+        lat, lon = self._station_coordinaten()
+        self._ruimte = GridIndex(lat, lon)
+        self._uitwijk = []
+        for positie in range(len(self._stations)):
+            buren = self._ruimte.dichtste(lat[positie], lon[positie], App.uitwijk + 1)
+            self._uitwijk.append(buren[buren != positie][: App.uitwijk].tolist())
+        # the same as a table, -1 where a station has fewer
+        self._uitwijk_tabel = np.full((len(self._stations), App.uitwijk), -1)
+        for positie, buren in enumerate(self._uitwijk):
+            self._uitwijk_tabel[positie, : len(buren)] = buren
+
+    def _build_vraag_model(self) -> None:
+        """
+        Loads the demand model of vraag_model, or derives it from the
+        stations when none is configured. Over a day willekeurigheid / 100
+        rides per minute are requested on average.
+        """
+        start_minuut = self._start_datum.hour * 60 + self._start_datum.minute
+        if self._vraag_model_pad == "uniform":
+            self._vraag = VraagModel.uniform(
+                len(self._stations), self._willekeurigheid / 100, start_minuut
+            )
+            return
+        if self._vraag_model_pad:
+            self._vraag = VraagModel.laad(self._vraag_model_pad, start_minuut)
+            return
+        if self._ruimte is None:
+            self._build_spatial_index()
+        self._vraag = VraagModel.afgeleid(
+            self._state.capaciteit,
+            [station._adres["Gemeente"] for station in self._stations],
+            self._afstanden.afstanden,
+            self._ruimte,
+            self._willekeurigheid / 100,
+            self._rit_afstand_schaal,
+            self._rit_max_afstand,
+            start_minuut,
+        )
+
+    def _load_names(self) -> None:
+        """
+        Loads the name lists of names.json
+        """
+        with open(r"input/names.json", "r", encoding="UTF-8") as file:
+            self._namen = json.load(file)
+
+    def _create_users(self) -> None:
+        """
+        This function creates a number of 'users'
+        specified by the amount in the config file.
+        The users are stored as indices into the
+        names.json lists in the FleetState
+        """
+        state = self._state
+        aantal = self._aantal_gebruikers
+        state.maak_gebruikers(aantal)
+        lengtes = np.array(
+            [
+                len(self._namen["Mannen_Voornaam"]),
+                len(self._namen["Vrouwen_Voornaam"]),
+            ]
+        )
+        state.geslacht[:] = self._rng.integers(0, 2, aantal)
+        state.voornaam[:] = self._rng.integers(0, lengtes[state.geslacht])
+        state.achternaam[:] = self._rng.integers(
+            0, len(self._namen["Achternaam"]), aantal
+        )
+
+    def _create_bikes(self) -> None:
+        """
+        This function creates a number of 'bikes' specified
+        by the amount in the config file. And puts them in
+        the FleetState
+        """
+        self._state.maak_fietsen(self._aantal_fietsen)
+
+    def _create_bikemovers(self) -> None:
+        """
+        This function creates a number of 'bikemovers' specified
+        by the amount in the config file. And puts them in
+        self._transporteurs
+        """
+        while len(self._transporteurs) < self._aantal_transporteurs:
+            fietstransporteur = Fietstransporteur(len(self._transporteurs))
+            self._transporteurs.append(fietstransporteur)
+
+    def _populate_stations(self):
+        """
+        Spreads the undocked bikes over the free slots in one pass,
+        every free slot is equally likely. Bikes that don't fit
+        stay undocked.
+        """
+        state = self._state
+        vrij = (state.capaciteit - state.bezetting).astype(np.int64)
+        losse_fietsen = self._rng.permutation(np.flatnonzero(state.fiets_station < 0))
+        aantal = min(len(losse_fietsen), int(vrij.sum()))
+        aantallen = self._rng.multivariate_hypergeometric(vrij, aantal)
+        state.zet_fietsen(aantallen, losse_fietsen[:aantal])
+        for positie in np.flatnonzero(aantallen):
+            self._station_index.update(int(positie))
+
+    def _create_config(self) -> None:
+        file_path = os.path.join("config", "config.yaml")
+        with open(file_path, "w", encoding="UTF-8") as config_file:
+            yaml.dump(App.standaard_config, config_file)
+            config_file.write(
+                "# max aantal fietsen 9627\n"
+                + "# max log bestands grote in megabytes\n"
+                + "# willekeurigheids percentage (tussen 0-100)\n"
+                + "    # gemiddeld over een dag x / 100 ritten per minuut\n"
+                + "# tijd verhouding 1 cycle = x min in simulatie\n"
+                + "# log fsync interval: na hoeveel cycles de log naar schijf gesynct wordt\n"
+                + "# log segment grootte in megabytes, log segment cycles (0 = geen limiet)\n"
+                + "    # oude segmenten worden gecomprimeerd en verwijderd boven max log bestands grote\n"
+                + "# log wachtrij: cycles die op de log schrijver wachten voor -run wacht,\n"
+                + "    # log batch: cycles per schrijfbeurt, log flush interval: seconden\n"
+                + "    # tot een onvolledige batch toch geschreven wordt\n"
+                + "# log formaat: volledig of compact, compact schrijft per rit enkel nummers,\n"
+                + "    # de stations en gebruikers staan eenmaal in ritlog/dimensies-*.json\n"
+                + "# ritten archief: ritten ook als .npy chunks van x ritten (ritten chunk)\n"
+                + "    # in output/ritten voor -stats\n"
+                + "# log sinks: json (output/ritlog) en/of sqlite (output/ritten.sqlite,\n"
+                + "    # voor -zoek)\n"
+                + "# bezetting reeks: bezetting van elk station per cycle in\n"
+                + "    # output/bezetting, groeit per x cycles (bezetting chunk)\n"
+                + "# cyclus interval: seconden echte tijd per cycle in realtime modus\n"
+                + "# start datum: simulatietijd van cycle 0\n"
+                + "# checkpoint interval: om de x cycles of x seconden (0 = uit)\n"
+                + "# cycles per pagina: aantal cycles per pagina van de viewer\n"
+                + "# rit afstand schaal in km: ritten van x km zijn e keer zeldzamer\n"
+                + "    # dan ritten naar de buur, 0 = bestemming uniform over de stad\n"
+                + "# rit max afstand: in km, verder rijdt een gebruiker niet\n"
+                + "# vraag model: .npz met vertrek (24 x stations, ritten per minuut)\n"
+                + "    # en bestemming (24 x stations x stations, gewichten) per uur,\n"
+                + "    # leeg = afgeleid uit capaciteit, district en afstand,\n"
+                + "    # uniform = van een station met een fiets naar een met een plaats\n"
+                + "# doel bezetting: fractie van de plaatsen die transporteurs vullen\n"
+                + "    # rebalancing marge: afwijking (fractie van de plaatsen) voor er\n"
+                + "    # fietsen weggehaald of gebracht worden\n"
+                + "# transporteur capaciteit: fietsen per rit, elke transporteur rijdt\n"
+                + "    # hoogstens een rit per cycle\n"
+                + "# metrics: buffer in cycles, export naar prometheus en/of jsonl,\n"
+                + "    # het prometheus bestand wordt om de x cycles herschreven\n"
+                + "# live server: stream de cycles van -run naar de browser op\n"
+                + "    # http://live host:live poort/, de laatste x cycles (backlog)\n"
+                + "    # krijgt een browser die later verbindt\n"
+                + "# shards: aantal processen voor de stations (0 = een proces),\n"
+                + "    # shard indeling: district of ruimtelijk\n"
+                + "    # shard cycles: de shards wisselen om de x cycles fietsen uit\n"
+                + "    # Hogere random ~ meer ritten\n"
+                + "    # Hogere tijd verhouding ~ meer ritten"
+            )
+
+    def _load_config(self) -> None:
+        if self._config_pad is None:
+            # configured through _configureer
+            return
+        with open(self._config_pad, "r", encoding="UTF-8") as config_file:
+            config_data = yaml.safe_load(config_file)
+        self._configureer(config_data)
+
+    @staticmethod
+    def _configureer_klassen(config_data: dict) -> None:
+        """
+        Assigns the config parameters of the log and the viewer
+        """
+        WebsiteMaker.cycles_per_pagina = config_data.get("cycles_per_pagina", 50)
+        Log.max_total_log_size = config_data["max_log_bestandsgrote"] * 1024 * 1024
+        Log.fsync_interval = config_data.get("log_fsync_interval", 10)
+        Log.max_segment_size = int(
+            config_data.get("log_segment_grootte", 1) * 1024 * 1024
+        )
+        Log.max_segment_cycles = config_data.get("log_segment_cycles", 0)
+        Log.wachtrij_grootte = config_data.get("log_wachtrij", 64)
+        RitDatabase.wachtrij_grootte = Log.wachtrij_grootte
+        Log.batch_grootte = config_data.get("log_batch", 16)
+        Log.flush_interval = config_data.get("log_flush_interval", 1.0)
+        Log.formaat = config_data.get("log_formaat", "volledig")
+        if Log.formaat not in ("volledig", "compact"):
+            raise ValueError(f"log_formaat is volledig of compact, niet {Log.formaat}")
+        RitArchief.chunk_rijen = config_data.get("ritten_chunk", 65536)
+        BezettingsReeks.chunk_cycles = config_data.get("bezetting_chunk", 1440)
+
+    def _configureer(self, config_data: dict) -> None:
+        """
+        Assigns the config parameters
+        """
+        self._aantal_gebruikers = config_data["aantal_gebruikers"]
+        self._aantal_fietsen = config_data["aantal_fietsen"]
+        self._aantal_transporteurs = config_data["aantal_transporteurs"]
+        self._willekeurigheid = config_data["willekeurigheid"]
+        self._tijd_verhouding = config_data["tijd_verhouding"]
+        self._cyclus_interval = config_data.get("cyclus_interval", 5)
+        self._checkpoint_cycles = config_data.get("checkpoint_interval_cycles", 100)
+        self._checkpoint_seconden = config_data.get(
+            "checkpoint_interval_seconden", 60
+        )
+        start_datum = config_data.get("start_datum", self._start_datum)
+        if not isinstance(start_datum, datetime.datetime):
+            start_datum = datetime.datetime.fromisoformat(str(start_datum))
+        self._start_datum = start_datum
+        self._rit_afstand_schaal = config_data.get("rit_afstand_schaal", 1.5)
+        self._rit_max_afstand = config_data.get("rit_max_afstand", 5)
+        self._vraag_model_pad = config_data.get("vraag_model", "")
+        self._archief_aan = config_data.get("ritten_archief", True)
+        self._bezetting_aan = config_data.get("bezetting_reeks", True)
+        self._log_sinks = config_data.get("log_sinks", ["json"])
+        if not set(self._log_sinks) <= {"json", "sqlite"}:
+            raise ValueError(f"log_sinks zijn json en/of sqlite, niet {self._log_sinks}")
+        self._aantal_shards = config_data.get("shards", 0)
+        self._shard_indeling = config_data.get("shard_indeling", "district")
+        if self._shard_indeling not in ("district", "ruimtelijk"):
+            raise ValueError(
+                f"shard_indeling is district of ruimtelijk, niet {self._shard_indeling}"
+            )
+        self._shard_cycles = max(int(config_data.get("shard_cycles", 10)), 1)
+        self._rebalancer = Rebalancer(
+            config_data.get("doel_bezetting", 0.5),
+            config_data.get("rebalancing_marge", 0.25),
+            config_data.get("transporteur_capaciteit", 20),
+        )
+        App._configureer_klassen(config_data)
+        self._metrics_config = {
+            "capaciteit": config_data.get("metrics_buffer", 1024),
+            "prometheus": config_data.get("metrics_prometheus", True),
+            "jsonl": config_data.get("metrics_jsonl", False),
+            "export_interval": config_data.get("metrics_interval", 10),
+        }
+        self._live_config = {
+            "aan": config_data.get("live_server", False),
+            "host": config_data.get("live_host", "127.0.0.1"),
+            "poort": config_data.get("live_poort", 8765),
+            "backlog": config_data.get("live_backlog", 500),
+        }
+
+    # endregion
+
+    # region __functions_run_
+    def _gebruiker(self, nummer: int) -> Gebruiker:
+        """
+        Returns a view on a user
+        """
+        return Gebruiker(self._state, self._namen, int(nummer))
+
+    def _fiets(self, nummer: int) -> Fiets:
+        """
+        Returns a view on a bike
+        """
+        return Fiets(self._state, int(nummer))
+
+    def _dimensies(self) -> dict:
+        """
+        Returns the dimension tables of the compact log: the stations,
+        the name lists and the name indices of every user
+        """
+        state = self._state
+        return {
+            "start_datum": self._start_datum.isoformat(),
+            "stations": [station.getter() for station in self._stations],
+            "namen": self._namen,
+            "gebruikers": {
+                "geslacht": state.geslacht.tolist(),
+                "voornaam": state.voornaam.tolist(),
+                "achternaam": state.achternaam.tolist(),
+            },
+        }
+
+    def _sim_tijd(self, cycle: float | None = None) -> datetime.datetime:
+        """
+        Returns the simulated time at the start of a (fractional) cycle,
+        one cycle lasts tijd_verhouding minutes
+        """
+        if cycle is None:
+            cycle = self._cycle
+        return self._start_datum + datetime.timedelta(
+            minutes=cycle * self._tijd_verhouding
+        )
+
+    def __horizon_bereikt(
+        self,
+        laatste_cycle: int | None,
+        eind_tijd: datetime.datetime | None,
+        cycle: int | None = None,
+    ) -> bool:
+        if cycle is None:
+            cycle = self._cycle
+        if laatste_cycle is not None and cycle >= laatste_cycle:
+            return True
+        if eind_tijd is not None and self._sim_tijd(cycle) >= eind_tijd:
+            return True
+        return False
+
+    def __checkpoint_nodig(self) -> bool:
+        """
+        True once checkpoint_cycles cycles or checkpoint_seconden
+        seconds have passed since the last checkpoint, 0 disables a limit
+        """
+        cycle, tijdstip = self._laatste_checkpoint
+        if self._checkpoint_cycles and self._cycle - cycle >= self._checkpoint_cycles:
+            return True
+        if (
+            self._checkpoint_seconden
+            and time.monotonic() - tijdstip >= self._checkpoint_seconden
+        ):
+            return True
+        return False
+
+    def __wacht_tot(self, deadline: float) -> float:
+        """
+        Sleeps until the deadline of the next cycle. When the
+        simulation has fallen behind it continues right away and
+        starts a new schedule from now instead of bursting to catch up.
+        """
+        wachttijd = deadline - time.monotonic()
+        if wachttijd > 0:
+            # in steps, so ctrl+c does not wait for the deadline
+            while wachttijd > 0 and not self._onderbroken:
+                time.sleep(min(wachttijd, 0.1))
+                wachttijd = deadline - time.monotonic()
+            return deadline
+        return time.monotonic()
+
+    def __log(self) -> None:
+        ritten = (
+            np.concatenate(self._ritten) if self._ritten else np.empty(0, RIT_DTYPE)
+        )
+        self.__update_kpi(ritten)
+        for sink in self._sinks:
+            sink.voeg_toe(self._cycle, ritten)
+        compact = Log.formaat == "compact"
+        if self._log is not None:
+            self._log.log_rit(
+                self._cycle,
+                ritten if compact else [Rit(record, self) for record in ritten],
+            )
+            self._metrics.huidig["log_bytes"] += (
+                self._log.geschreven_bytes - self._log_bytes
+            )
+            self._log_bytes = self._log.geschreven_bytes
+            verwijderd = self._log.verwijderde_segmenten
+            self._metrics.huidig["log_verwijderd"] += verwijderd - self._log_verwijderd
+            self._log_verwijderd = verwijderd
+        if self._live is not None and (self._log is None or compact):
+            self._live.publiceer_ritten(self._cycle, ritten)
+        self._cycle += 1
+        self._ritten.clear()
+
+    def __live_regel(self, cycle: int, ritten: np.ndarray) -> str:
+        """
+        The browser gets the full records, serialized on the
+        serializer thread of the live server
+        """
+        return Log.regel(cycle, [Rit(record, self) for record in ritten])
+
+    def __update_kpi(self, ritten: np.ndarray) -> None:
+        """
+        Adds the cycle to the aggregate KPIs
+        """
+        index = self._station_index
+        lege_stations = self._state.aantal_stations - len(index.niet_leeg)
+        self._kpi["ritten"] += int(np.count_nonzero(ritten["type"] == RIT_GEBRUIKER))
+        self._kpi["leeg_station_minuten"] += lege_stations * self._tijd_verhouding
+        self._kpi["vol_station_minuten"] += len(index.vol) * self._tijd_verhouding
+
+    def __plan_ritten(self) -> np.ndarray:
+        """
+        Draws the ride requests of this cycle, the times, origins and
+        destinations come from the VraagModel. Returns them as
+        EVENT_DTYPE rows in time order, their volgnummers are reserved
+        on the EventQueue as if they were planned one by one.
+        """
+        begin = self._cycle * self._tijd_verhouding
+        tijden, starts, eindes = self._vraag.trek(
+            self._rng, begin, begin + self._tijd_verhouding
+        )
+        laag, hoog = (
+            (0, self._state.aantal_gebruikers)
+            if self._shard is None
+            else self._shard.gebruikers
+        )
+        aanvragen = np.zeros(len(tijden), dtype=EVENT_DTYPE)
+        aanvragen["tijd"] = tijden
+        aanvragen["volgnummer"] = self._events.volgnummers(len(tijden)) + np.arange(
+            len(tijden)
+        )
+        aanvragen["soort"] = EVENT_RIT_START
+        aanvragen["uitvoerder"] = self._rng.integers(laag, hoog, len(tijden))
+        aanvragen["fiets"] = -1
+        # with uniform demand __start_rit draws the stations
+        uniform = self._vraag_model_pad == "uniform"
+        aanvragen["start"] = -1 if uniform else starts
+        aanvragen["eind"] = -1 if uniform else eindes
+        return aanvragen[np.lexsort((aanvragen["volgnummer"], aanvragen["tijd"]))]
+
+    def __verwerk_events(self, tot: float, aanvragen: np.ndarray) -> None:
+        """
+        Handles the ride requests and the events before tot in time
+        order and collects the rides that started. The rides of a block
+        of events are decided and handled on the arrays. A block that is
+        decided in full grows, otherwise it shrinks and a stretch of
+        events after the decided part is handled one by one, a longer
+        one each time. A shard, whose rides reserve slots at other
+        shards, and a short cycle handle every event on its own.
+        """
+        delen = [np.zeros(0, dtype=RIT_DTYPE)]
+        stap = App.los_stap
+        blok = App.bulk_blok
+        los = self._shard is not None or self._vraag_model_pad == "uniform"
+        while True:
+            events = np.concatenate([aanvragen, self._events.neem_tot(tot)])
+            if not len(events):
+                break
+            events = events[np.lexsort((events["volgnummer"], events["tijd"]))]
+            if los or len(events) < stap:
+                delen.append(self.__verwerk_los(events[:stap]))
+                aanvragen = events[stap:]
+                stap *= 2
+                los = self._shard is not None or self._vraag_model_pad == "uniform"
+                continue
+            # a block that is decided in time grows, otherwise it shrinks
+            # and a stretch of events after it is handled one by one
+            grens = tot if blok >= len(events) else float(events["tijd"][blok])
+            aantal, starts, eindes = self.__beslis(events[:blok], grens)
+            if aantal == len(starts):
+                blok *= 2
+                stap = App.los_stap
+            else:
+                blok = max(blok // 2, App.los_stap)
+                los = True
+            grens = tot if aantal == len(events) else float(events["tijd"][aantal])
+            beslist = events[:aantal].copy()
+            beslist["start"] = starts[:aantal]
+            beslist["eind"] = eindes[:aantal]
+            ritten, later = self.__verwerk_bulk(beslist, grens)
+            delen.append(ritten)
+            self._events.zet_terug(later[later["tijd"] >= tot])
+            aanvragen = np.concatenate([events[aantal:], later[later["tijd"] < tot]])
+        self._ritten.append(np.concatenate(delen))
+
+    def __verwerk_los(self, events: np.ndarray) -> np.ndarray:
+        """
+        Handles events one by one in time order, with the events
+        planned meanwhile that fall between them, returns the
+        records of the rides that started
+        """
+        ritten = []
+        for tijd, _, soort, uitvoerder, fiets, start, eind in self._events.tussen(
+            events.tolist()
+        ):
+            if soort == EVENT_RIT_START:
+                rit = self.__start_rit(tijd, uitvoerder, start, eind)
+                if rit is not None:
+                    ritten.append(rit)
+            else:
+                # EVENT_RIT_EINDE and EVENT_TRANSPORT_EINDE
+                self._state.zet_gereserveerd(eind, fiets)
+                self._station_index.update(eind)
+        return np.array(ritten, dtype=RIT_DTYPE)
+
+    def __beslis(self, events: np.ndarray, grens: float) -> tuple:
+        """
+        Decides the origin and destination of the rides among the
+        events as __start_rit does, on the occupancy the events before
+        them leave. A guess of all of them, first the drawn ones, is
+        decided again on the occupancy it leads to until nothing
+        changes. Only a ride that can use a station an earlier changed
+        ride used is decided again, every round fixes at least the
+        first changed ride. Returns the number of leading events that
+        are decided and the origin and destination of every event, -1
+        when a ride is rejected.
+        """
+        state = self._state
+        reistijden = self._afstanden.reistijden
+        aantal_stations = state.aantal_stations
+        rit = events["soort"] == EVENT_RIT_START
+        plaats = np.flatnonzero(rit)
+        aankomend = np.flatnonzero(~rit)
+        tijden = events["tijd"]
+        starts = events["start"].astype(np.int64)
+        eindes = events["eind"].astype(np.int64)
+        # the drawn station of a ride, then the stations it falls back on
+        herkomst = np.column_stack(
+            [starts[plaats], self._uitwijk_tabel[starts[plaats]]]
+        )
+        bestemming = np.column_stack(
+            [eindes[plaats], self._uitwijk_tabel[eindes[plaats]]]
+        )
+        kandidaten = np.concatenate([herkomst, bestemming], axis=1)
+        kandidaten[kandidaten < 0] = aantal_stations
+        # counters: the bikes of a station, then its taken and reserved slots
+        begin = np.concatenate([state.bezetting, state.bezetting + state.gereserveerd])
+        onbeslist = np.arange(len(plaats))
+        for _ in range(App.beslis_rondes):
+            ritten = plaats[(starts[plaats] >= 0) & (eindes[plaats] >= 0)]
+            aankomsten = tijden[ritten] + reistijden[starts[ritten], eindes[ritten]]
+            binnen = aankomsten < grens
+            # event i has rang 2i, an arrival comes after the events at its time
+            rangen = np.concatenate(
+                [
+                    2 * ritten,
+                    2 * aankomend,
+                    2 * np.searchsorted(tijden, aankomsten[binnen], side="right") - 1,
+                    2 * ritten,
+                    2 * ritten,
+                ]
+            )
+            stations = np.concatenate(
+                [
+                    starts[ritten],
+                    eindes[aankomend],
+                    eindes[ritten][binnen],
+                    aantal_stations + eindes[ritten],
+                    aantal_stations + starts[ritten],
+                ]
+            )
+            delta = np.concatenate(
+                [
+                    np.full(len(ritten), -1),
+                    np.ones(len(aankomend) + np.count_nonzero(binnen), dtype=int),
+                    np.ones(len(ritten), dtype=int),
+                    np.full(len(ritten), -1),
+                ]
+            )
+            onbeslist_herkomst = herkomst[onbeslist]
+            onbeslist_bestemming = bestemming[onbeslist]
+            vraag_stations = np.concatenate(
+                [
+                    np.maximum(onbeslist_herkomst, 0).ravel(),
+                    aantal_stations + np.maximum(onbeslist_bestemming, 0).ravel(),
+                ]
+            )
+            # only the counters that are asked for
+            gevraagd = np.zeros(2 * aantal_stations, dtype=bool)
+            gevraagd[vraag_stations] = True
+            nodig = gevraagd[stations]
+            vraag_rangen = np.repeat(2 * plaats[onbeslist], herkomst.shape[1])
+            waarde = FleetState.stand(
+                stations[nodig],
+                rangen[nodig],
+                delta[nodig],
+                begin,
+                vraag_stations,
+                np.concatenate([vraag_rangen, vraag_rangen]),
+            ).reshape(2, *onbeslist_herkomst.shape)
+            rijen = np.arange(len(onbeslist))
 
-        Step 1
-            -> check if all directories are available
-                - input,config,output
-            -> create missing directories if needed
-        step 2
-            -> check if all files are in each directory
-                - config: config.yaml
-                - input: names.json, velo.json if missing send error
-            -> load and assign config parameters
-            -> create app.pickle
+            kan = (onbeslist_herkomst >= 0) & (waarde[0] > 0)
+            start = np.where(
+                kan.any(axis=1), onbeslist_herkomst[rijen, np.argmax(kan, axis=1)], -1
+            )
+            kan = (
+                (onbeslist_bestemming >= 0)
+                & (onbeslist_bestemming != start[:, None])
+                & (waarde[1] < state.capaciteit[np.maximum(onbeslist_bestemming, 0)])
+            )
+            eind = np.where(
+                kan.any(axis=1) & (start >= 0),
+                onbeslist_bestemming[rijen, np.argmax(kan, axis=1)],
+                -1,
+            )
+
+            onbeslist_plaats = plaats[onbeslist]
+            anders = (start != starts[onbeslist_plaats]) | (eind != eindes[onbeslist_plaats])
+            # the stations the changed rides used before and use now
+            gewijzigd = onbeslist_plaats[anders]
+            vroegste = np.full(aantal_stations + 1, np.iinfo(np.int64).max)
+            for gebruikt in (
+                starts[gewijzigd],
+                eindes[gewijzigd],
+                start[anders],
+                eind[anders],
+            ):
+                np.minimum.at(
+                    vroegste,
+                    np.where(gebruikt >= 0, gebruikt, aantal_stations),
+                    2 * gewijzigd,
+                )
+            starts[onbeslist_plaats] = start
+            eindes[onbeslist_plaats] = eind
+            onbeslist = np.flatnonzero(vroegste[kandidaten].min(axis=1) < 2 * plaats)
+            if not len(onbeslist):
+                return len(events), starts, eindes
+        return int(plaats[onbeslist[0]]), starts, eindes
+
+    def __verwerk_bulk(self, events: np.ndarray, grens: float) -> tuple:
+        """
+        Handles events with decided rides in bulk, the arrivals of the
+        rides before grens are handled with them. A ride with origin or
+        destination -1 is rejected. Returns the records of the rides
+        and the other arrivals as EVENT_DTYPE rows.
         """
+        state = self._state
+        metrics = self._metrics.huidig
+        rit = events["soort"] == EVENT_RIT_START
+        geen_fiets = rit & (events["start"] < 0)
+        geen_dok = rit & ~geen_fiets & (events["eind"] < 0)
+        metrics["geweigerd_fiets"] += int(np.count_nonzero(geen_fiets))
+        metrics["geweigerd_dok"] += int(np.count_nonzero(geen_dok))
+        events = events[~(geen_fiets | geen_dok)]
+        rit = events["soort"] == EVENT_RIT_START
+        plaats = np.flatnonzero(rit)
+        ritten = events[rit]
+        gebruikers = ritten["uitvoerder"].astype(np.int64)
+        starts = ritten["start"].astype(np.int64)
+        eindes = ritten["eind"].astype(np.int64)
+        reistijden = self._afstanden.reistijden[starts, eindes].astype(np.float64)
+        aankomsten = ritten["tijd"] + reistijden
+        volgnummers = self._events.volgnummers(len(ritten)) + np.arange(len(ritten))
+        binnen = aankomsten < grens
+        geraakt = np.zeros(state.aantal_stations, dtype=bool)
+        geraakt[starts] = True
+        geraakt[events["eind"]] = True
+        geraakt = np.flatnonzero(geraakt)
+        voor_leeg = state.bezetting[geraakt] == 0
+        voor_vol = (
+            state.bezetting[geraakt] + state.gereserveerd[geraakt]
+            >= state.capaciteit[geraakt]
+        )
 
-        # region stap1
-        dirs_needed = ["input", "config", "output", "site"]
-        dirs_present = self._check_dir("input", "config", "output", "site")
-        dirs_to_create = self._mask_list(dirs_needed, dirs_present)
-        self._make_dir(*dirs_to_create)
+        # the rides take their bike, arrivals before grens dock theirs
+        tijden = np.concatenate([events["tijd"], aankomsten[binnen]])
+        volgorde = np.lexsort(
+            (np.concatenate([events["volgnummer"], volgnummers[binnen]]), tijden)
+        )
+        positie = np.empty(len(volgorde), dtype=np.int64)
+        positie[volgorde] = np.arange(len(volgorde))
+        stations = np.concatenate(
+            [np.where(rit, events["start"], events["eind"]), eindes[binnen]]
+        )
+        neem = np.concatenate([rit, np.zeros(np.count_nonzero(binnen), dtype=bool)])
+        fietsen = np.concatenate(
+            [events["fiets"].astype(np.int64), -2 - positie[plaats[binnen]]]
+        )
+        uitkomst = np.empty(len(volgorde), dtype=np.int64)
+        uitkomst[volgorde] = state.wissel_fietsen(
+            stations[volgorde], neem[volgorde], fietsen[volgorde]
+        )
+        rit_fietsen = uitkomst[plaats]
+        aantal = state.aantal_stations
+        state.gereserveerd += (
+            np.bincount(eindes, minlength=aantal)
+            - np.bincount(stations[~neem], minlength=aantal)
+        ).astype(np.int32)
+        # only the stations whose sets change need the index
+        leeg = state.bezetting[geraakt] == 0
+        vol = (
+            state.bezetting[geraakt] + state.gereserveerd[geraakt]
+            >= state.capaciteit[geraakt]
+        )
+        for station in geraakt[(leeg != voor_leeg) | (vol != voor_vol)].tolist():
+            self._station_index.update(station)
 
-        if "input" in dirs_to_create and "output" in dirs_to_create:
-            missing_files = ["names.json", "velo.json", "viewer.html"]
-            raise MissingJsonFilesError(missing_files)
-        # endregion
+        later = np.zeros(np.count_nonzero(~binnen), dtype=EVENT_DTYPE)
+        later["tijd"] = aankomsten[~binnen]
+        later["volgnummer"] = volgnummers[~binnen]
+        later["soort"] = EVENT_RIT_EINDE
+        later["uitvoerder"] = gebruikers[~binnen]
+        later["fiets"] = rit_fietsen[~binnen]
+        later["start"] = starts[~binnen]
+        later["eind"] = eindes[~binnen]
 
-        # region stap2
-        config_file_present = self._check_files("config", "config.yaml")
-        if config_file_present[0] is False:
-            self._create_config()
-        self._load_config()
-        self._create_users()
-        self._create_bikemovers()
-        self._create_bikes()
-        self._create_stations()
-        self._populate_stations()
-        # endregion
+        # the running ride count of a user, who can ride more than once
+        volgorde = np.argsort(gebruikers, kind="stable")
+        gesorteerd = gebruikers[volgorde]
+        aantal_ritten = np.empty(len(ritten), dtype=np.int64)
+        aantal_ritten[volgorde] = (
+            state.aantal_ritten[gesorteerd]
+            + np.arange(len(ritten))
+            - np.searchsorted(gesorteerd, gesorteerd)
+            + 1
+        )
+        np.add.at(state.aantal_ritten, gebruikers, 1)
+        metrics["ritten"] += len(ritten)
+
+        records = np.zeros(len(ritten), dtype=RIT_DTYPE)
+        records["tijd"] = ritten["tijd"]
+        records["type"] = RIT_GEBRUIKER
+        records["uitvoerder"] = gebruikers
+        records["fiets"] = rit_fietsen
+        records["start"] = starts
+        records["eind"] = eindes
+        records["afstand"] = self._afstanden.afstanden[starts, eindes]
+        records["geschatte_tijd"] = reistijden
+        records["aantal_ritten"] = aantal_ritten
+        records["aantal"] = 1
+        return records, later
 
-    def run(self) -> None:
+    def __start_rit(self, tijd: float, gebruiker: int, start: int, eind: int):
         """
-        runs the simulation
+        Starts a ride: the bike leaves the origin and a slot is reserved
+        at the destination until it arrives. When the origin has no bike
+        or the destination no free slot the user tries the nearest
+        stations, otherwise the ride is rejected. Without stations
+        (start -1) it rides from a random station with a bike to a
+        random station with a free slot. Returns the ride record or None.
         """
-        print("To quit press ctrl + c")
-        self._load_config()
-        while True:
-            print(f'running cycle-{self._cycle}')
-            # two ways to break this loop
-            # (1) ctrl+c
-            # (2) log size too large
-            try:
-                amount_of_rides = self.__random_rit_amount()
-                for _ in range(0, amount_of_rides):
-                    self.__user_cycle()
-                full_stations = [
-                    station
-                    for station in self._stations
-                    if station.aantal_vol == station.aantal_slots
-                ]
-                if len(full_stations) > 20:
-                    self.__transporter_cycle()
-                self.__log()
-                # for rit in self._ritten:
-                #     print(rit.getter())
-                # input()
-            except KeyboardInterrupt:
-                break
+        state = self._state
+        index = self._station_index
+        metrics = self._metrics.huidig
+        if start < 0:
+            start = index.niet_leeg.sample(self._rng)
+            if start is None:
+                metrics["geweigerd_fiets"] += 1
+                return None
+            eind = index.niet_vol.sample(self._rng, behalve=start)
+            if eind is None or not self.__reserveer(eind):
+                metrics["geweigerd_dok"] += 1
+                return None
+        else:
+            if state.bezetting[start] == 0:
+                start = next(
+                    (buur for buur in self._uitwijk[start] if state.bezetting[buur] > 0),
+                    None,
+                )
+                if start is None:
+                    metrics["geweigerd_fiets"] += 1
+                    return None
+            if eind == start or not self.__reserveer(eind):
+                eind = next(
+                    (
+                        buur
+                        for buur in self._uitwijk[eind]
+                        if buur != start and self.__reserveer(buur)
+                    ),
+                    None,
+                )
+                if eind is None:
+                    metrics["geweigerd_dok"] += 1
+                    return None
+
+        fiets = state.neem_fiets(start)
+        index.update(start)
+        index.update(eind)
+        reistijd = float(self._afstanden.reistijden[start, eind])
+        self.__plan_aankomst(
+            tijd + reistijd, EVENT_RIT_EINDE, gebruiker, fiets, start, eind
+        )
+        state.aantal_ritten[gebruiker] += 1
+        metrics["ritten"] += 1
+        return (
+            tijd,
+            RIT_GEBRUIKER,
+            gebruiker,
+            fiets,
+            start,
+            eind,
+            self._afstanden.afstanden[start, eind],
+            reistijd,
+            state.aantal_ritten[gebruiker],
+            1,
+        )
 
-    def view(self):
+    def __transporter_cycle(self) -> None:
         """
-        Built-in log file viewer
+        Sends the free transporters on the trips the Rebalancer plans
+        at the end of this cycle, one record per trip
         """
-        velosim_website = WebsiteMaker()
-        velosim_website.generate_html()
+        ritten = [self.__transport(*trip) for trip in self.__plan_transport()]
+        self._ritten.append(np.array(ritten, dtype=RIT_DTYPE))
 
-    # region __functions-setup__
-    def _check_dir(self, *dir_names: str) -> list[bool]:
+    def __plan_transport(self) -> list[tuple]:
         """
-        Checks if a given directory exists
-
-        Attributes:
-            dir_names [str] -> name of dir / path (allows multi input)
+        Plans the trips of the free transporters at the end of this cycle
+        as (tijd, transporteur, aantal_ritten, start, eind, aantal), on
+        the occupancy recorded in the BezettingsReeks of -run, or the
+        current one when it records nothing. The transporter is busy
+        until its trip ends.
+        """
+        tijd = (self._cycle + 1) * self._tijd_verhouding
+        vrij = [
+            transporteur
+            for transporteur in self._transporteurs
+            if transporteur._vrij_vanaf <= tijd
+        ]
+        bezetting = (
+            None
+            if self._bezetting is None
+            else self._bezetting.neem(self._cycle, self._state.bezetting)
+        )
+        shard = self._shard
+        trips = self._rebalancer.plan(
+            self._state,
+            self._afstanden.afstanden,
+            len(vrij),
+            bezetting,
+            None if shard is None else shard.eigen,
+            None if shard is None else shard.vastgehouden,
+        )
+        bestuurders = self._rng.permutation(len(vrij))
+        gepland = []
+        for bestuurder, (start, eind, aantal) in zip(bestuurders.tolist(), trips):
+            driver = vrij[bestuurder]
+            driver._verplaatsings_update()
+            driver._vrij_vanaf = tijd + self._afstanden.reistijd(start, eind)
+            gepland.append((tijd, driver._nummer, driver._aantal_ritten, start, eind, aantal))
+            self._kpi["transporteur_ritten"] += 1
+            self._kpi["transporteur_km"] += self._afstanden.afstand(start, eind)
+        self._metrics.huidig["transporteur_ritten"] += len(gepland)
+        return gepland
 
-        Output:
-            exists? `True` / `False` (1 dirname given)/n
-            exists? [`True` / `False`, `...`] (1+ dirname given)
+    def __transport(
+        self,
+        tijd: float,
+        transporteur: int,
+        aantal_ritten: int,
+        start: int,
+        eind: int,
+        aantal: int,
+    ) -> tuple:
         """
-        res = []
-        for dir_name in dir_names:
-            if os.path.exists(dir_name) and os.path.isdir(dir_name):
-                res.append(True)
+        Makes a planned trip: the bikes are in transit until it ends and
+        their slots at the destination are reserved. Returns the record.
+        """
+        reistijd = self._afstanden.reistijd(start, eind)
+        fietsen = [self._state.neem_fiets(start) for _ in range(aantal)]
+        for fiets in fietsen:
+            aankomst = (tijd + reistijd, EVENT_TRANSPORT_EINDE, transporteur, fiets)
+            if self._shard is None:
+                self._state.reserveer(eind)
+                self.__plan_aankomst(*aankomst, start, eind)
             else:
-                res.append(False)
-        return res
+                # the slots left may be held for other shards
+                self.__kom_aan(*aankomst, start, eind)
+        self._station_index.update(start)
+        self._station_index.update(eind)
+        return (
+            tijd,
+            RIT_TRANSPORTEUR,
+            transporteur,
+            fietsen[0],
+            start,
+            eind,
+            self._afstanden.afstand(start, eind),
+            reistijd,
+            aantal_ritten,
+            aantal,
+        )
 
-    def _make_dir(self, *dir_names: str) -> None:
+    def __reserveer(self, station: int) -> bool:
         """
-        Creates a given dir
+        Reserves a slot for an arriving bike, at a station of another
+        shard as far as the shard knows it has free slots
+        """
+        if self._shard is None or self._shard.is_eigen(station):
+            return self._state.reserveer(station)
+        return self._shard.reserveer(station)
 
-        Attributes:
-            dir_name [str] -> names of dir / path (allows multi input)
+    def __plan_aankomst(
+        self, tijd: float, soort: int, uitvoerder: int, fiets: int, start: int, eind: int
+    ) -> None:
+        """
+        Plans the arrival of a bike, an arrival at
+        another shard is handed to that shard
+        """
+        if self._shard is not None and not self._shard.is_eigen(eind):
+            self._shard.uitgaand.append((tijd, soort, uitvoerder, fiets, start, eind))
+            return
+        self._events.plan(tijd, soort, uitvoerder, fiets, start, eind)
 
-        Output:
-            /
+    # endregion
+
+    # region __functions-shards__
+    @classmethod
+    def _als_shard(
+        cls,
+        nummer: int,
+        verdeling: ShardVerdeling,
+        arrays: dict[str, np.ndarray],
+        staat: dict,
+        seed,
+    ):
         """
-        for dir_name in dir_names:
-            os.makedirs(dir_name)
+        Builds the App of a shard process from the shared arrays
+        and the state of its stations, bikes and events
+        """
+        velosim = cls(seed=seed, config_pad=None)
+        velosim._cycle = staat["cycle"]
+        velosim._tijd_verhouding = staat["tijd_verhouding"]
+        for naam, array in staat["arrays"].items():
+            setattr(velosim._state, naam, array)
+        velosim._events = EventQueue.uit_array(staat["events"])
+        velosim._uitwijk = staat["uitwijk"]
+        velosim._vraag_model_pad = staat["vraag_model"]
+        velosim._afstanden = DistanceMatrix(arrays["afstanden"], "", arrays["reistijden"])
+        velosim._shard = Shard(nummer, verdeling.shard_van, verdeling.gebruikers[nummer])
+        velosim._vraag = VraagModel(
+            arrays["vertrek"] * velosim._shard.eigen,
+            arrays["bestemming"],
+            staat["start_minuut"],
+        )
+        velosim._station_index = StationIndex(velosim._state)
+        laag, _ = verdeling.transporteurs[nummer]
+        for positie, (aantal_ritten, vrij_vanaf) in enumerate(staat["transporteurs"]):
+            transporteur = Fietstransporteur(laag + positie)
+            transporteur._aantal_ritten = aantal_ritten
+            transporteur._vrij_vanaf = vrij_vanaf
+            velosim._transporteurs.append(transporteur)
+        velosim._rebalancer = staat["rebalancer"]
+        velosim._metrics = Metrics(1)
+        return velosim
 
-    def _mask_list(self, original_list: list[str], mask: list[bool]) -> list[str]:
-        masked_list = []
-        for item, mask in zip(original_list, mask):
-            if not mask:
-                masked_list.append(item)
-        return masked_list
+    def _shard_opdracht(
+        self,
+        soort: str,
+        berichten: list,
+        vrij: np.ndarray,
+        vasthouden: np.ndarray,
+        *args,
+    ) -> dict:
+        """
+        Runs an opdracht in a shard process: the arrivals from other shards
+        first, then the rides and the transporter trips of a number of
+        cycles ("ritten") or nothing ("staat"). Its stations hold vasthouden
+        slots free for the other shards until the next opdracht. Returns the
+        stand after the arrivals and, in "cycles", the stand and the records
+        of the rides of every cycle, for "staat" also the rest of its state.
+        """
+        state = self._state
+        shard = self._shard
+        shard.vrij = vrij
+        self._metrics.begin(self._cycle)
+        state.gereserveerd -= shard.vastgehouden
+        self.__ontvang(berichten)
+        shard.vastgehouden = vasthouden
+        state.gereserveerd += vasthouden
+        antwoord = self.__shard_stand()
+        antwoord["cycles"] = []
+        if soort == "ritten":
+            self._cycle, aantal = args
+            for _ in range(aantal):
+                self.__verwerk_events(
+                    (self._cycle + 1) * self._tijd_verhouding, self.__plan_ritten()
+                )
+                self.__transporter_cycle()
+                ritten = np.concatenate(self._ritten)
+                self._ritten.clear()
+                self._cycle += 1
+                antwoord["cycles"].append(dict(self.__shard_stand(), ritten=ritten))
+        if soort == "staat":
+            laag, hoog = shard.gebruikers
+            eigen_slots = np.repeat(shard.eigen, state.capaciteit)
+            antwoord["slot_volgorde"] = state.slot_volgorde[eigen_slots]
+            antwoord["slot_fiets"] = state.slot_fiets[eigen_slots]
+            antwoord["aantal_ritten"] = state.aantal_ritten[laag:hoog]
+            antwoord["events"] = self._events.naar_array()
+            antwoord["transporteurs"] = [
+                (transporteur._aantal_ritten, transporteur._vrij_vanaf)
+                for transporteur in self._transporteurs
+            ]
+        return antwoord
 
-    def _check_files(self, directory: str, *files: list) -> list[bool]:
+    def __shard_stand(self) -> dict:
         """
-        Checks the input directory to see if specified files exist,
-        returns a list of true and false values
+        Returns the occupancy of the stations of a shard process, the
+        arrivals it handed to other shards and its counters since the
+        last stand
         """
-        existing_files = []
-        for file in files:
-            try:
-                with open(
-                    f"{directory}/{file}",
-                    "r",
-                    encoding="UTF-8",
-                ):
-                    existing_files.append(True)
-            except FileNotFoundError:
-                existing_files.append(False)
-        return existing_files
+        state = self._state
+        shard = self._shard
+        stand = {
+            "bezetting": state.bezetting[shard.eigen],
+            "gereserveerd": (state.gereserveerd - shard.vastgehouden)[shard.eigen],
+            "berichten": shard.uitgaand,
+            "tellers": {naam: self._metrics.huidig[naam] for naam in Shard.tellers},
+        }
+        shard.uitgaand = []
+        self._metrics.begin(self._cycle)
+        return stand
 
-    def _create_stations(self) -> None:
+    def __ontvang(self, berichten: list) -> None:
         """
-        This function removes unused data
-        from the velo.json file
-        and puts the stations in self._stations
-        """
-        with open("input/velo.json", "r", encoding="UTF-8") as file:
-            data = json.load(file)
-            for feature in data["features"]:
-                if feature["properties"]["Gebruik"] == "IN_GEBRUIK":
-                    stationsnummer = feature["properties"]["Objectcode"][3:]
-                    adres = {
-                        "Straatnaam": feature["properties"]["Straatnaam"],
-                        "Huisnummer": feature["properties"]["Huisnummer"],
-                        "Gemeente": feature["properties"]["District"],
-                        "Postcode": feature["properties"]["Postcode"],
-                    }
-                    coordinaten = {
-                        "X": float(feature["geometry"]["coordinates"][0]),
-                        "Y": float(feature["geometry"]["coordinates"][1]),
-                    }
-                    aantal_slots = int(feature["properties"]["Aantal_plaatsen"])
-
-                    station = Station(stationsnummer, adres, coordinaten, aantal_slots)
-                    self._stations.append(station)
-                else:
-                    continue
+        Plans the arrivals other shards handed over
+        """
+        for bericht in berichten:
+            self.__kom_aan(*bericht)
 
-    def _create_users(self) -> None:
+    def __kom_aan(
+        self, tijd: float, soort: int, uitvoerder: int, fiets: int, start: int, eind: int
+    ) -> None:
         """
-        This function creates a number of 'users'
-        specified by the amount in the config file.
-        And puts them in self._gebruikers
+        Plans an arrival in a shard process and reserves its slot, an arrival
+        at another shard is handed over and reserved there. When the station
+        has every slot taken meanwhile the bike rides on to the nearest
+        station with a free slot, of another shard when this one has none
+        left, or it waits for the next cycle boundary.
         """
-        with open(r"input/names.json", "r", encoding="UTF-8") as file:
-            data = json.load(file)
-            voornaam_man = data["Mannen_Voornaam"]
-            voornaam_vrouw = data["Vrouwen_Voornaam"]
-            achternaam = data["Achternaam"]
+        state = self._state
+        shard = self._shard
+        if shard.is_eigen(eind) and not state.reserveer(eind):
+            vrij = np.where(
+                shard.eigen,
+                state.capaciteit - state.bezetting - state.gereserveerd,
+                shard.vrij,
+            )
+            if not (vrij > 0).any():
+                shard.uitgaand.append((tijd, soort, uitvoerder, fiets, start, eind))
+                return
+            omweg = int(
+                np.argmin(np.where(vrij > 0, self._afstanden.afstanden[eind], np.inf))
+            )
+            tijd += self._afstanden.reistijd(eind, omweg)
+            eind = omweg
+            self.__reserveer(eind)
+            self._metrics.huidig["omgeleid"] += 1
+        self.__plan_aankomst(tijd, soort, uitvoerder, fiets, start, eind)
+        self._station_index.update(eind)
 
-            while Gebruiker.aantal_gebruikers < Gebruiker.max_gebruikers:
-                gebruiker = Gebruiker(voornaam_man, voornaam_vrouw, achternaam)
-                self._gebruikers.append(gebruiker)
+    def __shard_staat_voor(self, nummer: int) -> dict:
+        """
+        Returns the state a shard starts from: this state
+        without the stations, bikes and events of other shards
+        """
+        state = self._state
+        eigen = self._verdeling.shard_van == nummer
+        eigen_slots = np.repeat(eigen, state.capaciteit)
+        gedokt = state.fiets_station >= 0
+        eigen_fiets = gedokt & eigen[np.where(gedokt, state.fiets_station, 0)]
+        events = self._events.naar_array()
+        station = np.where(
+            events["soort"] == EVENT_RIT_START, events["start"], events["eind"]
+        )
+        laag, hoog = self._verdeling.transporteurs[nummer]
+        return {
+            "cycle": self._cycle,
+            "tijd_verhouding": self._tijd_verhouding,
+            "start_minuut": self._vraag.start_minuut,
+            "uitwijk": self._uitwijk,
+            "vraag_model": self._vraag_model_pad,
+            "events": events[eigen[station]],
+            "transporteurs": [
+                (transporteur._aantal_ritten, transporteur._vrij_vanaf)
+                for transporteur in self._transporteurs[laag:hoog]
+            ],
+            "rebalancer": self._rebalancer,
+            "arrays": {
+                "capaciteit": state.capaciteit,
+                "slot_offset": state.slot_offset,
+                "slot_volgorde": state.slot_volgorde,
+                "slot_fiets": np.where(eigen_slots, state.slot_fiets, -1),
+                "bezetting": np.where(eigen, state.bezetting, 0),
+                "gereserveerd": np.where(eigen, state.gereserveerd, 0),
+                "fiets_station": np.where(eigen_fiets, state.fiets_station, -1),
+                "fiets_slot": np.where(eigen_fiets, state.fiets_slot, -1),
+                "aantal_ritten": state.aantal_ritten,
+            },
+        }
 
-    def _create_bikes(self) -> None:
+    def __start_shards(self, aantal: int) -> None:
         """
-        This function creates a number of 'bikes' specified
-        by the amount in the config file. And puts them in
-        self._fietsen
+        Partitions the stations and starts a process for every shard,
+        the distances and the demand model are shared read-only
         """
-        while Fiets.aantal_fietsen < Fiets.max_fietsen:
-            fiets = Fiets()
-            self._fietsen.append(fiets)
+        y, x = self._station_coordinaten()
+        self._verdeling = ShardVerdeling.verdeel(
+            aantal,
+            [station._adres["Gemeente"] for station in self._stations],
+            x,
+            y,
+            self._vraag.vertrek.sum(axis=0),
+            self._state.aantal_gebruikers,
+            per_district=self._shard_indeling == "district",
+            aantal_transporteurs=len(self._transporteurs),
+        )
+        self._shard_geheugen, beschrijving = _deel_arrays(
+            {
+                "afstanden": self._afstanden.afstanden,
+                "reistijden": self._afstanden.reistijden,
+                "vertrek": self._vraag.vertrek,
+                "bestemming": self._vraag.bestemming,
+            }
+        )
+        context = multiprocessing.get_context("spawn")
+        zaden = np.random.SeedSequence(int(self._rng.integers(2**63))).spawn(
+            self._verdeling.aantal
+        )
+        self._stroom = self._verdeling.stroom(
+            self._vraag.vertrek, self._vraag.bestemming
+        )
+        self._shards = []
+        self._onderweg = [[] for _ in range(self._verdeling.aantal)]
+        self._onderweg_aantal = np.zeros(self._state.aantal_stations, dtype=np.int32)
+        self._shard_buffer.clear()
+        self._shards_synchroon = True
+        try:
+            for nummer, zaad in enumerate(zaden):
+                verbinding, kant_shard = context.Pipe()
+                proces = context.Process(
+                    target=_shard_worker,
+                    args=(nummer, kant_shard, beschrijving, self._verdeling, zaad),
+                    name=f"velosim-shard-{nummer}",
+                    daemon=True,
+                )
+                proces.start()
+                kant_shard.close()
+                self._shards.append((proces, verbinding))
+            # the state goes over the pipe once the shard is
+            # running, a large start argument blocks a failed start
+            for nummer, (_, verbinding) in enumerate(self._shards):
+                self.__antwoord(nummer)
+                verbinding.send(self.__shard_staat_voor(nummer))
+        except BaseException:
+            self.__stop_shards()
+            raise
 
-    def _create_bikemovers(self) -> None:
+    def __opdrachten(self, soort: str, *args) -> list[tuple]:
         """
-        This function creates a number of 'bikemovers' specified
-        by the amount in the config file. And puts them in
-        self._transporteurs
+        Returns the opdracht of every shard: the arrivals handed to it,
+        its share of the free slots of other stations and the slots its
+        stations hold free for the other shards. The free slots of a
+        station are split over the shards in proportion to the bikes
+        they send to it in this hour, a share is rounded down and the
+        rest stays with the shard of the station.
         """
-        while (
-            Fietstransporteur.aantal_transporteurs < Fietstransporteur.max_transporteurs
-        ):
-            fietstransporteur = Fietstransporteur()
-            self._transporteurs.append(fietstransporteur)
+        state = self._state
+        shard_van = self._verdeling.shard_van
+        vrij = np.maximum(state.capaciteit - state.bezetting - state.gereserveerd, 0)
+        stroom = self._stroom[self._vraag.uur(self._cycle * self._tijd_verhouding)]
+        totaal = stroom.sum(axis=0)
+        aandelen = np.floor(vrij * stroom / np.where(totaal > 0, totaal, 1)).astype(
+            np.int32
+        )
+        aandelen[shard_van, np.arange(state.aantal_stations)] = 0
+        vasthouden = aandelen.sum(axis=0)
+        return [
+            (
+                soort,
+                self._onderweg[nummer],
+                aandelen[nummer],
+                np.where(shard_van == nummer, vasthouden, 0).astype(np.int32),
+                *args,
+            )
+            for nummer in range(len(self._shards))
+        ]
 
-    def _populate_stations(self):
-        # there's a bug here,
-        # i tried to remove it but
-        # it is stubborn
-        #
-        # too bad! :(
-        indexen = list(range(len(self._stations)))
-        for fiets in self._fietsen:
-            index = np.random.choice(indexen)
-            while self._stations[index].vol:
-                indexen.remove(index)
-                index = np.random.choice(indexen)
-            station = self._stations[index]
-            station.voeg_fiets_toe(fiets)
+    def __antwoord(self, nummer: int) -> dict:
+        """
+        Waits for the answer of a shard
+        """
+        proces, verbinding = self._shards[nummer]
+        try:
+            # a shard that died before it took its end
+            # of the pipe never closes it
+            while not verbinding.poll(1):
+                if not proces.is_alive():
+                    raise EOFError
+            antwoord = verbinding.recv()
+        except (EOFError, OSError) as error:
+            raise RuntimeError(f"shard {nummer} is gestopt") from error
+        if "fout" in antwoord:
+            raise RuntimeError(f"shard {nummer} is gestopt:\n{antwoord['fout']}")
+        return antwoord
 
-    def _create_config(self) -> None:
-        file_path = os.path.join("config", "config.yaml")
-        config_data = {
-            "max_log_bestandsgrote": 10,
-            "aantal_gebruikers": 100,
-            "aantal_fietsen": 50,
-            "aantal_transporteurs": 25,
-            "willekeurigheid": 50,
-            "tijd_verhouding": 30,
-        }
-        with open(file_path, "w", encoding="UTF-8") as config_file:
-            yaml.dump(config_data, config_file)
-            config_file.write(
-                "# max aantal fietsen 9627\n"
-                + "# max log bestands grote in megabytes\n"
-                + "# willekeurigheids percentage (tussen 0-100)\n"
-                + "# tijd verhouding 1 cycle = x min in simulatie\n"
-                + "    # Hogere random ~ meer ritten\n"
-                + "    # Hogere tijd verhouding ~ meer ritten"
+    def __shard_ronde(self, opdrachten: list[tuple]) -> list[dict]:
+        """
+        Sends every shard its opdracht and waits for all answers, the
+        arrivals handed over in it are no longer in transit here
+        """
+        self._shards_synchroon = False
+        for nummer, (_, verbinding) in enumerate(self._shards):
+            try:
+                verbinding.send(opdrachten[nummer])
+            except OSError as error:
+                raise RuntimeError(f"shard {nummer} is gestopt") from error
+        antwoorden = [self.__antwoord(nummer) for nummer in range(len(self._shards))]
+        self._shards_synchroon = True
+        self._onderweg = [[] for _ in self._shards]
+        self._onderweg_aantal[:] = 0
+        self.__kopieer_stand(antwoorden)
+        return antwoorden
+
+    def __kopieer_stand(self, standen: list[dict]) -> None:
+        """
+        Copies the occupancy of the stations and the counters from the
+        stand of every shard. The arrivals at other shards are kept for
+        the next round and their slots count as reserved until then.
+        """
+        state = self._state
+        shard_van = self._verdeling.shard_van
+        vorige = state.bezetting.copy(), state.gereserveerd.copy()
+        for nummer, stand in enumerate(standen):
+            eigen = shard_van == nummer
+            state.bezetting[eigen] = stand["bezetting"]
+            state.gereserveerd[eigen] = stand["gereserveerd"]
+            for naam, aantal in stand["tellers"].items():
+                self._metrics.huidig[naam] += aantal
+            for bericht in stand["berichten"]:
+                eind = bericht[5]
+                self._onderweg[shard_van[eind]].append(bericht)
+                self._onderweg_aantal[eind] += 1
+        state.gereserveerd += self._onderweg_aantal
+        gewijzigd = (state.bezetting != vorige[0]) | (state.gereserveerd != vorige[1])
+        for positie in np.flatnonzero(gewijzigd).tolist():
+            self._station_index.update(positie)
+
+    def __shard_ritten(
+        self, laatste_cycle: int | None, eind_tijd: datetime.datetime | None
+    ) -> None:
+        """
+        Takes this cycle from the cycles the shards ran ahead. When none
+        are left every shard gets the arrivals and its shares of the free
+        slots and runs the next shard_cycles cycles, up to the horizon
+        and the next checkpoint. The records of the rides and the trips
+        of a cycle are merged in time order.
+        """
+        if not self._shard_buffer:
+            volgend_checkpoint = (
+                self._laatste_checkpoint[0] + self._checkpoint_cycles
+                if self._checkpoint_cycles
+                else None
+            )
+            aantal = 1
+            while (
+                aantal < self._shard_cycles
+                and not self.__horizon_bereikt(
+                    laatste_cycle, eind_tijd, self._cycle + aantal
+                )
+                and (
+                    volgend_checkpoint is None
+                    or volgend_checkpoint <= self._cycle
+                    or self._cycle + aantal < volgend_checkpoint
+                )
+            ):
+                aantal += 1
+            antwoorden = self.__shard_ronde(
+                self.__opdrachten("ritten", self._cycle, aantal)
             )
+            self._shard_buffer.extend(
+                zip(*(antwoord["cycles"] for antwoord in antwoorden))
+            )
+        standen = self._shard_buffer.popleft()
+        self.__kopieer_stand(standen)
+        ritten = np.concatenate([stand["ritten"] for stand in standen])
+        transport = ritten["type"] == RIT_TRANSPORTEUR
+        self._kpi["transporteur_ritten"] += int(np.count_nonzero(transport))
+        self._kpi["transporteur_km"] += float(
+            ritten["afstand"][transport].sum(dtype=np.float64)
+        )
+        self._ritten.append(ritten[np.argsort(ritten["tijd"], kind="stable")])
 
-    def _load_config(self) -> None:
-        with open("config/config.yaml", "r", encoding="UTF-8") as config_file:
-            config_data = yaml.safe_load(config_file)
-            Gebruiker.max_gebruikers = config_data["aantal_gebruikers"]
-            Fiets.max_fietsen = config_data["aantal_fietsen"]
-            Fietstransporteur.max_transporteurs = config_data["aantal_transporteurs"]
-            self._willekeurigheid = config_data["willekeurigheid"]
-            self._tijd_verhouding = config_data["tijd_verhouding"]
-            Log.max_total_log_size = config_data["max_log_bestandsgrote"] * 1024 * 1024
+    def __shard_staat(self) -> None:
+        """
+        Hands over the arrivals between the shards until none are left,
+        then merges the state of every shard in this App, for a checkpoint
+        """
+        while True:
+            antwoorden = self.__shard_ronde(self.__opdrachten("staat"))
+            if not any(self._onderweg):
+                break
+        state = self._state
+        events = []
+        for nummer, antwoord in enumerate(antwoorden):
+            eigen_slots = np.repeat(self._verdeling.shard_van == nummer, state.capaciteit)
+            state.slot_volgorde[eigen_slots] = antwoord["slot_volgorde"]
+            state.slot_fiets[eigen_slots] = antwoord["slot_fiets"]
+            laag, hoog = self._verdeling.gebruikers[nummer]
+            state.aantal_ritten[laag:hoog] = antwoord["aantal_ritten"]
+            events.append(antwoord["events"])
+            laag, _ = self._verdeling.transporteurs[nummer]
+            for positie, (aantal_ritten, vrij_vanaf) in enumerate(
+                antwoord["transporteurs"]
+            ):
+                transporteur = self._transporteurs[laag + positie]
+                transporteur._aantal_ritten = aantal_ritten
+                transporteur._vrij_vanaf = vrij_vanaf
+        # a bike is docked where a slot holds it, otherwise it is in transit
+        station_van_slot = np.repeat(np.arange(state.aantal_stations), state.capaciteit)
+        slots = np.flatnonzero(state.slot_fiets >= 0)
+        fietsen = state.slot_fiets[slots]
+        state.fiets_station[:] = -1
+        state.fiets_slot[:] = -1
+        state.fiets_station[fietsen] = station_van_slot[slots]
+        state.fiets_slot[fietsen] = slots - state.slot_offset[station_van_slot[slots]]
+        self._events = EventQueue.uit_array(np.concatenate(events))
+
+    def __stop_shards(self) -> None:
+        """
+        Stops the shard processes and frees the shared memory
+        """
+        for _, verbinding in self._shards:
+            with contextlib.suppress(OSError):
+                verbinding.send(("stop",))
+        for proces, verbinding in self._shards:
+            proces.join(timeout=5)
+            if proces.is_alive():
+                proces.terminate()
+                proces.join()
+            verbinding.close()
+        self._shard_geheugen.close()
+        self._shard_geheugen.unlink()
+        self._shards = None
+        self._shard_geheugen = None
+        self._shard_buffer.clear()
+
+    def __onderbreek(self, *_) -> None:
+        # ctrl+c stops the run at the end of the cycle,
+        # a second one right away
+        if self._onderbroken:
+            raise KeyboardInterrupt
+        self._onderbroken = True
 
     # endregion
 
-    # region __functions_run_
-    def __log(self) -> None:
-        log = Log()
-        log.log_rit(self._cycle, self._ritten)
-        self._cycle += 1
-        self._ritten.clear()
 
-    def __random_rit_amount(self) -> int:
-        max_range = round((self._willekeurigheid / 100) * (self._tijd_verhouding * 2))
-        randomized_value = np.random.randint(1, max_range + 2)
-        return int(randomized_value)
+class ScenarioSweep:
+    """
+    Runs a grid of configurations and seeds in a process pool
+    and collects the KPIs of every run in one table
 
-    def __user_cycle(self) -> None:
-        gebruiker = np.random.choice(self._gebruikers)
+    The sweep file holds:
+        - grid [dict[list]] -> config keys and the values to combine
+        - seeds [list[int]]
+        - cycles [int] -> simulated cycles per run
+        - processen [int] -> size of the pool, 0 uses every core
+    All other parameters come from config.yaml.
 
-        non_empty_stations = [
-            station for station in self._stations if station.aantal_vol > 0
-        ]
-        non_full_stations = [
-            station
-            for station in self._stations
-            if station.aantal_vol < station.aantal_slots
-        ]
+    Every run draws from its own np.random.Generator, seeded with
+    SeedSequence(seed, spawn_key=(config nummer,)), so a run is
+    reproducible on its own, whichever worker executes it. The station
+    catalog and distance matrix are parsed once and shared read-only
+    with the workers through shared memory.
+    """
 
-        start_station = np.random.choice(non_empty_stations)
-        if start_station in non_full_stations:
-            non_full_stations.remove(start_station)
-        end_station = np.random.choice(non_full_stations)
+    standaard_pad = "config/sweep.yaml"
+    resultaat_pad = "output/sweep.csv"
 
-        bike = start_station.neem_fiets()
-        end_station.voeg_fiets_toe(bike)
+    def __init__(
+        self, pad: str = standaard_pad, config_pad: str = "config/config.yaml"
+    ) -> None:
+        with open(pad, "r", encoding="UTF-8") as sweep_file:
+            self._sweep = yaml.safe_load(sweep_file)
+        with open(config_pad, "r", encoding="UTF-8") as config_file:
+            self._basis_config = yaml.safe_load(config_file)
 
-        rit = Rit(start_station, end_station, bike, gebruiker)
-        self._ritten.append(rit)
+    @staticmethod
+    def maak_voorbeeld(pad: str = standaard_pad) -> None:
+        """
+        Writes an example sweep file
+        """
+        sweep_data = {
+            "cycles": 1000,
+            "processen": 0,
+            "seeds": [1, 2, 3],
+            "grid": {
+                "aantal_fietsen": [2000, 4000, 6000],
+                "aantal_transporteurs": [5, 25],
+                "willekeurigheid": [50, 100],
+            },
+        }
+        with open(pad, "w", encoding="UTF-8") as sweep_file:
+            yaml.dump(sweep_data, sweep_file)
 
-    def __transporter_cycle(self) -> None:
-        full_stations = [
-            station
-            for station in self._stations
-            if station.aantal_slots >= 22 and station.aantal_vol >= 20
+    def runs(self) -> list[tuple[int, dict, int]]:
+        """
+        Returns every (config nummer, config overrides, seed) of the sweep
+        """
+        grid = self._sweep.get("grid", {})
+        sleutels = list(grid)
+        configs = [
+            dict(zip(sleutels, waarden))
+            for waarden in itertools.product(*(grid[sleutel] for sleutel in sleutels))
         ]
-        empty_stations = [
-            station for station in self._stations if station.aantal_vol - 22 >= 0
+        return [
+            (nummer, overrides, seed)
+            for nummer, overrides in enumerate(configs)
+            for seed in self._sweep.get("seeds", [0])
         ]
-        for _ in range(np.random.randint(0, 11)):
-            if len(empty_stations) <= 0 or len(full_stations) <= 0:
-                break
-            start_station = np.random.choice(full_stations)
-            end_station = np.random.choice(empty_stations)
-            driver = np.random.choice(self._transporteurs)
-            for _ in range(10):
-                bike = start_station.neem_fiets()
-                if start_station.aantal_vol <= 0:
-                    break
-                rit = Rit(start_station, end_station, bike, driver)
-                end_station.voeg_fiets_toe(bike)
-                self._ritten.append(rit)
-            empty_stations.remove(end_station)
-            full_stations.remove(start_station)
 
-    # endregion
+    def run(self, resultaat_pad: str = resultaat_pad) -> list[dict]:
+        """
+        Runs the sweep and writes the result table as csv
+        """
+        catalogus = StationCatalogus.laad()
+        afstanden = DistanceMatrix.laad_of_bereken(catalogus.y, catalogus.x)
+        with open(r"input/names.json", "r", encoding="UTF-8") as file:
+            namen = json.load(file)
+        gedeeld, beschrijving = _deel_arrays(
+            {
+                "capaciteit": catalogus.capaciteit,
+                "x": catalogus.x,
+                "y": catalogus.y,
+                "afstanden": afstanden.afstanden,
+                "reistijden": afstanden.reistijden,
+            }
+        )
+        runs = self.runs()
+        cycles = self._sweep.get("cycles", 1000)
+        processen = self._sweep.get("processen", 0) or os.cpu_count()
+        resultaten = []
+        try:
+            with futures.ProcessPoolExecutor(
+                max_workers=processen,
+                initializer=_sweep_worker_init,
+                initargs=(
+                    beschrijving,
+                    catalogus.nummers,
+                    catalogus.adressen,
+                    afstanden.coordinaten_hash,
+                    namen,
+                    self._basis_config,
+                ),
+            ) as pool:
+                taken = [
+                    pool.submit(_sweep_worker_run, nummer, overrides, seed, cycles)
+                    for nummer, overrides, seed in runs
+                ]
+                for taak in futures.as_completed(taken):
+                    resultaten.append(taak.result())
+                    print(f"sweep: {len(resultaten)}/{len(runs)} runs klaar")
+        finally:
+            gedeeld.close()
+            gedeeld.unlink()
+
+        resultaten.sort(key=lambda resultaat: (resultaat["config"], resultaat["seed"]))
+        with open(resultaat_pad, "w", encoding="UTF-8", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=list(resultaten[0]))
+            writer.writeheader()
+            writer.writerows(resultaten)
+        return resultaten
+
+
+def _deel_arrays(arrays: dict[str, np.ndarray]):
+    """
+    Copies the arrays into one shared memory block, returns
+    the block and the description the workers attach with
+    """
+    beschrijving = {"naam": None, "arrays": {}}
+    offset = 0
+    for naam, array in arrays.items():
+        beschrijving["arrays"][naam] = (array.dtype.str, array.shape, offset)
+        offset += -(-array.nbytes // 64) * 64
+    gedeeld = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    beschrijving["naam"] = gedeeld.name
+    for naam, array in arrays.items():
+        dtype, shape, offset = beschrijving["arrays"][naam]
+        doel = np.ndarray(shape, dtype=dtype, buffer=gedeeld.buf, offset=offset)
+        doel[...] = array
+    return gedeeld, beschrijving
+
+
+def _koppel_arrays(beschrijving: dict):
+    """
+    Attaches to a block made by _deel_arrays, the arrays are read-only
+    """
+    gedeeld = shared_memory.SharedMemory(name=beschrijving["naam"])
+    arrays = {}
+    for naam, (dtype, shape, offset) in beschrijving["arrays"].items():
+        array = np.ndarray(shape, dtype=dtype, buffer=gedeeld.buf, offset=offset)
+        array.flags.writeable = False
+        arrays[naam] = array
+    return gedeeld, arrays
+
+
+_SWEEP_WORKER = {}
+
+
+def _sweep_worker_init(
+    beschrijving: dict,
+    nummers: list,
+    adressen: list,
+    coordinaten_hash: str,
+    namen: dict,
+    basis_config: dict,
+) -> None:
+    gedeeld, arrays = _koppel_arrays(beschrijving)
+    _SWEEP_WORKER["gedeeld"] = gedeeld
+    _SWEEP_WORKER["catalogus"] = StationCatalogus(
+        nummers, adressen, arrays["x"], arrays["y"], arrays["capaciteit"]
+    )
+    _SWEEP_WORKER["afstanden"] = DistanceMatrix(
+        arrays["afstanden"], coordinaten_hash, arrays["reistijden"]
+    )
+    _SWEEP_WORKER["namen"] = namen
+    _SWEEP_WORKER["basis_config"] = basis_config
+    # demand models by their config, their alias tables are built once
+    _SWEEP_WORKER["vraag"] = {}
+
+
+def _sweep_worker_run(nummer: int, overrides: dict, seed: int, cycles: int) -> dict:
+    """
+    Sets up and runs one scenario of a sweep, returns its KPIs
+    """
+    tic = time.perf_counter()
+    velosim = App(
+        seed=np.random.SeedSequence(seed, spawn_key=(nummer,)), config_pad=None
+    )
+    config = dict(_SWEEP_WORKER["basis_config"], **overrides)
+    velosim._configureer(config)
+    velosim._namen = _SWEEP_WORKER["namen"]
+    velosim._create_users()
+    velosim._create_bikemovers()
+    velosim._create_bikes()
+    velosim._create_stations(_SWEEP_WORKER["catalogus"])
+    velosim._build_station_index()
+    velosim._afstanden = _SWEEP_WORKER["afstanden"]
+    velosim._populate_stations()
+    sleutel = tuple(
+        str(config.get(naam))
+        for naam in (
+            "vraag_model",
+            "willekeurigheid",
+            "rit_afstand_schaal",
+            "rit_max_afstand",
+            "start_datum",
+        )
+    )
+    if sleutel not in _SWEEP_WORKER["vraag"]:
+        velosim._build_vraag_model()
+        _SWEEP_WORKER["vraag"][sleutel] = velosim._vraag
+    velosim._vraag = _SWEEP_WORKER["vraag"][sleutel]
+    velosim.run(
+        max_cycles=cycles,
+        realtime=False,
+        checkpoint_pad=None,
+        logboek=False,
+        verbose=False,
+        metrics=False,
+        shards=0,
+    )
+    resultaat = {"config": nummer, "seed": seed, **overrides, "cycles": cycles}
+    resultaat.update(velosim._kpi)
+    resultaat["seconden"] = round(time.perf_counter() - tic, 3)
+    return resultaat
+
+
+def _shard_worker(
+    nummer: int,
+    verbinding,
+    beschrijving: dict,
+    verdeling: ShardVerdeling,
+    seed,
+) -> None:
+    """
+    Runs a shard of a sharded run, it gets its state from the
+    coordinating App and executes its opdrachten until it sends stop
+    """
+    # ctrl+c is handled by the coordinating process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    gedeeld, arrays = _koppel_arrays(beschrijving)
+    try:
+        verbinding.send({})
+        velosim = App._als_shard(nummer, verdeling, arrays, verbinding.recv(), seed)
+        while True:
+            opdracht = verbinding.recv()
+            if opdracht[0] == "stop":
+                return
+            verbinding.send(velosim._shard_opdracht(*opdracht))
+    except EOFError:
+        # the coordinator is gone
+        return
+    except Exception:
+        verbinding.send({"fout": traceback.format_exc()})
+    finally:
+        gedeeld.close()
+
+
+def _parse_run_options(args: list[str]) -> argparse.Namespace:
+    """
+    Parses the options that can follow the -run flag
+    """
+    parser = argparse.ArgumentParser(prog="app.py -run")
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="run the cycles as fast as possible instead of in real time",
+    )
+    parser.add_argument(
+        "--cycles", type=int, default=None, help="number of cycles to simulate"
+    )
+    parser.add_argument(
+        "--tot",
+        type=datetime.datetime.fromisoformat,
+        default=None,
+        help="simulated end time, e.g. 2023-07-01 or '2023-06-02 18:00'",
+    )
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        default=None,
+        help="stream the cycles to the browser, as live_server in config.yaml",
+    )
+    parser.add_argument(
+        "--profiel",
+        nargs="?",
+        const="output/profiel.prof",
+        default=None,
+        help="run under cProfile and write the stats (default output/profiel.prof)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=None,
+        help="run the stations in this many processes, as shards in config.yaml",
+    )
+    return parser.parse_args(args)
+
+
+def _parse_stats_options(args: list[str]) -> argparse.Namespace:
+    """
+    Parses the options that can follow the -stats flag
+    """
+    parser = argparse.ArgumentParser(prog="app.py -stats")
+    parser.add_argument(
+        "--uitvoer",
+        default="output/stats.npz",
+        help="where the statistics are written (default output/stats.npz)",
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="number of busiest items to print"
+    )
+    return parser.parse_args(args)
+
+
+def _parse_zoek_options(args: list[str]) -> argparse.Namespace:
+    """
+    Parses the options that can follow the -zoek flag
+    """
+    parser = argparse.ArgumentParser(prog="app.py -zoek")
+    parser.add_argument("--fiets", type=int, default=None, help="bike number")
+    parser.add_argument("--gebruiker", type=int, default=None, help="user number")
+    parser.add_argument(
+        "--transporteur", type=int, default=None, help="transporter number"
+    )
+    parser.add_argument(
+        "--station", default=None, help="station number of velo.json, start or end"
+    )
+    parser.add_argument("--van", type=int, default=None, help="from this cycle")
+    parser.add_argument("--tot", type=int, default=None, help="until this cycle")
+    parser.add_argument(
+        "--limiet",
+        type=int,
+        default=100,
+        help="number of rides to print (default 100, 0 prints all)",
+    )
+    return parser.parse_args(args)
 
 
 def main():
@@ -750,6 +5862,9 @@ def main():
     setup_pat = r"^(-{1,2}[sS]|-{1,2}[sS]etup)$"
     run_pat = r"^(-{1,2}[rR]|-{1,2}[rR]un)$"
     view_pat = r"^(-{1,2}[vV]|-{1,2}[vV]iew)$"
+    sweep_pat = r"^(-{1,2}[sS]weep)$"
+    stats_pat = r"^(-{1,2}[sS]tats)$"
+    zoek_pat = r"^(-{1,2}[zZ]oek)$"
     # endregion
     if len(sys.argv) > 1:
         user_flag = str(sys.argv[1])
@@ -757,22 +5872,52 @@ def main():
         if re.match(setup_pat, user_flag):
             velosim = App()
             velosim.setup()
-            with open("output/app.pickle", "wb") as file:
-                pickle.dump(velosim, file)
+            velosim.opslaan()
 
         elif re.match(run_pat, user_flag):
-            velosim = None
-            with open("output/app.pickle", "rb") as file:
-                velosim = pickle.load(file)
-            velosim.run()
-            with open("output/app.pickle", "wb") as file:
-                pickle.dump(velosim, file)
-
-        elif re.match(view_pat, user_flag):            
-            velosim = None
-            with open("output/app.pickle", "rb") as file:
-                velosim = pickle.load(file)
-            velosim.view()
+            options = _parse_run_options(sys.argv[2:])
+            velosim = App.laden()
+            try:
+                velosim.run(
+                    max_cycles=options.cycles,
+                    eind_tijd=options.tot,
+                    realtime=not options.fast,
+                    profiel=options.profiel,
+                    live=options.live,
+                    shards=options.shards,
+                )
+            except LogSizeOverflow as error:
+                print(error)
+                sys.exit(1)
+
+        elif re.match(view_pat, user_flag):
+            App.view()
+
+        elif re.match(stats_pat, user_flag):
+            options = _parse_stats_options(sys.argv[2:])
+            App.stats(options.uitvoer, options.top)
+
+        elif re.match(zoek_pat, user_flag):
+            options = _parse_zoek_options(sys.argv[2:])
+            App.zoek(
+                options.fiets,
+                options.gebruiker,
+                options.transporteur,
+                options.station,
+                options.van,
+                options.tot,
+                options.limiet or None,
+            )
+
+        elif re.match(sweep_pat, user_flag):
+            pad = sys.argv[2] if len(sys.argv) > 2 else ScenarioSweep.standaard_pad
+            if not os.path.exists(pad):
+                ScenarioSweep.maak_voorbeeld(pad)
+                print(f"Voorbeeld sweep aangemaakt in {pad}, pas het aan en start opnieuw.")
+                return
+            sweep = ScenarioSweep(pad)
+            sweep.run()
+            print(f"Resultaten geschreven naar {ScenarioSweep.resultaat_pad}")
         else:
             print("Flag not recognized.")
 
@@ -781,8 +5926,4 @@ def main():
 
 
 if __name__ == "__main__":
-    # tic = time.time_ns()
     main()
-    # toc = time.time_ns()
-    # elapsed_time = toc - tic
-    # print(elapsed_time)
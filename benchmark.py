@@ -0,0 +1,548 @@
+"""
+Benchmark suite of the simulator
+
+Measures every stage at a number of scales, without the pacing of -run:
+    - setup -> _create_users, _create_bikes, _create_stations, the
+               station and spatial indexes, the distance matrix, the
+               demand model and _populate_stations
+    - user_cycle -> rides and events per second of planning the ride
+                    requests of a cycle and handling its events
+    - transporter_cycle -> seconds per __transporter_cycle
+    - log_rit -> seconds per cycle of logging, until written and synced,
+                 and of the wait in Log.log_rit, as the log grows, in
+                 the volledig and the compact log formaat
+    - archief -> seconds per cycle of RitArchief.voeg_toe and sync, and
+                 of RitArchief.statistieken over the archive
+    - database -> seconds per cycle of RitDatabase.voeg_toe until
+                  committed, the wait in voeg_toe, and the lookups of
+                  a bike, a user and a station
+    - bezetting -> seconds per snapshot of BezettingsReeks.neem, and of
+                   the empty and full station-minutes and the heatmap
+                   per hour of the day over the recorded matrix
+    - generate_html -> a full and an incremental WebsiteMaker run
+    - shards -> cycles per second of App.run without log or checkpoint,
+                in one process and with 2 and 4 shards
+    - startup -> wall time of a fresh interpreter importing app.py
+                 and running the CLI commands, the median of a few runs
+
+The results are written as JSON (default output/benchmark.json) with
+the commit they were measured on, so runs on different commits can be
+compared. Every scale runs in a temporary directory, the input files
+are taken from input/ or else from the directory of this file.
+
+    python benchmark.py [--schalen standaard,middel] [--cycles N]
+                        [--log-cycles N] [--startup N] [--seed S]
+                        [--uitvoer pad]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import app
+from app import (
+    App,
+    BezettingsReeks,
+    DistanceMatrix,
+    Log,
+    Rit,
+    RitArchief,
+    RitDatabase,
+    Rebalancer,
+    StationCatalogus,
+    WebsiteMaker,
+)
+
+SCHALEN = {
+    "standaard": {"aantal_gebruikers": 100, "aantal_fietsen": 50},
+    "middel": {"aantal_gebruikers": 10_000, "aantal_fietsen": 2_000},
+    "groot": {"aantal_gebruikers": 100_000, "aantal_fietsen": 6_000},
+    # 80% of the 9627 slots, with every slot filled no dock is free
+    "max": {"aantal_gebruikers": 1_000_000, "aantal_fietsen": 7_700},
+}
+
+INPUT_BESTANDEN = [
+    "names.json",
+    "velo.json",
+    "viewer_base.html",
+    "viewer_index.html",
+    "viewer_pagina.html",
+    "viewer_live.html",
+]
+
+
+def _stopwatch(functie, *args, **kwargs):
+    """
+    Returns the result of functie and the seconds it took
+    """
+    tic = time.perf_counter()
+    resultaat = functie(*args, **kwargs)
+    return resultaat, time.perf_counter() - tic
+
+
+def _input_dir() -> str:
+    if all(os.path.exists(os.path.join("input", naam)) for naam in INPUT_BESTANDEN):
+        return os.path.abspath("input")
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_setup(velosim: App) -> dict:
+    resultaat = {}
+    _, resultaat["_load_names"] = _stopwatch(velosim._load_names)
+    _, resultaat["_create_users"] = _stopwatch(velosim._create_users)
+    _, resultaat["_create_bikemovers"] = _stopwatch(velosim._create_bikemovers)
+    _, resultaat["_create_bikes"] = _stopwatch(velosim._create_bikes)
+    catalogus, resultaat["catalogus"] = _stopwatch(StationCatalogus.laad)
+    _, resultaat["_create_stations"] = _stopwatch(velosim._create_stations, catalogus)
+    _, resultaat["_build_station_index"] = _stopwatch(velosim._build_station_index)
+    _, resultaat["_build_spatial_index"] = _stopwatch(velosim._build_spatial_index)
+    velosim._afstanden, resultaat["afstanden"] = _stopwatch(
+        DistanceMatrix.laad_of_bereken,
+        catalogus.y,
+        catalogus.x,
+        "output/afstanden.npz",
+    )
+    _, resultaat["_build_vraag_model"] = _stopwatch(velosim._build_vraag_model)
+    _, resultaat["_populate_stations"] = _stopwatch(velosim._populate_stations)
+    resultaat["totaal"] = sum(resultaat.values())
+    return resultaat
+
+
+def bench_user_cycle(velosim: App, cycles: int) -> tuple[dict, list[np.ndarray]]:
+    """
+    Runs cycles user cycles, returns the timings
+    and the rides of every cycle
+    """
+    batches = []
+    seconden = 0.0
+    events = 0
+    for _ in range(cycles):
+        queue = velosim._events
+        # handled = pending before + planned meanwhile - pending after
+        events += len(queue) - queue._volgnummer
+        tic = time.perf_counter()
+        velosim._App__verwerk_events(
+            (velosim._cycle + 1) * velosim._tijd_verhouding, velosim._App__plan_ritten()
+        )
+        seconden += time.perf_counter() - tic
+        events += queue._volgnummer - len(queue)
+        batches.extend(velosim._ritten)
+        velosim._ritten.clear()
+        velosim._cycle += 1
+    ritten = sum(len(batch) for batch in batches)
+    return {
+        "cycles": cycles,
+        "ritten": ritten,
+        "events": events,
+        "seconden": seconden,
+        "ritten_per_seconde": ritten / seconden if seconden else 0.0,
+        "events_per_seconde": events / seconden if seconden else 0.0,
+    }, batches
+
+
+def bench_transporter_cycle(velosim: App, cycles: int) -> dict:
+    """
+    Times cycles transporter cycles, between them the next cycle plans
+    its rides and handles its events, untimed, so the trips arrive, the
+    transporters are free again and the rides unbalance the stations
+    again. The Rebalancer aims at the fill of the whole fleet
+    without marge, so there are surplus and deficit stations to pair
+    at every scale.
+    """
+    rebalancer = velosim._rebalancer
+    state = velosim._state
+    velosim._rebalancer = Rebalancer(
+        state.bezetting.sum() / state.capaciteit.sum(), 0.0, rebalancer.lading
+    )
+    seconden = 0.0
+    ritten = 0
+    for _ in range(cycles):
+        _, duur = _stopwatch(velosim._App__transporter_cycle)
+        seconden += duur
+        ritten += sum(len(batch) for batch in velosim._ritten)
+        velosim._ritten.clear()
+        velosim._cycle += 1
+        velosim._App__verwerk_events(
+            (velosim._cycle + 1) * velosim._tijd_verhouding, velosim._App__plan_ritten()
+        )
+        velosim._ritten.clear()
+    velosim._rebalancer = rebalancer
+    return {
+        "cycles": cycles,
+        "ritten": ritten,
+        "seconden": seconden,
+        "seconden_per_cycle": seconden / cycles,
+    }
+
+
+def bench_log_rit(
+    velosim: App,
+    batches: list[np.ndarray],
+    cycles: int,
+    blokken: int = 4,
+    formaat: str = "volledig",
+) -> list[dict]:
+    """
+    Logs cycles cycles in a log of its own, replaying the rides of the
+    user cycle benchmark, and reports the time per cycle for every
+    block of cycles
+    """
+    per_blok = max(cycles // blokken, 1)
+    resultaat = []
+    Log.formaat = formaat
+    if formaat == "compact":
+        # next to the full log, which generate_html renders
+        Log.log_dir = os.path.join("output", "ritlog-compact")
+        Log.schrijf_dimensies(0, velosim._dimensies())
+    with Log() as log:
+        for blok in range(blokken):
+            wachten = 0.0
+            tic = time.perf_counter()
+            for cycle in range(blok * per_blok, (blok + 1) * per_blok):
+                ritten = batches[cycle % len(batches)]
+                if formaat == "volledig":
+                    ritten = [Rit(record, velosim) for record in ritten]
+                _, duur = _stopwatch(log.log_rit, cycle, ritten)
+                wachten += duur
+            log.sync()
+            seconden = time.perf_counter() - tic
+            resultaat.append(
+                {
+                    "cycles": (blok + 1) * per_blok,
+                    "bytes": sum(
+                        os.path.getsize(pad) for _, _, pad in Log.segmenten()
+                    ),
+                    "seconden_per_cycle": seconden / per_blok,
+                    "wachten_per_cycle": wachten / per_blok,
+                }
+            )
+    return resultaat
+
+
+def bench_log_formaten(
+    velosim: App, batches: list[np.ndarray], cycles: int
+) -> dict[str, list[dict]]:
+    log_dir = Log.log_dir
+    try:
+        return {
+            formaat: bench_log_rit(velosim, batches, cycles, formaat=formaat)
+            for formaat in ("volledig", "compact")
+        }
+    finally:
+        Log.formaat = "volledig"
+        Log.log_dir = log_dir
+
+
+def bench_archief(velosim: App, batches: list[np.ndarray], cycles: int) -> dict:
+    """
+    Archives cycles cycles, replaying the rides of the user cycle
+    benchmark, and aggregates the archive as -stats does
+    """
+    tic = time.perf_counter()
+    with RitArchief(0, velosim._start_datum, velosim._state.aantal_stations) as archief:
+        for cycle in range(cycles):
+            archief.voeg_toe(cycle, batches[cycle % len(batches)])
+    schrijven = time.perf_counter() - tic
+    stats, statistieken = _stopwatch(RitArchief.statistieken)
+    return {
+        "cycles": cycles,
+        "ritten": int(stats["vertrek"].sum()),
+        "seconden_per_cycle": schrijven / cycles,
+        "statistieken": statistieken,
+    }
+
+
+def bench_database(batches: list[np.ndarray], cycles: int) -> dict:
+    """
+    Inserts cycles cycles in the ride database, replaying the rides of
+    the user cycle benchmark, and times a lookup of a bike, a user and
+    a station of the last cycle
+    """
+    wachten = 0.0
+    tic = time.perf_counter()
+    with RitDatabase(0, datetime.datetime(2023, 6, 1)) as database:
+        for cycle in range(cycles):
+            _, seconden = _stopwatch(
+                database.voeg_toe, cycle, batches[cycle % len(batches)]
+            )
+            wachten += seconden
+        database.sync()
+    schrijven = time.perf_counter() - tic
+    ritten = next((batch for batch in reversed(batches) if len(batch)), None)
+    zoeken = {}
+    if ritten is not None:
+        for soort, kwargs in (
+            ("fiets", {"fiets": int(ritten["fiets"][0])}),
+            ("gebruiker", {"gebruiker": int(ritten["uitvoerder"][0])}),
+            ("station", {"station": int(ritten["start"][0])}),
+        ):
+            _, zoeken[soort] = _stopwatch(RitDatabase.zoek, **kwargs)
+    return {
+        "cycles": cycles,
+        "seconden_per_cycle": schrijven / cycles,
+        "wachten_per_cycle": wachten / cycles,
+        "zoeken": zoeken,
+    }
+
+
+def bench_bezetting(velosim: App, cycles: int) -> dict:
+    """
+    Records cycles snapshots of the occupancy, a changed station
+    per cycle, and queries the matrix as -stats does
+    """
+    state = velosim._state
+    bezetting = state.bezetting.copy()
+    rng = np.random.default_rng(0)
+    stations = rng.integers(len(bezetting), size=cycles)
+    with BezettingsReeks(
+        0,
+        state.capaciteit,
+        velosim._start_datum,
+        velosim._tijd_verhouding,
+        BezettingsReeks.reeks_dir,
+    ) as reeks:
+        tic = time.perf_counter()
+        for cycle, station in enumerate(stations.tolist()):
+            bezetting[station] = rng.integers(state.capaciteit[station] + 1)
+            reeks.neem(cycle, bezetting)
+        neem = time.perf_counter() - tic
+    matrix, meta = BezettingsReeks.laad()
+    _, station_minuten = _stopwatch(
+        BezettingsReeks.station_minuten,
+        matrix,
+        state.capaciteit,
+        meta["tijd_verhouding"],
+    )
+    _, heatmap = _stopwatch(
+        BezettingsReeks.heatmap,
+        matrix,
+        state.capaciteit,
+        BezettingsReeks.uur_van_de_dag(meta, len(matrix)),
+        24,
+    )
+    return {
+        "cycles": cycles,
+        "seconden_per_cycle": neem / cycles,
+        "station_minuten": station_minuten,
+        "heatmap": heatmap,
+    }
+
+
+def bench_generate_html() -> dict:
+    _, volledig = _stopwatch(WebsiteMaker().generate_html)
+    _, incrementeel = _stopwatch(WebsiteMaker().generate_html)
+    return {"volledig": volledig, "incrementeel": incrementeel}
+
+
+def bench_shards(velosim: App, cycles: int, aantallen: list[int]) -> dict:
+    """
+    Runs cycles cycles in one process (0) and with every number of
+    shards in aantallen, the start of the shards is timed apart
+    """
+    resultaat = {}
+    for aantal in aantallen:
+        _, seconden = _stopwatch(
+            velosim.run,
+            max_cycles=cycles,
+            realtime=False,
+            checkpoint_pad=None,
+            logboek=False,
+            verbose=False,
+            metrics=False,
+            shards=aantal,
+        )
+        # the metrics buffer may hold fewer cycles than were run
+        gemeten = velosim._metrics.laatste()["totaal"]
+        per_cycle = float(gemeten.mean()) if len(gemeten) else 0.0
+        resultaat[str(aantal)] = {
+            "cycles": cycles,
+            "start": seconden - per_cycle * cycles,
+            "cycles_per_seconde": 1 / per_cycle if per_cycle else 0.0,
+        }
+    return resultaat
+
+
+def bench_startup(herhalingen: int) -> dict:
+    """
+    Times the CLI in new interpreters, as a scheduler runs it
+    """
+    app_pad = os.path.abspath(app.__file__)
+    commandos = {
+        "import": [sys.executable, "-c", "import app"],
+        "-setup": [sys.executable, app_pad, "-setup"],
+        "-run": [sys.executable, app_pad, "-run", "--fast", "--cycles", "1"],
+        "-view": [sys.executable, app_pad, "-view"],
+    }
+    omgeving = dict(os.environ, PYTHONPATH=os.path.dirname(app_pad))
+    resultaat = {}
+    for naam, commando in commandos.items():
+        tijden = []
+        for _ in range(herhalingen):
+            _, duur = _stopwatch(
+                subprocess.run,
+                commando,
+                env=omgeving,
+                check=True,
+                capture_output=True,
+            )
+            tijden.append(duur)
+        resultaat[naam] = float(np.median(tijden))
+        print(f"  {naam}: {resultaat[naam] * 1000:.1f} ms")
+    return resultaat
+
+
+def _werk_dir(tijdelijk: str, input_dir: str) -> None:
+    for submap in ("input", "config", "output", "site"):
+        os.makedirs(os.path.join(tijdelijk, submap))
+    for bestand in INPUT_BESTANDEN:
+        shutil.copy(
+            os.path.join(input_dir, bestand),
+            os.path.join(tijdelijk, "input", bestand),
+        )
+
+
+def bench_schaal(schaal: dict, opties: argparse.Namespace) -> dict:
+    config = dict(App.standaard_config, **schaal)
+    # retention would delete segments while they are measured
+    config["max_log_bestandsgrote"] = 1024
+    velosim = App(seed=opties.seed, config_pad=None)
+    velosim._configureer(config)
+
+    resultaat = {"config": schaal}
+    resultaat["setup"] = bench_setup(velosim)
+    print(f"  setup: {resultaat['setup']['totaal']:.3f} s")
+    resultaat["user_cycle"], batches = bench_user_cycle(velosim, opties.cycles)
+    print(
+        f"  user_cycle: {resultaat['user_cycle']['ritten_per_seconde']:.0f} ritten/s, "
+        f"{resultaat['user_cycle']['events_per_seconde']:.0f} events/s"
+    )
+    resultaat["transporter_cycle"] = bench_transporter_cycle(velosim, opties.cycles)
+    print(
+        "  transporter_cycle: "
+        f"{resultaat['transporter_cycle']['seconden_per_cycle'] * 1000:.3f} ms/cycle"
+    )
+    resultaat["log_rit"] = bench_log_formaten(velosim, batches, opties.log_cycles)
+    for formaat, blokken in resultaat["log_rit"].items():
+        print(
+            f"  log_rit ({formaat}): "
+            f"{blokken[-1]['seconden_per_cycle'] * 1000:.3f} ms/cycle, "
+            f"{blokken[-1]['wachten_per_cycle'] * 1000:.3f} ms wachten, "
+            f"{blokken[-1]['bytes']} bytes"
+        )
+    resultaat["archief"] = bench_archief(velosim, batches, opties.log_cycles)
+    print(
+        "  archief: "
+        f"{resultaat['archief']['seconden_per_cycle'] * 1000:.3f} ms/cycle, "
+        f"statistieken {resultaat['archief']['statistieken'] * 1000:.1f} ms"
+    )
+    resultaat["database"] = bench_database(batches, opties.log_cycles)
+    zoeken = ", ".join(
+        f"{soort} {seconden * 1000:.1f} ms"
+        for soort, seconden in resultaat["database"]["zoeken"].items()
+    )
+    print(
+        "  database: "
+        f"{resultaat['database']['seconden_per_cycle'] * 1000:.3f} ms/cycle, "
+        f"{resultaat['database']['wachten_per_cycle'] * 1000:.3f} ms wachten, "
+        f"zoeken {zoeken}"
+    )
+    resultaat["bezetting"] = bench_bezetting(velosim, opties.log_cycles)
+    print(
+        "  bezetting: "
+        f"{resultaat['bezetting']['seconden_per_cycle'] * 1000:.3f} ms/cycle, "
+        f"station_minuten {resultaat['bezetting']['station_minuten'] * 1000:.1f} ms, "
+        f"heatmap {resultaat['bezetting']['heatmap'] * 1000:.1f} ms"
+    )
+    resultaat["generate_html"] = bench_generate_html()
+    print(f"  generate_html: {resultaat['generate_html']['volledig']:.3f} s")
+    resultaat["shards"] = bench_shards(velosim, opties.cycles, [0, 2, 4])
+    for aantal, meting in resultaat["shards"].items():
+        print(
+            f"  shards ({aantal}): {meting['cycles_per_seconde']:.0f} cycles/s, "
+            f"start {meting['start']:.3f} s"
+        )
+    return resultaat
+
+
+def _parse_options(args: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="benchmark.py")
+    parser.add_argument(
+        "--schalen",
+        default=",".join(SCHALEN),
+        help=f"comma separated, from {', '.join(SCHALEN)}",
+    )
+    parser.add_argument("--cycles", type=int, default=500)
+    parser.add_argument("--log-cycles", type=int, default=2000)
+    parser.add_argument(
+        "--startup", type=int, default=5, help="runs per CLI command, 0 skips it"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--uitvoer", default="output/benchmark.json")
+    return parser.parse_args(args)
+
+
+def main():
+    opties = _parse_options(sys.argv[1:])
+    uitvoer = os.path.abspath(opties.uitvoer)
+    input_dir = _input_dir()
+    resultaten = {
+        "commit": _commit(),
+        "datum": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cycles": opties.cycles,
+        "log_cycles": opties.log_cycles,
+        "seed": opties.seed,
+        "schalen": {},
+    }
+    werk_dir = os.getcwd()
+    if opties.startup:
+        print("startup:")
+        with tempfile.TemporaryDirectory(prefix="velosim-bench-") as tijdelijk:
+            _werk_dir(tijdelijk, input_dir)
+            os.chdir(tijdelijk)
+            try:
+                resultaten["startup"] = bench_startup(opties.startup)
+            finally:
+                os.chdir(werk_dir)
+    for naam in opties.schalen.split(","):
+        print(f"{naam}: {SCHALEN[naam]}")
+        with tempfile.TemporaryDirectory(prefix="velosim-bench-") as tijdelijk:
+            _werk_dir(tijdelijk, input_dir)
+            os.chdir(tijdelijk)
+            try:
+                resultaten["schalen"][naam] = bench_schaal(SCHALEN[naam], opties)
+            finally:
+                os.chdir(werk_dir)
+
+    os.makedirs(os.path.dirname(uitvoer), exist_ok=True)
+    with open(uitvoer, "w", encoding="UTF-8") as file:
+        json.dump(resultaten, file, indent=2)
+    print(f"Resultaten geschreven naar {uitvoer}")
+
+
+if __name__ == "__main__":
+    main()
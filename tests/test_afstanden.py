@@ -0,0 +1,24 @@
+"""
+The cached distance matrix matches a freshly computed one
+"""
+
+import numpy as np
+
+from app import DistanceMatrix
+
+
+def test_cache_gelijk_aan_berekend(tmp_path):
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(51.15, 51.30, 40)
+    lon = rng.uniform(4.30, 4.50, 40)
+    cache = str(tmp_path / "afstanden.npz")
+
+    berekend = DistanceMatrix.laad_of_bereken(lat, lon, cache)
+    geladen = DistanceMatrix.laad_of_bereken(lat, lon, cache)
+    np.testing.assert_array_equal(berekend.afstanden, geladen.afstanden)
+    np.testing.assert_array_equal(berekend.reistijden, geladen.reistijden)
+
+    # other coordinates are recomputed
+    anders = DistanceMatrix.laad_of_bereken(lat + 0.01, lon, cache)
+    assert anders.coordinaten_hash != berekend.coordinaten_hash
+    assert not np.array_equal(anders.afstanden, berekend.afstanden)
@@ -0,0 +1,60 @@
+"""
+Smoke run of benchmark.py at the standaard scale
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import benchmark
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_input_bestanden_aanwezig():
+    for naam in benchmark.INPUT_BESTANDEN:
+        assert os.path.exists(os.path.join(REPO, naam)), naam
+
+
+def test_standaard(tmp_path):
+    uitvoer = tmp_path / "benchmark.json"
+    subprocess.run(
+        [
+            sys.executable,
+            os.path.join(REPO, "benchmark.py"),
+            "--schalen",
+            "standaard",
+            "--cycles",
+            "5",
+            "--log-cycles",
+            "5",
+            "--startup",
+            "1",
+            "--uitvoer",
+            str(uitvoer),
+        ],
+        cwd=tmp_path,
+        check=True,
+        capture_output=True,
+    )
+    with open(uitvoer, encoding="UTF-8") as file:
+        resultaten = json.load(file)
+
+    assert set(resultaten["startup"]) == {"import", "-setup", "-run", "-view"}
+    schaal = resultaten["schalen"]["standaard"]
+    assert schaal["config"] == benchmark.SCHALEN["standaard"]
+    for stap in (
+        "setup",
+        "user_cycle",
+        "transporter_cycle",
+        "log_rit",
+        "archief",
+        "database",
+        "bezetting",
+        "generate_html",
+        "shards",
+    ):
+        assert stap in schaal, stap
+    assert schaal["user_cycle"]["ritten_per_seconde"] > 0
+    assert set(schaal["shards"]) == {"0", "2", "4"}
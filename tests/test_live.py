@@ -0,0 +1,38 @@
+"""
+The live server serializes the rides on its own thread
+"""
+
+import os
+import threading
+
+import numpy as np
+
+import benchmark
+from app import RIT_DTYPE, LiveServer
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_publiceer_ritten(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "input")
+    for naam in benchmark.INPUT_BESTANDEN:
+        os.symlink(os.path.join(REPO, naam), tmp_path / "input" / naam)
+    monkeypatch.chdir(tmp_path)
+    threads = []
+
+    def formatteer(cycle, ritten):
+        threads.append(threading.current_thread())
+        return f"{cycle} {len(ritten)}\n"
+
+    live = LiveServer("127.0.0.1", 0, backlog=10, formatteer=formatteer)
+    live.start()
+    try:
+        for cycle in range(20):
+            live.publiceer_ritten(cycle, np.zeros(cycle, dtype=RIT_DTYPE))
+    finally:
+        live.close()
+
+    assert threads and threading.main_thread() not in threads
+    assert [event for _, event in live._backlog] == [
+        f"id: {cycle}\ndata: {cycle} {cycle}\n\n".encode() for cycle in range(10, 20)
+    ]
@@ -0,0 +1,89 @@
+"""
+The rides decided on the arrays match the rides handled one by one
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import benchmark
+from app import App
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _simuleer(pad, schaal: str, config: dict, cycles: int) -> tuple:
+    """
+    Returns the ride records of a run and the arrays of its end state
+    """
+    for submap in ("input", "output"):
+        os.makedirs(pad / submap)
+    for naam in benchmark.INPUT_BESTANDEN:
+        os.symlink(os.path.join(REPO, naam), pad / "input" / naam)
+    os.chdir(pad)
+    velosim = App(seed=1, config_pad=None)
+    velosim._configureer(
+        dict(App.standaard_config, **benchmark.SCHALEN[schaal], **config)
+    )
+    benchmark.bench_setup(velosim)
+
+    ritten = []
+    for _ in range(cycles):
+        aanvragen = velosim._App__plan_ritten()
+        velosim._App__verwerk_events(
+            (velosim._cycle + 1) * velosim._tijd_verhouding, aanvragen
+        )
+        velosim._App__transporter_cycle()
+        ritten.extend(velosim._ritten)
+        velosim._ritten.clear()
+        velosim._cycle += 1
+
+    state = velosim._state
+    arrays = [
+        state.bezetting,
+        state.gereserveerd,
+        state.slot_fiets,
+        state.slot_volgorde,
+        state.fiets_station,
+        state.fiets_slot,
+        state.aantal_ritten,
+        velosim._events.naar_array(),
+    ]
+    return np.concatenate(ritten), arrays
+
+
+@pytest.mark.parametrize(
+    "schaal, config, cycles",
+    [
+        # few bikes, most requests fall back to other stations
+        ("standaard", {"willekeurigheid": 1000}, 100),
+        ("middel", {"willekeurigheid": 2000}, 60),
+        ("middel", {"willekeurigheid": 5000, "aantal_transporteurs": 0}, 30),
+    ],
+)
+def test_bulk_gelijk_aan_los(tmp_path, monkeypatch, schaal, config, cycles):
+    monkeypatch.chdir(tmp_path)
+    # counts the rides handled on the arrays
+    bulk = []
+    verwerk_bulk = App._App__verwerk_bulk
+
+    def tel_bulk(self, *args):
+        bulk.append(len(args[0]))
+        return verwerk_bulk(self, *args)
+
+    monkeypatch.setattr(App, "_App__verwerk_bulk", tel_bulk)
+    ritten, arrays = _simuleer(tmp_path / "bulk", schaal, config, cycles)
+    assert sum(bulk) > 0
+
+    # every block shorter than los_stap is handled one by one
+    monkeypatch.setattr(App, "los_stap", 10**9)
+    bulk.clear()
+    ritten_los, arrays_los = _simuleer(tmp_path / "los", schaal, config, cycles)
+    assert not bulk
+
+    assert ritten.dtype == ritten_los.dtype
+    assert len(ritten) > 0
+    np.testing.assert_array_equal(ritten, ritten_los)
+    for array, array_los in zip(arrays, arrays_los):
+        np.testing.assert_array_equal(array, array_los)
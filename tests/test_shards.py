@@ -0,0 +1,142 @@
+"""
+A sharded run conserves the bikes and its per-station totals
+match the bikes in the slots and the arrivals on their way
+"""
+
+import os
+
+import numpy as np
+import pytest
+import yaml
+
+import benchmark
+from app import EVENT_RIT_START, RIT_GEBRUIKER, RIT_TRANSPORTEUR, App
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _Verzamelaar:
+    """
+    A sink that keeps the records of every cycle
+    """
+
+    def __init__(self):
+        self.cycles = []
+        self.ritten = []
+
+    def voeg_toe(self, cycle, ritten):
+        self.cycles.append(cycle)
+        self.ritten.append(ritten)
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _controleer(velosim: App) -> None:
+    state = velosim._state
+    events = velosim._events.naar_array()
+    aankomsten = events[events["soort"] != EVENT_RIT_START]
+
+    # every bike is in one slot or on its way to one
+    fietsen = np.concatenate(
+        [state.slot_fiets[state.slot_fiets >= 0], aankomsten["fiets"]]
+    )
+    assert np.array_equal(np.sort(fietsen), np.arange(len(state.fiets_station)))
+
+    gedokt = np.add.reduceat(
+        (state.slot_fiets >= 0).astype(np.int64), state.slot_offset[:-1]
+    )
+    np.testing.assert_array_equal(gedokt, state.bezetting)
+    np.testing.assert_array_equal(
+        np.bincount(aankomsten["eind"], minlength=state.aantal_stations),
+        state.gereserveerd,
+    )
+    slots = np.flatnonzero(state.slot_fiets >= 0)
+    station_van_slot = np.repeat(np.arange(state.aantal_stations), state.capaciteit)
+    fietsen = state.slot_fiets[slots]
+    np.testing.assert_array_equal(state.fiets_station[fietsen], station_van_slot[slots])
+    np.testing.assert_array_equal(
+        state.fiets_slot[fietsen], slots - state.slot_offset[station_van_slot[slots]]
+    )
+
+
+def _app(pad, shard_cycles: int) -> App:
+    for submap in ("input", "config", "output"):
+        os.makedirs(pad / submap, exist_ok=True)
+    for naam in benchmark.INPUT_BESTANDEN:
+        if not os.path.exists(pad / "input" / naam):
+            os.symlink(os.path.join(REPO, naam), pad / "input" / naam)
+    config = dict(
+        App.standaard_config,
+        **benchmark.SCHALEN["middel"],
+        willekeurigheid=2000,
+        shard_cycles=shard_cycles,
+    )
+    # App.laden reads it
+    with open(pad / "config" / "config.yaml", "w", encoding="UTF-8") as file:
+        yaml.safe_dump(config, file)
+    velosim = App(seed=1, config_pad=None)
+    velosim._configureer(config)
+    benchmark.bench_setup(velosim)
+    return velosim
+
+
+@pytest.mark.parametrize("shards, shard_cycles", [(2, 1), (2, 5), (3, 10)])
+def test_shards_behouden_fietsen(tmp_path, monkeypatch, shards, shard_cycles):
+    monkeypatch.chdir(tmp_path)
+    velosim = _app(tmp_path, shard_cycles)
+    verzamelaar = _Verzamelaar()
+    velosim._sinks.append(verzamelaar)
+    # not a multiple of shard_cycles, the last batch stops at the horizon
+    velosim.run(
+        max_cycles=23,
+        realtime=False,
+        checkpoint_pad="output/app.ckpt",
+        logboek=False,
+        verbose=False,
+        metrics=False,
+        shards=shards,
+    )
+    assert velosim._shards is None and not velosim._shard_buffer
+    assert velosim._cycle == 23
+    _controleer(velosim)
+
+    # every cycle is handed to the sinks once, in order
+    assert verzamelaar.cycles == list(range(23))
+    ritten = np.concatenate(verzamelaar.ritten)
+    gebruiker = ritten["type"] == RIT_GEBRUIKER
+    transport = ritten["type"] == RIT_TRANSPORTEUR
+    assert velosim._kpi["ritten"] == np.count_nonzero(gebruiker) > 0
+    assert velosim._metrics._totalen["ritten"] == velosim._kpi["ritten"]
+    assert velosim._kpi["transporteur_ritten"] == np.count_nonzero(transport) > 0
+    # the shards count the rides of their own users and transporters
+    np.testing.assert_array_equal(
+        np.bincount(
+            ritten["uitvoerder"][gebruiker],
+            minlength=velosim._state.aantal_gebruikers,
+        ),
+        velosim._state.aantal_ritten,
+    )
+    np.testing.assert_array_equal(
+        np.bincount(
+            ritten["uitvoerder"][transport], minlength=len(velosim._transporteurs)
+        ),
+        [transporteur._aantal_ritten for transporteur in velosim._transporteurs],
+    )
+
+    # the checkpoint resumes in one process
+    hervat = App.laden("output/app.ckpt")
+    _controleer(hervat)
+    hervat.run(
+        max_cycles=5,
+        realtime=False,
+        checkpoint_pad=None,
+        logboek=False,
+        verbose=False,
+        metrics=False,
+        shards=0,
+    )
+    _controleer(hervat)